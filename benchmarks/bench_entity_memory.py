@@ -0,0 +1,84 @@
+"""Compare the memory used by entities with the previous dict based class.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_entity_memory
+"""
+
+from controller.hydroplant import Actuator, EntityType
+from controller.utils import (
+    get_floor_from_topic,
+    get_stage_from_topic,
+    get_last_part,
+    get_second_last_part,
+)
+
+import gc
+import tracemalloc
+
+PARTS = ("LED", "water_pump", "valve", "stepper")
+
+
+class LegacyEntity:
+    """Entity as it was before it used slots."""
+
+    def __init__(self, unique_id: str) -> None:
+        self.unique_id = unique_id
+
+        self.value = None
+        self.data = {}
+        self.listener = None
+
+        self.topic = "hydroplant/{}/" + unique_id
+        self.command = self.topic.format("command")
+        self.receipt = self.command + "/receipt"
+        self.gui_topic = self.topic.format("gui_command")
+
+        self.id = get_last_part(unique_id)
+        self.floor = get_floor_from_topic(unique_id)
+        self.stage = get_stage_from_topic(unique_id)
+        self.node_id = get_second_last_part(unique_id)
+
+        self.type = EntityType[self.id.upper()]
+
+
+def get_unique_ids(count: int) -> list[str]:
+    """Unique IDs spread over 10 floors with 10 stages each."""
+    unique_ids = []
+    node = 0
+
+    while len(unique_ids) < count:
+        floor = node % 10 + 1
+        stage = node // 10 % 10 + 1
+
+        for part in PARTS:
+            unique_ids.append(f"floor_{floor}/stage_{stage}/node_{node}/{part}")
+
+        node += 1
+
+    return unique_ids[:count]
+
+
+def measure(cls, unique_ids: list[str]) -> float:
+    """Bytes allocated per entity, not counting the unique IDs themselves."""
+    gc.collect()
+    tracemalloc.start()
+    entities = [cls(unique_id) for unique_id in unique_ids]
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    del entities
+    return size / len(unique_ids)
+
+
+if __name__ == "__main__":
+    print(f"{'entities':>8} {'legacy':>10} {'slots':>10}  bytes/entity")
+
+    for count in (10_000, 50_000, 100_000):
+        unique_ids = get_unique_ids(count)
+
+        print(
+            f"{count:>8}"
+            f" {measure(LegacyEntity, unique_ids):>10.0f}"
+            f" {measure(Actuator, unique_ids):>10.0f}"
+        )
@@ -0,0 +1,107 @@
+"""Compare the topic_contains chain in on_message with TopicRouter.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_router
+"""
+
+from controller.router import TopicRouter
+from controller.topics import *
+from controller.utils import topic_contains
+
+import time
+
+FLOORS = 20
+STAGES = 5
+NODES = 25
+PARTS = ("LED", "water_pump")
+
+
+def get_entity_topics() -> list[str]:
+    """Build the gui_command and receipt topics for every actuator."""
+    topics = []
+
+    for f in range(1, FLOORS + 1):
+        for s in range(1, STAGES + 1):
+            for n in range(NODES):
+                for part in PARTS:
+                    unique_id = f"floor_{f}/stage_{s}/node_{n}/{part}"
+                    topics.append(f"{GUI_COMMAND}{unique_id}")
+                    topics.append(f"{PREFIX}command/{unique_id}/receipt")
+
+    return topics
+
+
+def legacy(topic: str) -> str:
+    """The branch order of the old Controller.on_message."""
+    if topic_contains(topic, "is_ready"):
+        return "is_ready"
+
+    if topic_contains(topic, "hydroplant/demo1"):
+        return "demo1"
+
+    if topic_contains(topic, "hydroplant/demo2"):
+        return "demo2"
+
+    if topic_contains(topic, "disconnected"):
+        return "disconnected"
+
+    if topic_contains(topic, "device"):
+        return "device"
+
+    if topic_contains(topic, "gui_command"):
+        return "gui_command"
+
+    if topic_contains(topic, "receipt"):
+        return "receipt"
+
+    return ""
+
+
+def get_router(exact_topics: list[str]) -> TopicRouter:
+    """Router with the controller patterns and optional exact entity topics."""
+    router = TopicRouter()
+    handlers = {
+        IS_READY_TOPIC: "is_ready",
+        DEMO_MOVE_TOPIC: "demo1",
+        DEMO_INSPECT_TOPIC: "demo2",
+        DEVICES_DISCONNECT_TOPIC: "disconnected",
+        DEVICE_TOPIC: "device",
+        AUTONOMY_TOPIC: "autonomy",
+        GUI_COMMAND + "#": "gui_command",
+        LOGIC_CONTROLLER_RECEIPT_TOPIC: "receipt",
+        ACTUATOR_RECEIPT_TOPIC: "receipt",
+    }
+
+    for pattern, name in handlers.items():
+        router.add(pattern, name)
+
+    for topic in exact_topics:
+        router.add(topic, "entity")
+
+    return router
+
+
+def measure(name: str, func, topics: list[str], rounds: int = 5) -> None:
+    """Print the best time per lookup over a number of rounds."""
+    best = float("inf")
+
+    for _ in range(rounds):
+        start = time.perf_counter()
+
+        for topic in topics:
+            func(topic)
+
+        best = min(best, time.perf_counter() - start)
+
+    print(f"{name:<32} {best / len(topics) * 1e9:8.0f} ns/topic")
+
+
+if __name__ == "__main__":
+    topics = get_entity_topics()
+    print(f"{len(topics)} subscribed entity topics")
+
+    measure("topic_contains chain", legacy, topics)
+    measure("router (wildcard trie)", get_router([]).match, topics, rounds=1)
+    measure("router (wildcard, cached)", get_router([]).match, topics)
+    measure("router (exact dict)", get_router(topics).match, topics)
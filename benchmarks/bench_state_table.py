@@ -0,0 +1,67 @@
+"""Compare finding the lights to switch with a loop and with the state table.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_state_table
+"""
+
+from controller.hydroplant import EntityType, HydroplantSystem
+from controller.topology import generate_topology, parse_topology
+
+import random
+import time
+
+PARTS = ("LED", "water_pump", "valve", "stepper")
+
+
+def get_system(actuators: int) -> HydroplantSystem:
+    """Build a farm with actuators spread over 100 floors with 100 stages."""
+    system = HydroplantSystem(*parse_topology(generate_topology(100, 100)))
+
+    with system.batch():
+        for i in range(actuators):
+            part = PARTS[i % len(PARTS)]
+            unique_id = (
+                f"floor_{i % 100 + 1}/stage_{i // 100 % 100 + 1}/node_{i // 4}/{part}"
+            )
+            system.add_actuator(unique_id).set_data({"value": random.randint(0, 1)})
+
+    return system
+
+
+def loop(system: HydroplantSystem, value: int) -> list:
+    """What autonomy did before the state table."""
+    return [
+        actuator
+        for actuator in system.get_actuators()
+        if actuator.is_type(EntityType.LED) and actuator.get_value() != value
+    ]
+
+
+def measure(func, rounds: int = 20) -> float:
+    """Best time per call in milliseconds."""
+    best = float("inf")
+
+    for _ in range(rounds):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+
+    return best * 1e3
+
+
+if __name__ == "__main__":
+    print(f"{'actuators':>9} {'loop':>8} {'mask':>8} {'select':>8}  ms")
+
+    for actuators in (1000, 10000, 50000, 100000):
+        system = get_system(actuators)
+        table = system.get_table()
+
+        assert len(loop(system, 1)) == len(table.select(EntityType.LED, differs_from=1))
+
+        print(
+            f"{actuators:>9}"
+            f" {measure(lambda: loop(system, 1)):>8.3f}"
+            f" {measure(lambda: table.get_mask(EntityType.LED, differs_from=1)):>8.3f}"
+            f" {measure(lambda: table.select(EntityType.LED, differs_from=1)):>8.3f}"
+        )
@@ -0,0 +1,66 @@
+"""Compare finding duplicate steps by comparing strings and by their keys.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_step_dedup
+"""
+
+from controller.job import EJobState, Job, Step
+
+import time
+
+
+def get_jobs(count: int) -> list[Job]:
+    """Queued light jobs, one per node, like autonomy adds them."""
+    jobs = []
+
+    for i in range(count):
+        topic = f"hydroplant/command/floor_{i % 10 + 1}/stage_1/node_{i}/LED"
+        job = Job([Step(topic, {"value": 1, "device_id": f"node_{i}", "id": "LED"})])
+        job.set_state(EJobState.QUEUED)
+        jobs.append(job)
+
+    return jobs
+
+
+def is_queued(jobs: list[Job], step: Step) -> bool:
+    """What autonomy did before step keys."""
+    for job in jobs:
+        if job.state != EJobState.QUEUED:
+            continue
+
+        for queued_step in job.steps:
+            if str(step) == str(queued_step):
+                return True
+
+    return False
+
+
+def measure(func, rounds: int = 3) -> float:
+    """Best time per call in milliseconds."""
+    best = float("inf")
+
+    for _ in range(rounds):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+
+    return best * 1e3
+
+
+if __name__ == "__main__":
+    print(f"{'queued':>7} {'strings':>10} {'keys':>8}  ms to check every light again")
+
+    for count in (100, 1000, 2000):
+        jobs = get_jobs(count)
+        steps = [Step(job.steps[0].topic, dict(job.steps[0].data)) for job in jobs]
+        queued_steps = {step.key: 1 for job in jobs for step in job.steps}
+
+        assert all(is_queued(jobs, step) for step in steps[:10])
+        assert all(step.key in queued_steps for step in steps)
+
+        print(
+            f"{count:>7}"
+            f" {measure(lambda: [is_queued(jobs, step) for step in steps]):>10.2f}"
+            f" {measure(lambda: [step.key in queued_steps for step in steps]):>8.3f}"
+        )
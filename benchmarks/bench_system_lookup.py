@@ -0,0 +1,84 @@
+"""Compare scanning floors and stages with the unique_id index.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_system_lookup
+"""
+
+from controller.hydroplant import Floor, HydroplantSystem
+from controller.utils import get_floor_from_topic, get_stage_from_topic
+
+import time
+
+FLOORS = 10
+STAGES = 10
+PARTS = ("LED", "water_pump")
+
+
+def get_system(nodes: int) -> tuple[HydroplantSystem, list[str]]:
+    """Build a system with nodes per stage and two actuators per node."""
+    stage_names = [f"stage_{s}" for s in range(1, STAGES + 1)]
+    system = HydroplantSystem(
+        *[Floor(f"floor_{f}", *stage_names) for f in range(1, FLOORS + 1)]
+    )
+    unique_ids = []
+
+    for f in range(1, FLOORS + 1):
+        for stage_name in stage_names:
+            for n in range(nodes):
+                for part in PARTS:
+                    unique_id = f"floor_{f}/{stage_name}/node_{n}/{part}"
+                    system.add_actuator(unique_id)
+                    unique_ids.append(unique_id)
+
+    return system, unique_ids
+
+
+def scan(system: HydroplantSystem, unique_id: str):
+    """The lookup HydroplantSystem did before it had an index."""
+    floor_name = get_floor_from_topic(unique_id)
+    stage_name = get_stage_from_topic(unique_id)
+
+    for floor in system.get_floors():
+        if floor.name != floor_name:
+            continue
+
+        for stage in floor.get_stages():
+            if stage.name != stage_name:
+                continue
+
+            for actuator in stage.get_actuators():
+                if actuator.unique_id == unique_id:
+                    return actuator
+
+    return None
+
+
+def measure(func, keys: list[str], rounds: int = 3) -> float:
+    """Best time per lookup in nanoseconds."""
+    best = float("inf")
+
+    for _ in range(rounds):
+        start = time.perf_counter()
+
+        for key in keys:
+            func(key)
+
+        best = min(best, time.perf_counter() - start)
+
+    return best / len(keys) * 1e9
+
+
+if __name__ == "__main__":
+    print(f"{'entities':>8} {'scan':>10} {'unique_id':>10} {'topic':>10}  ns/lookup")
+
+    for nodes in (1, 5, 10, 25, 50):
+        system, unique_ids = get_system(nodes)
+        receipts = [system.get_object_from_unique_id(u).receipt for u in unique_ids]
+
+        print(
+            f"{len(unique_ids):>8}"
+            f" {measure(lambda u: scan(system, u), unique_ids):>10.0f}"
+            f" {measure(system.get_object_from_unique_id, unique_ids):>10.0f}"
+            f" {measure(system.get_object, receipts):>10.0f}"
+        )
@@ -0,0 +1,87 @@
+"""Measure node presentation and lookups as the farm grows.
+
+Farms with many floors and farms with everything on one floor are both
+measured, since a presentation republishes the floor it changed.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_topology
+"""
+
+from controller.hydroplant import HydroplantSystem
+from controller.topology import generate_topology, parse_topology
+
+import gc
+import random
+import time
+
+# floors, stages per floor
+SIZES = ((3, 3), (10, 100), (100, 100), (200, 250), (1, 100), (1, 1000), (1, 5000))
+PARTS = ("LED", "water_pump")
+LOOKUPS = 10000
+
+
+def present(system: HydroplantSystem, floor: str, stage: str, node: str) -> None:
+    """What the controller does when a node presents itself."""
+    with system.batch():
+        system.delete_objects(node, floor)
+
+        for part in PARTS:
+            system.add_actuator(f"{floor}/{stage}/{node}/{part}")
+
+
+def measure(func, keys: list, rounds: int = 1) -> float:
+    """Best time per call in microseconds."""
+    best = float("inf")
+
+    for _ in range(rounds):
+        start = time.perf_counter()
+
+        for key in keys:
+            func(*key)
+
+        best = min(best, time.perf_counter() - start)
+
+    return best / len(keys) * 1e6
+
+
+if __name__ == "__main__":
+    print(
+        f"{'floors':>6} {'stages':>7} {'entities':>8}"
+        f" {'present':>8} {'again':>7} {'floor':>7} {'stage':>7} {'object':>7}  µs"
+    )
+
+    for floors, stages in SIZES:
+        # do not count freeing the previous farm
+        system = None
+        gc.collect()
+
+        system = HydroplantSystem(*parse_topology(generate_topology(floors, stages)))
+        nodes = [
+            (floor.name, stage.name, f"node_{floor.name}_{stage.name}")
+            for floor in system.get_floors()
+            for stage in floor.get_stages()
+        ]
+
+        present_time = measure(lambda *node: present(system, *node), nodes)
+        # nodes presenting themselves again, e.g. after a reconnect
+        again_time = measure(lambda *node: present(system, *node), nodes)
+
+        unique_ids = [
+            f"{floor}/{stage}/{node}/LED"
+            for floor, stage, node in random.choices(nodes, k=LOOKUPS)
+        ]
+        receipts = [(f"hydroplant/command/{u}/receipt",) for u in unique_ids]
+
+        # the same topics keep arriving, so measure with warm topic caches
+        floor_time = measure(system.get_floor, [(u,) for u in unique_ids], 3)
+        stage_time = measure(
+            lambda u: system.get_floor(u).get_stage(u), [(u,) for u in unique_ids], 3
+        )
+        object_time = measure(system.get_object, receipts, 3)
+
+        print(
+            f"{floors:>6} {floors * stages:>7} {len(system.get_actuators()):>8}"
+            f" {present_time:>8.1f} {again_time:>7.1f} {floor_time:>7.2f}"
+            f" {stage_time:>7.2f} {object_time:>7.2f}"
+        )
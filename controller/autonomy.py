@@ -1,15 +1,27 @@
-from .job import Job, Step, EJobState
+from .job import Job, Step, EJobState, EJobPriority
 from .hydroplant import HydroplantSystem, EntityType, Entity
+from .lanes import Lanes
+from .scheduler import Scheduler
 
+from itertools import count
 import datetime as dt
 import logging
-import time
+import secrets
 
 
 class Autonomy:
     """Class for running the autonomy logic.
 
-    Defaults to be enabled.
+    Defaults to be enabled. Everything runs on the thread of the
+    scheduler, which only wakes up when an interval check is due, a step
+    passes its deadline, or :meth:`complete_step` is called for a receipt.
+
+    Every step is published with a correlation id, `cid`, which the node
+    echoes back in its receipt. Only that receipt completes the step.
+
+    Jobs are queued in one lane per node, see :class:`Lanes`, so a slow
+    job on one node does not hold up jobs on other nodes, and higher
+    priority jobs overtake routine jobs between their steps.
     """
 
     def __init__(
@@ -17,7 +29,7 @@ class Autonomy:
         system,
         publish_callback,
         log_callback,
-        wait: float = 1.0,
+        scheduler: Scheduler | None = None,
     ) -> None:
         """Initialize Autonomy object.
 
@@ -25,42 +37,131 @@ class Autonomy:
             system: The HydroplantSystem instance.
             publish_callback: Callback to communicate with MQTT.
             log_callback: Callback for logging.
-            wait: How long autonomy should sleep for each cycle.
+            scheduler: Scheduler to run on, a new one if None.
         """
         self.data: list[dict] = []  # specific data master-controller receives
-        self.jobs: list[Job] = []  # all pending jobs
 
         self.is_enabled = True  # turn on/off autonomy logic
         self.publish = publish_callback  # callback to communicate with MQTT
         self.system: HydroplantSystem = system
 
         self.log = log_callback  # callback for logging
-        self.wait = wait  # how long autonomy should sleep for each cycle
+        self.scheduler = scheduler or Scheduler()
+        self.lanes = Lanes(self.scheduler.clock)  # all pending jobs
+        # keys of the steps of queued jobs, mapped to how many there are
+        self.queued_steps: dict[tuple[str, str], int] = {}
+        # correlation ids of sent steps waiting for their receipt
+        self.pending: dict[str, tuple[Job, Step]] = {}
+        # new per run, so receipts from before a restart never match
+        self.cid_prefix = secrets.token_hex(4)
+        self.cids = count()
+
+        self.round_trips = 0
+        self.total_round_trip = 0.0
+        self.max_round_trip = 0.0
         self.time = 0.0  # current time, used for lights
-        self.last_status_print = 0.0
         self.status_interval = 30  #
         self.last_interval_check = 0.0
         # TODO: turn this up after demo
         self.interval_check_timeout = 15  # every 300 seconds
 
+        self.is_work_posted = False
+        # wakes us up when the first running job is done waiting
+        # or its step passes its deadline
+        self.timer: list | None = None
+
         self.inspected_demo_plants = True
         self.moved_demo_plants = True
 
+    @property
+    def jobs(self) -> list[Job]:
+        """All pending jobs, in the order they were added."""
+        return self.lanes.get_jobs()
+
+    def add_jobs(self, jobs: list[Job]) -> None:
+        """Queue existing jobs, e.g. restored from a snapshot.
+
+        Can be called from any thread.
+
+        Args:
+            jobs: The jobs, in the order they were added before.
+        """
+        self.scheduler.call_soon(lambda: self.__queue_jobs(jobs))
+
+    def complete_step(self, cid: str) -> None:
+        """Complete the step a receipt belongs to.
+
+        Can be called from any thread.
+
+        Args:
+            cid: Correlation id echoed back in the receipt.
+        """
+        received_at = self.scheduler.clock()
+        self.scheduler.call_soon(lambda: self.__complete_step(cid, received_at))
+
+    def get_round_trip_stats(self) -> dict:
+        """Get how long nodes took to send a receipt for a step.
+
+        Returns:
+            A dictionary with the number of completed steps and the average
+            and maximum time from sending a step to its receipt in
+            milliseconds.
+        """
+        return {
+            "steps": self.round_trips,
+            "avg_ms": self.total_round_trip / max(self.round_trips, 1) * 1e3,
+            "max_ms": self.max_round_trip * 1e3,
+        }
+
+    def get_lane_stats(self) -> dict[str, dict]:
+        """Get queue depth and throughput per node.
+
+        Returns:
+            See :meth:`Lanes.get_stats`.
+        """
+        return self.lanes.get_stats()
+
     def enable(self) -> None:
         """Enable the autonomy."""
         self.is_enabled = True
+        self.notify()
+
+    def notify(self) -> None:
+        """Wake up to work on jobs, e.g. after a receipt.
+
+        Can be called from any thread.
+        """
+        # one posted wake up covers everything which happened before it runs
+        if self.is_work_posted:
+            return
+
+        self.is_work_posted = True
+        self.scheduler.call_soon(self.__work)
+
+    def request_check(self) -> None:
+        """Check interval jobs right away instead of at the next interval.
+
+        Can be called from any thread.
+        """
+        self.scheduler.call_soon(self.__check_interval_jobs)
 
     def disable(self) -> None:
         """Disable the autonomy."""
         self.is_enabled = False
 
     def __delete_job(self, job: Job) -> None:
-        """Delete a job from the list.
+        """Delete a job from its lanes.
 
         Args:
             job: The Job instance to be deleted.
         """
-        self.jobs.remove(job)
+        if job.has_state(EJobState.QUEUED):
+            self.__forget_steps(job)
+
+        for step in job.steps:
+            self.pending.pop(step.cid, None)
+
+        self.lanes.remove(job)
         logging.debug(f"Deleted job {job}")
 
     def __check_lights(self) -> None:
@@ -69,18 +170,19 @@ class Autonomy:
 
         logging.debug(f"current hour {hour}")
 
-        for actuator in self.system.get_actuators():
-            if not actuator.is_type(EntityType.LED):
-                continue
-
-            # TODO: replace with actuator.ruleset
-            if 7 < hour and hour < 21:
-                logging.debug("turn on lights")
-                step = Step(*actuator.get_command(value=1))
-            else:
-                logging.debug("turn off lights")
-                step = Step(*actuator.get_command(value=0))
-
+        # TODO: replace with actuator.ruleset
+        if 7 < hour and hour < 21:
+            logging.debug("turn on lights")
+            value = 1
+        else:
+            logging.debug("turn off lights")
+            value = 0
+
+        # only the lights which are not set to it yet
+        for actuator in self.system.get_table().select(
+            EntityType.LED, differs_from=value
+        ):
+            step = Step(*actuator.get_command(value=value))
             self.__add_job([step])
 
     def __inspect_plants(self) -> None:
@@ -196,9 +298,11 @@ class Autonomy:
 
     def __check_interval_jobs(self):
         """Check interval jobs and queue if necessary."""
-        if self.time < self.last_interval_check + self.interval_check_timeout:
+        if not self.is_enabled:
             return
 
+        self.time = self.scheduler.clock()
+
         logging.info("Checking interval jobs")
         self.__check_lights()
         self.__inspect_plants()
@@ -206,88 +310,171 @@ class Autonomy:
         self.__check_water()
         self.last_interval_check = self.time
 
-    def __has_step_awaited_value(self, step: Step) -> bool:
-        """Check if the step has awaited value.
+    def __complete_step(self, cid: str, received_at: float) -> None:
+        """Move a job on to its next step after the receipt of its step.
 
         Args:
-            step: The Step instance.
-
-        Returns:
-            True if the step has the awaited value, else False.
+            cid: Correlation id echoed back in the receipt.
+            received_at: When the receipt was received.
         """
-        obj = self.system.get_object(step.topic)
+        # stale, duplicate, or for a job which was killed meanwhile
+        if cid not in self.pending:
+            logging.debug(f"Got receipt for unknown step {cid}")
+            return
 
-        if not obj:
-            return False
+        job, step = self.pending.pop(cid)
+        round_trip = received_at - step.time_sent
 
-        # TODO: change after demo
-        # we do not have "value" for plant_mover logic controller
-        if obj.id == "plant_mover":
-            # TODO: change stage to something else
-            # logging.debug(f"checking awaited value {obj.__dict__} {step.__dict__}")
-            return step.data["to"] == obj.data.get("stage")
+        self.round_trips += 1
+        self.total_round_trip += round_trip
+        self.max_round_trip = max(self.max_round_trip, round_trip)
 
-        if obj.id == "plant_information":
-            return step.data["to"] == obj.data.get("to")
+        # wait is time to wait AFTER step is done,
+        # everything else keeps running meanwhile
+        logging.debug(f"Step has finished after {round_trip * 1e3:.1f} ms")
+        job.resume_at = received_at + step.wait
+        job.at_step += 1
 
-        return step.data["value"] == obj.value
+        self.notify()
 
-    def __do_job(self) -> None:
-        """Execute one job at a time, following the FIFO principle."""
-        # we have pending jobs
-        if len(self.jobs) == 0:
-            # logging.debug("No new jobs available")
-            return
+    def __do_job(self, job: Job) -> bool:
+        """Execute a job which is first in all its lanes.
 
-        # we only want to do one job at a time
-        # first job is the one we care about
-        job = self.jobs[0]
+        Args:
+            job: The job, from :meth:`Lanes.get_runnable`.
 
+        Returns:
+            True if something changed and it should be called again,
+            False if it is waiting for a receipt or its wait.
+        """
         # job has been killed -> delete
         if job.has_state(EJobState.KILLED):
             logging.warning("Job has been killed")
             self.__delete_job(job)
-            return
+            return True
 
         if job.has_state(EJobState.DONE):
             # job is done,
             self.__delete_job(job)
-            return
+            return True
 
         # set next job in line to queued->pending
         if job.has_state(EJobState.QUEUED):
+            self.__forget_steps(job)
             job.set_state(EJobState.PENDING)
 
         if job.has_state(EJobState.PENDING):
             # actually do job
             # get step
 
+            # the last step is done, but its wait is not over
+            if job.is_waiting(self.time):
+                return False
+
             # for step in job.steps:
             if job.done_with_steps():
                 logging.debug(f"Done with all steps in job {job=}")
                 job.set_state(EJobState.DONE)
-                return
+                return True
 
             step = job.steps[job.at_step]
 
             if not step.has_sent:
                 # actually do step
-                self.publish(step.topic, step.data)
-                step.sent()
-                return
+                step.cid = f"{self.cid_prefix}{next(self.cids):x}"
+                self.pending[step.cid] = (job, step)
+                self.publish(step.topic, {**step.data, "cid": step.cid})
+                step.sent(self.time)
+                return True
 
-            if step.has_passed_deadline():
+            if step.has_passed_deadline(self.time):
                 job.set_state(EJobState.KILLED)
-                return
+                return True
+
+            # logging.debug(f"Waiting for receipt {step.cid} of {step=}")
+
+        return False
+
+    def __work(self) -> None:
+        """Work on jobs until waiting for a receipt or out of jobs."""
+        self.is_work_posted = False
+
+        if not self.is_enabled:
+            return
+
+        self.time = self.scheduler.clock()
+
+        # a finished job lets the next job in its lanes run
+        has_changed = True
+
+        while has_changed:
+            has_changed = False
+
+            for job in self.lanes.get_runnable():
+                # deleted jobs are no longer in the lanes
+                while job in self.lanes and self.__do_job(job):
+                    has_changed = True
+
+        self.__set_timer()
+
+    def __get_wake_time(self, job: Job) -> float | None:
+        """Get when a running job needs to be looked at again.
+
+        Args:
+            job: A job which is first in all its lanes.
+
+        Returns:
+            When its wait is over or its step passes its deadline,
+            or None if only a receipt can move it on.
+        """
+        if not job.has_state(EJobState.PENDING):
+            return None
+
+        if job.is_waiting(self.time):
+            return job.resume_at
+
+        if job.done_with_steps():
+            return None
+
+        step = job.steps[job.at_step]
 
-            if self.__has_step_awaited_value(step):
-                # wait is time to wait AFTER step is done
-                logging.debug(f"Step has finished!")
-                time.sleep(step.wait)
-                job.at_step += 1
-                return
+        if step.has_sent:
+            return step.timestamp + step.deadline
 
-            # logging.debug(f"Waiting for step {step=} to finish, has been sent")
+        return None
+
+    def __set_timer(self) -> None:
+        """Wake up when the first running job is done waiting or its step
+        passes its deadline."""
+        self.scheduler.cancel(self.timer)
+        self.timer = None
+
+        times = [
+            when
+            for job in self.lanes.get_runnable()
+            if (when := self.__get_wake_time(job)) is not None
+        ]
+
+        if times:
+            self.timer = self.scheduler.call_at(min(times), self.notify)
+
+    def __check_status(self) -> None:
+        """Log status and scheduler stats every status interval."""
+        if self.is_enabled:
+            logging.debug("Autonomy is enabled")
+            logging.debug(f"{self.jobs=}")
+        else:
+            logging.warning("Autonomy is disabled")
+
+        logging.debug(f"Autonomy scheduler {self.scheduler.get_stats()}")
+        logging.debug(f"Autonomy lanes {self.lanes.get_stats()}")
+        logging.debug(f"Autonomy round trips {self.get_round_trip_stats()}")
+        self.scheduler.call_later(self.status_interval, self.__check_status)
+
+    def __check_intervals(self) -> None:
+        """Check interval jobs every interval."""
+        self.__check_interval_jobs()
+        self.scheduler.call_later(self.interval_check_timeout, self.__check_intervals)
 
     def __entity_has_step_value(self, step: Step, entity: Entity) -> bool:
         """Check if the entity has the expected value for the given step.
@@ -299,9 +486,6 @@ class Autonomy:
         Returns:
             True if the entity has the expected value, else False.
         """
-        # TODO: remove
-        print(step.data)
-
         value = step.data.get("value")
 
         if value is None:
@@ -318,24 +502,46 @@ class Autonomy:
         Returns:
             True if the step is already in the queue, else False.
         """
-        for job in self.jobs:
-            # only compare with queued jobs
-            if job.state != EJobState.QUEUED:
-                continue
+        # only steps of queued jobs are kept
+        return step.key in self.queued_steps
 
-            for queued_step in job.steps:
-                # equal means duplicate
-                if str(step) == str(queued_step):
-                    # logging.debug(f"STEP IS ALREADY IN QUEUE {step.__dict__}")
-                    return True
+    def __forget_steps(self, job: Job) -> None:
+        """Forget the steps of a job which is no longer queued.
 
-        return False
+        Args:
+            job: The job.
+        """
+        for step in job.steps:
+            count = self.queued_steps[step.key] - 1
 
-    def __add_job(self, steps: list[Step]) -> None:
+            if count:
+                self.queued_steps[step.key] = count
+            else:
+                del self.queued_steps[step.key]
+
+    def __queue_jobs(self, jobs: list[Job]) -> None:
+        """Add jobs to their lanes and remember the steps of queued jobs.
+
+        Args:
+            jobs: The jobs.
+        """
+        for job in jobs:
+            if job.has_state(EJobState.QUEUED):
+                for step in job.steps:
+                    self.queued_steps[step.key] = self.queued_steps.get(step.key, 0) + 1
+
+            self.lanes.add(job)
+
+        self.notify()
+
+    def __add_job(
+        self, steps: list[Step], priority: EJobPriority = EJobPriority.DEFAULT
+    ) -> None:
         """Add a new job to the job queue.
 
         Args:
             steps: List of Step instances to be included in the new job.
+            priority: Higher priority jobs overtake jobs queued before them.
         """
         # TODO: check if value != current value
         # no need to add job if it already is set to that
@@ -366,27 +572,23 @@ class Autonomy:
         if not steps_to_do:
             return
 
-        job = Job(steps_to_do)
+        # deadlines count from when the step is queued, on our clock
+        for step in steps_to_do:
+            step.timestamp = self.scheduler.clock()
+
+        job = Job(steps_to_do, priority)
         job.set_state(EJobState.QUEUED)
-        self.jobs.append(job)
+        self.__queue_jobs([job])
 
         logging.info(f"Added job!")
 
     def run(self) -> None:
-        """Run the autonomy logic continuously."""
-        while True:
-            self.time = time.time()
-
-            if self.is_enabled:
-                if self.time > self.last_status_print + self.status_interval:
-                    logging.debug("Autonomy is enabled")
-                    logging.debug(f"{self.jobs=}")
-                    self.last_status_print = self.time
-
-                self.__check_interval_jobs()
-                # self.__check_move_plants()
-                self.__do_job()
-            else:
-                logging.warning("Autonomy is disabled")
-
-            time.sleep(self.wait)
+        """Run the autonomy logic until stopped."""
+        self.scheduler.call_soon(self.__check_status)
+        self.scheduler.call_soon(self.__check_intervals)
+        self.notify()
+        self.scheduler.run()
+
+    def stop(self) -> None:
+        """Stop running the autonomy logic."""
+        self.scheduler.stop()
@@ -5,7 +5,41 @@ BROKER_PORT = 1883
 # database
 DATABASE_HOST = "localhost"
 DATABASE_PORT = 27017
+DATABASE_BATCH_SIZE = 500  # measurements and logs per insert
+DATABASE_FLUSH_INTERVAL = 1.0  # longest a measurement or log waits
+DATABASE_MAX_PENDING = 10000  # adding blocks when this many are waiting
+DATABASE_STATE_WINDOW = 0.5  # state changes within this are written together
+MEASUREMENT_RETENTION = 90 * 24 * 60 * 60  # seconds before measurements expire
+ROLLUP_INTERVAL = 10.0  # seconds between writing per minute and hour rollups
+HISTORY_POINTS = 500  # points to aim for when picking a rollup resolution
+
+# floors and stages, relative to where the controller is started
+TOPOLOGY_FILE = "topology.json"
+
+# warm restarts, relative to where the controller is started
+SNAPSHOT_FILE = "snapshot.bin"  # None to disable
+SNAPSHOT_INTERVAL = 30.0  # seconds between snapshots
+SNAPSHOT_GRACE = 60.0  # seconds restored nodes have to present themselves
 
 # specifics
-AUTONOMY_SLEEP = 0.1
 DISALLOWED_KEYS = ["time", "status", "topic"]  # limit payload bandwidth
+
+# message handling
+INGEST_WORKERS = 0  # 0 handles messages in the mqtt thread
+INGEST_QUEUE_SIZE = 1000  # per worker
+TOPIC_CACHE_SIZE = 65536  # parsed topics to remember
+NODE_BUCKETS = 256  # per floor, a changed node copies only its bucket
+
+# subscribe to one wildcard topic per node and kind
+# instead of every topic of every entity
+SUBSCRIBE_WILDCARDS = False
+
+# gui updates
+GUI_SYNC_WINDOW = 0.2  # seconds without changes before publishing
+GUI_SYNC_MAX_LATENCY = 1.0  # longest a change can wait
+# also publish snapshots on the old sync topic without a sequence number,
+# for GUIs which do not read the sequenced deltas yet
+GUI_SYNC_LEGACY = False
+
+# autonomy
+JOB_AGING_SECONDS = 60.0  # head start of a job per priority level
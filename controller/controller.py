@@ -1,18 +1,39 @@
-from .hydroplant import HydroplantSystem, Floor, PlantHolder
+from .hydroplant import Entity, HydroplantSystem, PlantHolder, Topology
 from .autonomy import Autonomy
 from .database import Database
-from .config import BROKER_HOST, BROKER_PORT, AUTONOMY_SLEEP, DISALLOWED_KEYS
+from .config import (
+    BROKER_HOST,
+    BROKER_PORT,
+    DISALLOWED_KEYS,
+    INGEST_WORKERS,
+    INGEST_QUEUE_SIZE,
+    SNAPSHOT_FILE,
+    SNAPSHOT_GRACE,
+    SUBSCRIBE_WILDCARDS,
+    TOPOLOGY_FILE,
+)
+from .ingest import IngestPool, get_ingest_key
+from .router import TopicRouter, route
+from .snapshot import (
+    SnapshotWriter,
+    read_snapshot,
+    restore_entities,
+    restore_jobs,
+    take_snapshot,
+)
+from .subscriptions import Subscriptions
+from .sync import GuiSync
+from .topology import load_topology
 from .topics import *
 from .utils import (
-    get_last_part,
-    get_second_last_part,
     get_floor,
+    get_node_wildcard_topic,
     get_stages,
-    topic_contains,
-    get_unique_id,
+    get_topics_containing,
+    parse_topic,
 )
 
-from threading import Thread
+from threading import RLock, Thread, Timer
 import logging
 import time
 import json
@@ -26,18 +47,24 @@ class Controller:
     database and other logic.
     """
 
-    def __init__(self) -> None:
-        """Initialize the Controller class."""
+    def __init__(
+        self,
+        wildcards: bool = SUBSCRIBE_WILDCARDS,
+        topology_file: str = TOPOLOGY_FILE,
+    ) -> None:
+        """Initialize the Controller class.
+
+        Args:
+            wildcards: Subscribe to wildcard topics per node instead of
+                the topics of every entity.
+            topology_file: JSON file with the floors and stages.
+        """
         self.client = mqtt.Client(client_id="master_controller")
         self.client.will_set(MASTER_DISCONNECT_TOPIC, "")
 
         self.db = Database()
 
-        self.system = HydroplantSystem(
-            Floor("floor_1", "stage_1", "stage_2", "stage_3"),
-            Floor("floor_2", "stage_1", "stage_2", "stage_3"),
-            Floor("floor_3", "stage_1", "stage_2", "stage_3"),
-        )
+        self.system = HydroplantSystem(*load_topology(topology_file))
 
         # add plants for testing purposes
         # full stage 1
@@ -54,9 +81,30 @@ class Controller:
             system=self.system,
             publish_callback=self.publish,
             log_callback=self.log,
-            wait=AUTONOMY_SLEEP,
         )
 
+        # one handler per topic, registered with @route
+        self.router = TopicRouter()
+        self.router.register(self)
+
+        # topics of entities, shared topics are only unsubscribed once unused
+        self.subscriptions = Subscriptions()
+        self.wildcards = wildcards
+
+        # publishes gui topics and changed values, coalesced
+        self.sync = GuiSync(self.publish, self.system.get_gui_topics)
+
+        # only used if run() is given workers
+        self.ingest: IngestPool | None = None
+
+        # ingest workers present and remove nodes one at a time, so the
+        # system, subscriptions and gui topics change together
+        self.topology_lock = RLock()
+
+        # (floor, node_id) restored from a snapshot, until they present themselves
+        self.restored: dict[tuple[str, str], bool] = {}
+        self.snapshots: SnapshotWriter | None = None
+
     def on_connect(self, client, userdata, flags, rc) -> None:
         """Handles MQTT connection to broker and subscribes to needed topics."""
         logging.info(f"Connected to {BROKER_HOST} with result code {rc}")
@@ -65,8 +113,8 @@ class Controller:
         client.subscribe(DEVICE_TOPIC)
 
         # only for demonstration
-        client.subscribe("hydroplant/demo1")
-        client.subscribe("hydroplant/demo2")
+        client.subscribe(DEMO_MOVE_TOPIC)
+        client.subscribe(DEMO_INSPECT_TOPIC)
 
         # subscribing to
         client.subscribe(AUTONOMY_TOPIC)
@@ -79,84 +127,170 @@ class Controller:
         # subscribe to logging
         client.subscribe(LOG_TOPIC)
 
+        # gui missed a sync delta
+        client.subscribe(SYNC_REQUEST_TOPIC)
+
+        # entities we knew of before reconnecting
+        topics = self.subscriptions.get_topics()
+
+        if topics:
+            client.subscribe([(topic, 0) for topic in topics])
+
     def on_message(self, client, userdata, msg) -> None:
-        """Handles MQTT messages."""
-        topic: str = msg.topic
+        """Handles MQTT messages.
+
+        With an ingest pool the message is only queued, so the MQTT
+        network thread never waits for handling.
+        """
+        if self.ingest is None:
+            self.__handle_message(msg.topic, msg.payload)
+            return
 
-        if not msg.payload:
-            msg.payload = "{}"
+        key = get_ingest_key(msg.topic, msg.payload)
+        self.ingest.submit(key, msg.topic, msg.payload)
+
+    def get_ingest_stats(self) -> dict:
+        """Get queue depth and counters of the ingest pool.
+
+        Returns:
+            Stats from the ingest pool, or an empty dictionary if messages
+            are handled in the MQTT thread.
+        """
+        if self.ingest is None:
+            return {}
+
+        return self.ingest.get_stats()
+
+    def __handle_message(self, topic: str, payload: bytes) -> None:
+        """Decode a message and call the handler for its topic.
+
+        Args:
+            topic: MQTT topic of the message.
+            payload: Raw MQTT payload.
+        """
+        if not payload:
+            payload = "{}"
 
         # logging.debug(f"{topic=}")
-        # logging.debug(f"{msg.payload}")
+        # logging.debug(f"{payload}")
 
-        logging.debug(f"<- {topic} {msg.payload}")
+        logging.debug(f"<- {topic} {payload}")
 
         try:
-            data: dict = json.loads(msg.payload)
+            data: dict = json.loads(payload)
         except json.decoder.JSONDecodeError:
             logging.error("Could not decode JSON!")
             return
 
         data["time"] = time.time()  # add time for later checks
 
-        node_id = get_second_last_part(topic)
-        last_part = get_last_part(topic)
-
-        logging.debug(f"{topic=} {last_part=} {node_id=} {data=}")
+        logging.debug(f"{topic=} {data=}")
 
         self.log(0, "received a message!")
 
-        # device wants to know if we are online
-        if topic_contains(topic, "is_ready"):
-            # publish we are ready
-            self.publish(READY_TOPIC, "")
-            return
+        if not self.router.dispatch(topic, data):
+            logging.debug(f"No handler for {topic}")
 
-        # ok
+        # TODO: do we need this?
+        # sensor measurement
+        # if topic_contains(topic, "measurement"):
+        #     logging.info("Got new sensor measurement")
 
-        # demonstration purposes
-        if topic_contains(topic, "hydroplant/demo1"):
-            self.autonomy.moved_demo_plants = False
+        #     sensor_id = get_last_part(topic)
+        #     self.db.add_measurement(node_id, sensor_id, data)
 
-        if topic_contains(topic, "hydroplant/demo2"):
-            self.autonomy.inspected_demo_plants = False
+    @route(IS_READY_TOPIC)
+    def __handle_is_ready(self, topic: str, data: dict) -> None:
+        """Tell a device which wants to know if we are online that we are ready.
 
-        if topic_contains(topic, "disconnected"):
-            node_id = data["device_id"]
-            floor_name = data.get("floor")
+        Args:
+            topic: MQTT topic of the message.
+            data: Message data.
+        """
+        self.publish(READY_TOPIC, "")
+
+    # demonstration purposes
+    @route(DEMO_MOVE_TOPIC)
+    def __handle_demo_move(self, topic: str, data: dict) -> None:
+        """Let autonomy move the demo plants again.
+
+        Args:
+            topic: MQTT topic of the message.
+            data: Message data.
+        """
+        self.autonomy.moved_demo_plants = False
+        self.autonomy.request_check()
+
+    @route(DEMO_INSPECT_TOPIC)
+    def __handle_demo_inspect(self, topic: str, data: dict) -> None:
+        """Let autonomy inspect the demo plants again.
+
+        Args:
+            topic: MQTT topic of the message.
+            data: Message data.
+        """
+        self.autonomy.inspected_demo_plants = False
+        self.autonomy.request_check()
 
-            logging.warning(f"{node_id} disconnected")
-            self.log(1, f"{node_id} disconnected")
+    @route(DEVICES_DISCONNECT_TOPIC)
+    def __handle_disconnect(self, topic: str, data: dict) -> None:
+        """Delete the objects of a disconnected device and update the GUI.
 
+        Args:
+            topic: MQTT topic of the message.
+            data: Message data containing device_id and floor.
+        """
+        node_id = data["device_id"]
+        floor_name = data.get("floor")
+
+        logging.warning(f"{node_id} disconnected")
+        self.log(1, f"{node_id} disconnected")
+        self.__remove_node(node_id, floor_name)
+
+    def __remove_node(self, node_id: str, floor_name: str | None) -> None:
+        """Delete the objects of a node, unsubscribe and update the GUI.
+
+        Args:
+            node_id: ID of the node.
+            floor_name: Floor of the node, or None for every floor.
+        """
+        with self.topology_lock:
             unsubscribe_topics = self.system.delete_objects(node_id, floor_name)
             self.__act_on_topics(False, *unsubscribe_topics)
 
-            self.publish(GUI_TOPICS, {"topics": self.system.get_gui_topics()})
-            self.publish(SYNC_TOPIC, self.system.get_gui_sync_data())
-            return
+            self.sync.update_topics()
+            self.sync.update(
+                removed=get_topics_containing(unsubscribe_topics, GUI_COMMAND)
+            )
 
-        if topic_contains(topic, "device"):
-            logging.info("Got device message")
-            self.__setup_device(data)
+    @route(DEVICE_TOPIC)
+    def __handle_device(self, topic: str, data: dict) -> None:
+        """Set up a device which presented itself.
 
-        if topic_contains(topic, "gui_command"):
-            logging.info("Got command from GUI")
+        Args:
+            topic: MQTT topic of the message.
+            data: Message data describing the device.
+        """
+        logging.info("Got device message")
+        self.__setup_device(data)
 
-            self.__handle_gui_command(topic, data)
+    @route(LOGIC_CONTROLLER_RECEIPT_TOPIC, ACTUATOR_RECEIPT_TOPIC)
+    def __handle_receipt(self, topic: str, data: dict) -> None:
+        """Update the state given a receipt from a device.
 
-        # check receipt
-        if topic_contains(topic, "receipt"):
-            logging.info("Got a receipt")
+        Args:
+            topic: MQTT topic of the receipt.
+            data: Receipt data.
+        """
+        logging.info("Got a receipt")
 
-            self.__update_and_publish_state(topic, data)
+        # only for autonomy, not part of the state
+        cid = data.pop("cid", None)
 
-        # TODO: do we need this?
-        # sensor measurement
-        # if topic_contains(topic, "measurement"):
-        #     logging.info("Got new sensor measurement")
+        self.__update_and_publish_state(topic, data)
 
-        #     sensor_id = get_last_part(topic)
-        #     self.db.add_measurement(node_id, sensor_id, data)
+        if cid is not None:
+            self.autonomy.complete_step(cid)
 
     def publish(self, topic: str, data: dict | list) -> None:
         """Publish a message to a topic over MQTT.
@@ -207,22 +341,53 @@ class Controller:
             topic: MQTT topic of the receipt.
             data: Receipt data.
         """
-        topic = topic.replace("/receipt", "")
-        # unique id is floor_1/stage_1/climate_node/LED
-        unique_id = get_unique_id(topic)
+        obj = self.system.get_object(topic)
+
+        # wildcard subscriptions can deliver parts we do not know of
+        if obj is None:
+            logging.warning(f"Got receipt for unknown {topic}")
+            return
 
-        obj = self.system.get_object_from_unique_id(unique_id)
         obj.set_data(data)
 
         # e.g. plant information node with max_stages
         if obj.get_value() is None:
             return
 
-        current_state = self.system.get_state()
-        self.db.update_state(current_state)
+        # unique id is floor_1/stage_1/climate_node/LED
+        self.db.update_state({obj.unique_id: obj.get_value()})
+
+        self.sync.update({obj.gui_topic: obj.get_value()})
 
-        self.publish(SYNC_TOPIC, self.system.get_gui_sync_data())
+    @route(SYNC_REQUEST_TOPIC)
+    def __handle_sync_request(self, topic: str, data: dict) -> None:
+        """Publish a full snapshot for a GUI which missed a delta.
 
+        Args:
+            topic: MQTT topic of the request.
+            data: Request data.
+        """
+        logging.info("GUI requested a full sync")
+        self.sync.publish_snapshot()
+
+    @route(AUTONOMY_TOPIC)
+    def __handle_autonomy_command(self, topic: str, data: dict) -> None:
+        """Turn autonomy on or off from the GUI.
+
+        Args:
+            topic: MQTT topic of the GUI command.
+            data: GUI command data.
+        """
+        if data["value"]:
+            self.autonomy.enable()
+            logging.info("GUI turned autonomy on")
+            self.log(1, "Autonomy turned on")
+        else:
+            self.autonomy.disable()
+            logging.warning("GUI turned autonomy off")
+            self.log(1, "Autonomy turned off")
+
+    @route(GUI_COMMAND + "#")
     def __handle_gui_command(self, topic: str, data: dict) -> None:
         """Handle a GUI command and perform the necessary actions.
 
@@ -230,42 +395,49 @@ class Controller:
             topic: MQTT topic of the GUI command.
             data: GUI command data.
         """
-        # turn on or off autonomy from gui
-        if topic == AUTONOMY_TOPIC:
-            if data["value"]:
-                self.autonomy.enable()
-                logging.info("GUI turned autonomy on")
-                self.log(1, "Autonomy turned on")
-            else:
-                self.autonomy.disable()
-                logging.warning("GUI turned autonomy off")
-                self.log(1, "Autonomy turned off")
+        logging.info("Got command from GUI")
 
-            return
+        obj = self.system.get_object(topic)
 
-        unique_id = get_unique_id(topic)
+        if obj is None:
+            logging.warning(f"Got GUI command for unknown {topic}")
+            return
 
-        command = self.system.get_object(unique_id).get_command(**data)
+        command = obj.get_command(**data)
 
         # logging.debug(f"{command=}")
 
         self.publish(*command)
 
     def __act_on_topics(self, subscribe: bool, *args) -> None:
-        """Adds topics to global lists of all topics and devices, and
-        subscribes to them.
+        """Subscribes or unsubscribes to topics of entities.
+
+        Topics are reference counted, and all topics which need to change
+        are sent in a single SUBSCRIBE or UNSUBSCRIBE packet.
 
         Args:
-            device: A device topic which must be formattable
-            *args: Strings which also should be subscribed to
+            subscribe: True to subscribe, False to unsubscribe.
+            *args: Topics of entities, one for each reference.
         """
-        for topic in args:
-            if subscribe:
-                self.client.subscribe(topic)
-                logging.info(f"Subscribed to {topic}")
-            else:
-                self.client.unsubscribe(topic)
-                logging.info(f"Unsubscribed to {topic}")
+        topics = list(args)
+
+        if self.wildcards:
+            topics = [get_node_wildcard_topic(topic) for topic in topics]
+
+        if subscribe:
+            topics = self.subscriptions.acquire(topics)
+        else:
+            topics = self.subscriptions.release(topics)
+
+        if not topics:
+            return
+
+        if subscribe:
+            self.client.subscribe([(topic, 0) for topic in topics])
+            logging.info(f"Subscribed to {topics}")
+        else:
+            self.client.unsubscribe(topics)
+            logging.info(f"Unsubscribed to {topics}")
 
     def __handle_device_present(self, data: dict, node_id: str) -> list[str]:
         """Handle the presence of a device and return a list of new unique IDs.
@@ -282,41 +454,132 @@ class Controller:
         # a device can only be on 1 floor
         floor_name = get_floor(data)
 
-        # disconnect does publish fast enough so in case something
-        # connects before it is disconnected we need to delete it
-        self.system.delete_objects(node_id, floor_name)
-
-        # get the relevant floor
-        floor = self.system.get_floor_by_name(floor_name)
-        unique_ids = []
-        # floor/(stage)/node/part
+        # entities restored from a snapshot keep their last data
+        is_restored = self.restored.pop((floor_name, node_id), False)
+        last_topology = self.system.get_topology()
 
-        for logic_controller in data[floor_name].get("logic_controllers", []):
-            unique_id = f"{floor_name}/{node_id}/{logic_controller}"
-            unique_ids.append(unique_id)
+        # publish the new topology once, so readers never see the node half gone
+        with self.system.batch():
+            # disconnect does publish fast enough so in case something
+            # connects before it is disconnected we need to delete it
+            old_topics = self.system.delete_objects(node_id, floor_name)
+            gui_values = {}
 
-            obj = floor.add_logic_controller(unique_id)
-            new_topics += obj.get_subscribe_topics()
+            unique_ids = []
+            # floor/(stage)/node/part
 
-        stages = get_stages(floor_name, data)
+            for logic_controller in data[floor_name].get("logic_controllers", []):
+                unique_id = f"{floor_name}/{node_id}/{logic_controller}"
+                unique_ids.append(unique_id)
 
-        for stage_name in stages:
-            stage = floor.get_stage_by_name(stage_name)
+                obj = self.system.add_logic_controller(unique_id)
 
-            for actuator in data[floor_name][stage_name].get("actuators", []):
-                unique_id = f"{floor_name}/{stage_name}/{node_id}/{actuator}"
-                unique_ids.append(unique_id)
+                if is_restored:
+                    self.__keep_data(last_topology, obj)
 
-                obj = stage.add_actuator(unique_id)
                 new_topics += obj.get_subscribe_topics()
+                gui_values[obj.gui_topic] = obj.get_value()
+
+            stages = get_stages(floor_name, data)
+
+            for stage_name in stages:
+                for actuator in data[floor_name][stage_name].get("actuators", []):
+                    unique_id = f"{floor_name}/{stage_name}/{node_id}/{actuator}"
+                    unique_ids.append(unique_id)
+
+                    obj = self.system.add_actuator(unique_id)
+
+                    if is_restored:
+                        self.__keep_data(last_topology, obj)
 
-            for sensor in data[floor_name][stage_name].get("sensors", []):
-                # TODO: do we actually need this?
-                pass
+                    new_topics += obj.get_subscribe_topics()
+                    gui_values[obj.gui_topic] = obj.get_value()
 
+                for sensor in data[floor_name][stage_name].get("sensors", []):
+                    # TODO: do we actually need this?
+                    pass
+
+        # subscribe first, so topics this node still has stay subscribed
         self.__act_on_topics(True, *new_topics)
+        self.__act_on_topics(False, *old_topics)
+        self.sync.update(gui_values, get_topics_containing(old_topics, GUI_COMMAND))
         return unique_ids
 
+    def __keep_data(self, topology: Topology, entity: Entity) -> None:
+        """Give an entity the data of the entity it replaces.
+
+        Args:
+            topology: Topology from before the entity was replaced.
+            entity: The new entity.
+        """
+        old = topology.entities.get(entity.unique_id)
+
+        if old is not None and old.get_data():
+            entity.set_data(dict(old.get_data()))
+
+    def __restore_snapshot(self, path: str, grace: float) -> None:
+        """Restore entities and jobs from the last snapshot.
+
+        Nodes which do not present themselves within the grace period
+        are removed again.
+
+        Args:
+            path: Path of the snapshot file.
+            grace: Seconds restored nodes have to present themselves.
+        """
+        try:
+            snapshot = read_snapshot(path)
+        except (OSError, ValueError):
+            logging.exception(f"Could not read snapshot {path}, starting empty")
+            return
+
+        if snapshot is None:
+            logging.info(f"No snapshot at {path}, starting empty")
+            return
+
+        entities = restore_entities(self.system, snapshot)
+        jobs = restore_jobs(snapshot, self.autonomy.scheduler.clock())
+        self.autonomy.add_jobs(jobs)
+
+        topics = []
+
+        for entity in entities:
+            topics += entity.get_subscribe_topics()
+            self.restored[(entity.floor, entity.node_id)] = True
+
+        self.__act_on_topics(True, *topics)
+        self.sync.update({entity.gui_topic: entity.get_value() for entity in entities})
+        self.sync.update_topics()
+
+        timer = Timer(grace, self.__remove_stale_nodes)
+        timer.daemon = True
+        timer.start()
+
+        age = time.time() - snapshot["time"]
+        logging.info(
+            f"Restored {len(entities)} entities and {len(jobs)} jobs"
+            f" from a snapshot taken {age:.0f} seconds ago"
+        )
+
+    def __remove_stale_nodes(self) -> None:
+        """Remove restored nodes which did not present themselves."""
+        # a node presenting itself meanwhile must not be removed after it
+        with self.topology_lock:
+            for floor_name, node_id in list(self.restored):
+                if not self.restored.pop((floor_name, node_id), False):
+                    continue
+
+                logging.warning(f"{node_id} did not present itself after restart")
+                self.__remove_node(node_id, floor_name)
+
+    def __take_snapshot(self) -> dict:
+        """Get a snapshot of the system and pending jobs.
+
+        Returns:
+            Snapshot data.
+        """
+        return take_snapshot(self.system, self.autonomy.jobs)
+
     def __publish_last_states(self, unique_ids: list[str]) -> None:
         """Publish the last known states for a list of unique IDs.
 
@@ -349,19 +612,52 @@ class Controller:
 
         if node_id == "gui":
             logging.info("GUI connected")
-        else:
+            self.sync.publish_snapshot()
+            self.sync.update_topics()
+            return
+
+        with self.topology_lock:
             # other nodes has interesting data
             unique_ids = self.__handle_device_present(data, node_id)
 
             # set state to the last one we knew of
             self.__publish_last_states(unique_ids)
 
-        # update gui with all topics (will only happen when something connects)
-        self.publish(GUI_TOPICS, {"topics": self.system.get_gui_topics()})
-        self.publish(SYNC_TOPIC, self.system.get_gui_sync_data())
+            # update gui with all topics (will only happen when something connects)
+            self.sync.update_topics()
+
+    def run(
+        self,
+        workers: int = INGEST_WORKERS,
+        queue_size: int = INGEST_QUEUE_SIZE,
+        snapshot_file: str | None = SNAPSHOT_FILE,
+        snapshot_grace: float = SNAPSHOT_GRACE,
+    ) -> None:
+        """Start the master-controller and keep it running indefinitely.
+
+        Args:
+            workers: Number of threads handling messages. With 0 messages
+                are handled in the MQTT network thread.
+            queue_size: Maximum number of waiting messages per worker.
+            snapshot_file: File to restore from at startup and save
+                snapshots to, or None to start empty.
+            snapshot_grace: Seconds restored nodes have to present
+                themselves before they are removed.
+        """
+        if workers > 0:
+            self.ingest = IngestPool(self.__handle_message, workers, queue_size)
+            self.ingest.start()
+            logging.info(f"Handling messages with {workers} workers")
+
+        self.db.setup_collections()
+
+        # read the last known state before devices present themselves
+        self.db.reload_state()
+
+        if snapshot_file:
+            self.__restore_snapshot(snapshot_file, snapshot_grace)
+            self.snapshots = SnapshotWriter(snapshot_file, self.__take_snapshot)
 
-    def run(self) -> None:
-        """Start the master-controller and keep it running indefinitely."""
         self.client.on_connect = self.on_connect
         self.client.on_message = self.on_message
         self.client.connect(BROKER_HOST, BROKER_PORT, 60)
@@ -378,6 +674,24 @@ class Controller:
         logging.debug("Starting autonomy")
 
         # self.autonomy.disable()  # disable while we test
-        self.autonomy.run()
+        try:
+            self.autonomy.run()
+            communication.join()
+        finally:
+            if self.ingest is not None:
+                self.ingest.stop()
+
+            self.autonomy.stop()
+
+            # publish the last GUI changes while we are still connected
+            self.sync.stop()
+
+            if self.snapshots is not None:
+                self.snapshots.close()
+
+            self.db.close()
 
-        communication.join()
+            # the will is not sent when we disconnect ourselves
+            self.client.publish(MASTER_DISCONNECT_TOPIC, "")
+            self.client.disconnect()
+            communication.join()
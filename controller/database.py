@@ -1,8 +1,20 @@
-from .config import DATABASE_HOST, DATABASE_PORT
+from .config import (
+    DATABASE_HOST,
+    DATABASE_PORT,
+    MEASUREMENT_RETENTION,
+    HISTORY_POINTS,
+)
+from .rollup import RESOLUTIONS, Rollup, pick_resolution
+from .writer import BatchWriter, RollupWriter, StateWriter
 
+from threading import Lock
+from types import MappingProxyType
+import datetime as dt
 import logging
+import time
 
-from pymongo import MongoClient, collection
+from pymongo import ASCENDING, MongoClient, collection
+from pymongo.errors import OperationFailure
 
 
 class Database:
@@ -23,24 +35,219 @@ class Database:
         self.state = self.db["state"]
         self.logs = self.db["logs"]
 
+        # written in batches from background threads
+        self.__measurement_writer = BatchWriter(self.measurement)
+        self.__log_writer = BatchWriter(self.logs)
+        self.__state_writer = StateWriter(self.state)
+
+        # per minute and per hour aggregates of measurements
+        self.__rollup = Rollup()
+        self.__rollup_writer = RollupWriter(self.db, self.__rollup)
+
+        # read on first use, written through to the database
+        self.__state_cache: dict | None = None
+        self.__state_lock = Lock()
+
     def add_measurement(self, node_id: str, sensor_id: str, data: dict) -> None:
         """Insert a measurement into the database.
 
+        The measurement is written in a batch, and this blocks if too many
+        measurements are waiting to be written.
+
         Args:
             node_id: Name of the node.
             sensor_id: Name of the sensor.
-            data: Data to be added; time will also be added to the measurement.
+            data: Data to be added; `time` is used as timestamp and
+                `floor` is stored with node and sensor.
         """
-        data["node_id"] = node_id
-        data["sensor_id"] = sensor_id
+        data = data.copy()
+        timestamp = data.pop("time", None) or time.time()
+
+        document = {
+            "timestamp": dt.datetime.fromtimestamp(timestamp, dt.timezone.utc),
+            "meta": {
+                "node_id": node_id,
+                "sensor_id": sensor_id,
+                "floor": data.pop("floor", None),
+            },
+            **data,
+        }
+
+        self.__measurement_writer.put(document)
+        self.__rollup.add(node_id, sensor_id, timestamp, data.get("value"))
+        logging.debug(f"Added to measurement {document=}")
+
+    def get_measurements(
+        self,
+        sensor_id: str,
+        start: dt.datetime,
+        end: dt.datetime | None = None,
+        node_id: str | None = None,
+        floor: str | None = None,
+    ) -> list[dict]:
+        """Get measurements of a sensor within a time range.
+
+        E.g. the last 24 hours of pH on floor_2:
+        `get_measurements("ph", now - dt.timedelta(hours=24), floor="floor_2")`
+
+        Args:
+            sensor_id: Name of the sensor.
+            start: Start of the range, inclusive.
+            end: End of the range, exclusive. Defaults to now.
+            node_id: Only measurements from this node.
+            floor: Only measurements from this floor.
+
+        Returns:
+            The measurements, oldest first.
+        """
+        query = {
+            "meta.sensor_id": sensor_id,
+            "timestamp": {
+                "$gte": start,
+                "$lt": end or dt.datetime.now(dt.timezone.utc),
+            },
+        }
+
+        if node_id:
+            query["meta.node_id"] = node_id
+
+        if floor:
+            query["meta.floor"] = floor
+
+        return list(
+            self.measurement.find(query, {"_id": False}).sort("timestamp", ASCENDING)
+        )
+
+    def get_history(
+        self,
+        sensor_id: str,
+        start: dt.datetime,
+        end: dt.datetime | None = None,
+        node_id: str | None = None,
+        step: float | None = None,
+    ) -> list[dict]:
+        """Get the history of a sensor at the coarsest fitting resolution.
+
+        Per hour or per minute rollups are used when they are at least as
+        fine as `step`, otherwise raw measurements.
+
+        Args:
+            sensor_id: Name of the sensor.
+            start: Start of the range, inclusive.
+            end: End of the range, exclusive. Defaults to now.
+            node_id: Only measurements from this node.
+            step: Wanted seconds between points. Defaults to the range
+                divided by `HISTORY_POINTS`.
+
+        Returns:
+            Points with node_id, timestamp, min, max, mean and count,
+            oldest first.
+        """
+        end = end or dt.datetime.now(dt.timezone.utc)
+
+        if step is None:
+            step = (end - start).total_seconds() / HISTORY_POINTS
+
+        resolution = pick_resolution(step)
 
-        self.measurement.insert_one(data)
-        logging.debug(f"Added to measurement {data=}")
+        if not resolution:
+            return [
+                {
+                    "node_id": measurement["meta"]["node_id"],
+                    "timestamp": measurement["timestamp"],
+                    "min": measurement.get("value"),
+                    "max": measurement.get("value"),
+                    "mean": measurement.get("value"),
+                    "count": 1,
+                }
+                for measurement in self.get_measurements(
+                    sensor_id, start, end, node_id=node_id
+                )
+            ]
+
+        query = {
+            "meta.sensor_id": sensor_id,
+            "timestamp": {"$gte": start, "$lt": end},
+        }
+
+        if node_id:
+            query["meta.node_id"] = node_id
+
+        cursor = (
+            self.db[RESOLUTIONS[resolution]].find(query).sort("timestamp", ASCENDING)
+        )
+
+        return [
+            {
+                "node_id": bucket["meta"]["node_id"],
+                "timestamp": bucket["timestamp"],
+                "min": bucket["min"],
+                "max": bucket["max"],
+                "mean": bucket["sum"] / bucket["count"],
+                "count": bucket["count"],
+            }
+            for bucket in cursor
+        ]
+
+    def setup_collections(self) -> None:
+        """Create the measurement and rollup collections and indexes if missing.
+
+        Measurements are stored in a time-series collection keyed on node
+        and sensor, which MongoDB buckets by time. Servers older than
+        MongoDB 5.0 get a plain collection with the same layout and a TTL
+        index. Both expire measurements after `MEASUREMENT_RETENTION`.
+        """
+        if "measurements" not in self.db.list_collection_names():
+            try:
+                self.db.create_collection(
+                    "measurements",
+                    timeseries={
+                        "timeField": "timestamp",
+                        "metaField": "meta",
+                        "granularity": "seconds",
+                    },
+                    expireAfterSeconds=MEASUREMENT_RETENTION,
+                )
+                logging.info("Created time-series collection for measurements")
+            except OperationFailure:
+                logging.warning("Time-series collections are not supported")
+
+        if "timeseries" not in self.measurement.options():
+            self.measurement.create_index(
+                [("timestamp", ASCENDING)], expireAfterSeconds=MEASUREMENT_RETENTION
+            )
+
+        # e.g. pH on floor_2, or everything from one node
+        self.measurement.create_index(
+            [
+                ("meta.sensor_id", ASCENDING),
+                ("meta.floor", ASCENDING),
+                ("timestamp", ASCENDING),
+            ]
+        )
+        self.measurement.create_index(
+            [
+                ("meta.node_id", ASCENDING),
+                ("meta.sensor_id", ASCENDING),
+                ("timestamp", ASCENDING),
+            ]
+        )
+
+        # one document per node, sensor and bucket
+        for name in RESOLUTIONS.values():
+            self.db[name].create_index(
+                [
+                    ("meta.sensor_id", ASCENDING),
+                    ("meta.node_id", ASCENDING),
+                    ("timestamp", ASCENDING),
+                ],
+                unique=True,
+            )
 
     def add_log(self, node_id: str, sensor_id: str, data: dict) -> None:
         """Insert a log entry into the database.
 
-        Used for logging.
+        Used for logging. The entry is written in a batch like measurements.
 
         Args:
             node_id: Name of the node.
@@ -50,10 +257,53 @@ class Database:
         data["node_id"] = node_id
         data["sensor_id"] = sensor_id
 
-        self.logs.insert_one(data)
+        self.__log_writer.put(data)
         logging.debug(f"Added to logs {data=}")
 
-    def get_state(self) -> dict:
+    def get_state(self) -> MappingProxyType:
+        """Get the current state.
+
+        The state is read from the database the first time, and served from
+        memory after that.
+
+        Returns:
+            A read-only view of the current state.
+        """
+        state = self.__state_cache
+
+        if state is None:
+            state = self.__load_state()
+
+        return MappingProxyType(state)
+
+    def reload_state(self) -> None:
+        """Read the state from the database again.
+
+        Used when something else has written to the state collection.
+        Changes made before are written first, so they are kept.
+        """
+        self.__load_state()
+
+    def invalidate_state(self) -> None:
+        """Read the state from the database the next time it is needed."""
+        with self.__state_lock:
+            self.__state_cache = None
+
+    def __load_state(self) -> dict:
+        """Write waiting changes, then read the state into memory.
+
+        Updates wait until the state is read, so none of them are lost
+        between writing and reading.
+
+        Returns:
+            The state which is now in memory.
+        """
+        with self.__state_lock:
+            self.__state_writer.flush()
+            self.__state_cache = self.__read_state()
+            return self.__state_cache
+
+    def __read_state(self) -> dict:
         """Retrieve the current state from the database.
 
         Returns:
@@ -65,25 +315,45 @@ class Database:
             result = {}
 
         # mongo db adds this
-        del result["_id"]
+        result.pop("_id", None)
+
+        logging.debug(f"Read state with {len(result)} keys")
 
         return result
 
-    def update_state(self, state: dict) -> None:
-        """Update the state in the database.
+    def update_state(self, changes: dict) -> None:
+        """Update changed values in the state.
+
+        The state in memory is updated right away. In the database only the
+        given keys are written, with a `$set` on the state document, from a
+        background thread. Changes coming shortly after each other are
+        written together, keeping the last value of each key.
 
         Args:
-            state: The new state to be updated.
+            changes: Unique ids mapped to their new value.
         """
-        data = self.get_state()
+        # queued under the lock, so a reload writes it before reading
+        with self.__state_lock:
+            if self.__state_cache is not None:
+                self.__state_cache.update(changes)
+
+            self.__state_writer.update(changes)
 
-        # only the case if collection is empty
-        if not data:
-            self.state.insert_one(state)
-            return
+    def flush(self) -> None:
+        """Write all waiting measurements, logs and state changes right away."""
+        self.__measurement_writer.flush()
+        self.__log_writer.flush()
+        self.__state_writer.flush()
+        self.__rollup_writer.flush()
 
-        self.state.replace_one(data, state)
-        logging.debug(f"Updated state from {data=} to {state=}")
+    def close(self) -> None:
+        """Write everything waiting and close the connection."""
+        self.__measurement_writer.close()
+        self.__log_writer.close()
+        self.__state_writer.close()
+        self.__rollup_writer.close()
+        self.__client.close()
+        logging.info("Closed database")
 
 
 """
@@ -1,12 +1,20 @@
+from .config import NODE_BUCKETS
+from .table import StateTable
 from .utils import (
     get_floor_from_topic,
     get_stage_from_topic,
-    get_unique_id,
-    get_last_part,
-    get_second_last_part,
-    is_receipt,
+    parse_topic,
 )
 
+from contextlib import contextmanager
+from dataclasses import dataclass
+from sys import intern
+from threading import RLock
+from types import MappingProxyType
+from typing import Callable, Iterator
+from collections.abc import Mapping
+from functools import cached_property
+from itertools import chain
 from enum import IntEnum
 import logging
 
@@ -28,8 +36,58 @@ class EntityType(IntEnum):
     WATER_CIRC = 14
 
 
+# entity id mapped to its type, shared by every entity with that id
+ENTITY_TYPES: dict[str, EntityType] = {}
+
+# entities get their data set on the first receipt, until then they share this
+NO_DATA = MappingProxyType({})
+# default of lookups, since None is a value
+MISSING = object()
+
+
+def get_entity_type(entity_id: str) -> EntityType:
+    """Get the type of an entity from its id.
+
+    Args:
+        entity_id: Last part of a unique ID, e.g. "LED".
+
+    Returns:
+        The matching EntityType.
+
+    Raises:
+        KeyError: If there is no such type.
+    """
+    entity_type = ENTITY_TYPES.get(entity_id)
+
+    if entity_type is None:
+        entity_type = EntityType[entity_id.upper()]
+        ENTITY_TYPES[entity_id] = entity_type
+
+    return entity_type
+
+
 class Entity:
-    """Base class for different entities in the Hydroplant system."""
+    """Base class for different entities in the Hydroplant system.
+
+    Entities use slots instead of a `__dict__`, since a farm can have tens
+    of thousands of them. Names which are the same for many entities, like
+    floor, stage, node and id, are interned so every entity shares one copy.
+    """
+
+    __slots__ = (
+        "unique_id",
+        "value",
+        "data",
+        "listener",
+        "command",
+        "receipt",
+        "gui_topic",
+        "id",
+        "floor",
+        "stage",
+        "node_id",
+        "type",
+    )
 
     def __init__(self, unique_id: str) -> None:
         """Initialize an Entity instance.
@@ -42,19 +100,22 @@ class Entity:
         self.unique_id = unique_id
 
         self.value = None
-        self.data = {}
+        self.data = NO_DATA
+        # called with the entity when its data is set
+        self.listener: Callable[[Entity], None] | None = None
 
-        self.topic = "hydroplant/{}/" + unique_id
-        self.command = self.topic.format("command")
+        self.command = "hydroplant/command/" + unique_id
         self.receipt = self.command + "/receipt"
-        self.gui_topic = self.topic.format("gui_command")
+        self.gui_topic = "hydroplant/gui_command/" + unique_id
 
-        self.id = get_last_part(unique_id)
-        self.floor = get_floor_from_topic(unique_id)
-        self.stage = get_stage_from_topic(unique_id)  # could be ""
-        self.node_id = get_second_last_part(unique_id)
+        # not parse_topic, its cache is for topics which come again
+        parts = unique_id.split("/")
+        self.id = intern(parts[-1])
+        self.floor = intern(parts[0])
+        self.stage = intern(parts[1] if "stage" in parts[1] else "")  # could be ""
+        self.node_id = intern(parts[-2])
 
-        self.type = EntityType[self.id.upper()]
+        self.type = get_entity_type(self.id)
 
         # logging.debug(f"created object for {unique_id=}")
 
@@ -105,6 +166,9 @@ class Entity:
         self.data = data
         self.value = data.get("value")
 
+        if self.listener is not None:
+            self.listener(self)
+
     def get_data(self) -> dict:
         """Get the data for the entity.
 
@@ -113,6 +177,11 @@ class Entity:
         """
         return self.data
 
+    @property
+    def topic(self) -> str:
+        """Topic template for the entity, only built when asked for."""
+        return "hydroplant/{}/" + self.unique_id
+
     def get_topic(self) -> str:
         """Get the MQTT topic for the entity.
 
@@ -141,6 +210,8 @@ class Entity:
 class LogicController(Entity):
     """Class representing a logic controller entity."""
 
+    __slots__ = ()
+
     def __init__(self, unique_id: str) -> None:
         """Initialize a LogicController instance.
 
@@ -153,6 +224,8 @@ class LogicController(Entity):
 class Actuator(Entity):
     """Class representing an actuator entity."""
 
+    __slots__ = ()
+
     def __init__(self, unique_id: str) -> None:
         """Initialize an Actuator instance.
 
@@ -201,14 +274,16 @@ class Stage:
     """Class representing a stage in the Hydroplant system."""
 
     # stage_1
-    def __init__(self, name: str) -> None:
+    def __init__(self, name: str, capacity: int = 0) -> None:
         """Initialize a Stage instance.
 
         Args:
             name: The name of the stage.
+            capacity: How many plant holders fit in the stage.
         """
         self.name = name
-        self.actuators: list[Actuator] = []
+        self.capacity = capacity
+        self.actuators: dict[str, Actuator] = {}
         self.plant_holders: list[PlantHolder] = []
 
     def get_plant_holders(self) -> list[PlantHolder]:
@@ -229,9 +304,17 @@ class Stage:
             The added actuator.
         """
         actuator = Actuator(unique_id)
-        self.actuators.append(actuator)
+        self.actuators[unique_id] = actuator
         return actuator
 
+    def remove_actuator(self, unique_id: str) -> None:
+        """Remove an actuator from the stage.
+
+        Args:
+            unique_id: Unique identifier for the actuator.
+        """
+        self.actuators.pop(unique_id, None)
+
     def get_actuator(self, unique_id: str) -> Actuator | None:
         """Get an actuator by its unique ID.
 
@@ -241,12 +324,7 @@ class Stage:
         Returns:
             The actuator with the specified unique ID, or None if not found.
         """
-        for actuator in self.get_actuators():
-            if unique_id != actuator.unique_id:
-                continue
-
-            return actuator
-        return None
+        return self.actuators.get(unique_id)
 
     def get_actuators(self) -> list[Actuator]:
         """Get all actuators in the stage.
@@ -254,7 +332,7 @@ class Stage:
         Returns:
             A list of actuators in the stage.
         """
-        return self.actuators
+        return list(self.actuators.values())
 
 
 class Floor:
@@ -269,8 +347,32 @@ class Floor:
             stage_names: Names of the stages in the floor.
         """
         self.name = name
-        self.stages: list[Stage] = [Stage(stage_name) for stage_name in stage_names]
-        self.logic_controllers: list[LogicController] = []
+        # stage name -> stage, floors can have thousands of stages
+        self.stages: dict[str, Stage] = {}
+        self.logic_controllers: dict[str, LogicController] = {}
+
+        for stage_name in stage_names:
+            self.add_stage(stage_name)
+
+    def add_stage(self, name: str, capacity: int = 0) -> Stage:
+        """Add a stage to the floor.
+
+        Args:
+            name: The name of the stage.
+            capacity: How many plant holders fit in the stage.
+
+        Returns:
+            The added stage.
+
+        Raises:
+            ValueError: If the floor already has a stage with this name.
+        """
+        if name in self.stages:
+            raise ValueError(f"{self.name} already has {name}")
+
+        stage = Stage(name, capacity)
+        self.stages[name] = stage
+        return stage
 
     def get_logic_controllers(self) -> list[LogicController]:
         """Get the logic controllers in the floor.
@@ -278,7 +380,7 @@ class Floor:
         Returns:
             A list of logic controllers in the floor.
         """
-        return self.logic_controllers
+        return list(self.logic_controllers.values())
 
     def get_logic_controller(self, unique_id: str) -> LogicController | None:
         """Get a logic controller by its unique ID.
@@ -289,12 +391,7 @@ class Floor:
         Returns:
             The logic controller with the specified unique ID, or None if not found.
         """
-        for logic_controller in self.get_logic_controllers():
-            if unique_id != logic_controller.unique_id:
-                continue
-
-            return logic_controller
-        return None
+        return self.logic_controllers.get(unique_id)
 
     def get_stage_by_name(self, name: str) -> Stage | None:
         """Get a stage in the floor by its name.
@@ -305,12 +402,7 @@ class Floor:
         Returns:
             The stage with the specified name, or None if not found.
         """
-        for s in self.get_stages():
-            if name != s.name:
-                continue
-
-            return s
-        return None
+        return self.stages.get(name)
 
     def get_stage(self, unique_id: str) -> Stage | None:
         """Get a stage in the floor by its unique ID.
@@ -326,20 +418,7 @@ class Floor:
         if not stage:
             return None
 
-        for s in self.get_stages():
-            if stage != s.name:
-                continue
-
-            return s
-        return None
-
-    def get_stages(self) -> list[Stage]:
-        """Get all stages in the floor.
-
-        Returns:
-            A list of stages in the floor.
-        """
-        return self.stages
+        return self.stages.get(stage)
 
     def add_logic_controller(self, unique_id: str) -> LogicController:
         """Add a logic controller to the floor.
@@ -351,20 +430,441 @@ class Floor:
             The added logic controller.
         """
         logic_controller = LogicController(unique_id)
-        self.logic_controllers.append(logic_controller)
+        self.logic_controllers[unique_id] = logic_controller
         return logic_controller
 
+    def remove_logic_controller(self, unique_id: str) -> None:
+        """Remove a logic controller from the floor.
+
+        Args:
+            unique_id: Unique identifier for the logic controller.
+        """
+        self.logic_controllers.pop(unique_id, None)
+
     def get_stages(self) -> list[Stage]:
         """Get all stages in the floor.
 
         Returns:
             A list of stages in the floor.
         """
-        return [stage for stage in self.stages]
+        return list(self.stages.values())
+
+
+@dataclass(frozen=True)
+class NodeTopology:
+    """Immutable snapshot of the entities one node owns on one floor.
+
+    Only the values in `state` and `gui_sync_data` change in place.
+
+    Attributes:
+        entities: Unique IDs mapped to entities.
+        topics: GUI, command and receipt topics mapped to entities.
+        actuators: Actuators of the node.
+        logic_controllers: Logic controllers of the node.
+        state: Actuator unique IDs mapped to their value.
+        gui_sync_data: GUI topics mapped to their value.
+    """
+
+    entities: MappingProxyType
+    topics: MappingProxyType
+    actuators: tuple[Actuator, ...]
+    logic_controllers: tuple[LogicController, ...]
+    state: MappingProxyType
+    gui_sync_data: MappingProxyType
+
+
+class NodeMap(Mapping):
+    """Read-only mapping of node IDs to their NodeTopology.
+
+    Nodes are spread over a fixed number of buckets, and a new map with
+    some nodes changed copies only their buckets and shares the rest, so
+    the cost does not grow with the number of nodes on the floor. Nodes
+    are iterated by bucket, not in the order they were added.
+    """
+
+    def __init__(self, buckets: tuple[MappingProxyType, ...], size: int) -> None:
+        """Initialize a NodeMap.
+
+        Args:
+            buckets: Node IDs mapped to their NodeTopology, spread by
+                :func:`get_bucket`.
+            size: Number of nodes in all buckets.
+        """
+        self.buckets = buckets
+        self.size = size
+
+    def __getitem__(self, node_id: str) -> NodeTopology:
+        return self.buckets[get_bucket(node_id)][node_id]
+
+    def get(self, node_id: str, default=None):
+        return self.buckets[get_bucket(node_id)].get(node_id, default)
+
+    def __iter__(self) -> Iterator[str]:
+        for bucket in self.buckets:
+            yield from bucket
+
+    def __len__(self) -> int:
+        return self.size
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}({dict(self)!r})"
+
+
+def get_bucket(node_id: str) -> int:
+    """Get the bucket of a NodeMap a node is in.
+
+    Args:
+        node_id: The node ID.
+
+    Returns:
+        Index of the bucket.
+    """
+    return hash(node_id) % NODE_BUCKETS
+
+
+@dataclass(frozen=True)
+class FloorTopology:
+    """Immutable snapshot of the entities on one floor.
+
+    Attributes:
+        nodes: Node IDs mapped to their NodeTopology.
+    """
+
+    nodes: NodeMap
+
+    @cached_property
+    def actuators(self) -> tuple[Actuator, ...]:
+        """All actuators on the floor."""
+        return tuple(chain.from_iterable(n.actuators for n in self.nodes.values()))
+
+    @cached_property
+    def logic_controllers(self) -> tuple[LogicController, ...]:
+        """All logic controllers on the floor."""
+        return tuple(
+            chain.from_iterable(n.logic_controllers for n in self.nodes.values())
+        )
+
+
+class FloorView(Mapping):
+    """Read-only mapping over the same mapping of every node.
+
+    Keys are unique IDs or topics, which name the floor and node they
+    belong to, so a lookup only touches one node.
+    """
+
+    def __init__(self, floors: MappingProxyType, name: str) -> None:
+        """Initialize a FloorView.
+
+        Args:
+            floors: Floor names mapped to their FloorTopology.
+            name: Name of the NodeTopology attribute to look in.
+        """
+        self.__floors = floors
+        self.__name = name
+
+    def __getitem__(self, key: str):
+        value = self.get(key, MISSING)
+
+        if value is MISSING:
+            raise KeyError(key)
+
+        return value
+
+    def get(self, key: str, default=None):
+        parsed = parse_topic(key)
+        floor = self.__floors.get(parsed.floor)
+        node = floor.nodes.get(parsed.node) if floor is not None else None
+
+        if node is None:
+            return default
+
+        return getattr(node, self.__name).get(key, default)
+
+    def __iter__(self) -> Iterator[str]:
+        for floor in self.__floors.values():
+            for node in floor.nodes.values():
+                yield from getattr(node, self.__name)
+
+    def __len__(self) -> int:
+        return sum(
+            len(getattr(node, self.__name))
+            for floor in self.__floors.values()
+            for node in floor.nodes.values()
+        )
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}({dict(self)!r})"
+
+
+@dataclass(frozen=True)
+class Topology:
+    """Immutable snapshot of the entities in a HydroplantSystem.
+
+    Every time entities are added or deleted a new snapshot replaces the
+    old one, so a snapshot can be read from any thread without locks or
+    copies. Each node has its own snapshot per floor, and only nodes
+    which changed get a new one, so publishing copies the entities of
+    the changed nodes and not the rest of their floor. Lists over all
+    floors are built the first time they are used.
+
+    Looking up an entity in a snapshot parses the key to find its node.
+    :meth:`HydroplantSystem.get_object` uses flat mappings instead.
+
+    Attributes:
+        floors: Floor names mapped to their FloorTopology.
+    """
+
+    floors: MappingProxyType
+
+    @cached_property
+    def entities(self) -> FloorView:
+        """Unique IDs mapped to entities."""
+        return FloorView(self.floors, "entities")
+
+    @cached_property
+    def topics(self) -> FloorView:
+        """GUI, command and receipt topics mapped to entities."""
+        return FloorView(self.floors, "topics")
+
+    @cached_property
+    def state(self) -> FloorView:
+        """Actuator unique IDs mapped to their value."""
+        return FloorView(self.floors, "state")
+
+    @cached_property
+    def gui_sync_data(self) -> FloorView:
+        """GUI topics mapped to their value."""
+        return FloorView(self.floors, "gui_sync_data")
+
+    @cached_property
+    def nodes(self) -> MappingProxyType:
+        """Node IDs mapped to the entities they own."""
+        nodes = {}
+
+        for floor in self.floors.values():
+            for node_id, node in floor.nodes.items():
+                nodes[node_id] = nodes.get(node_id, ()) + tuple(node.entities.values())
+
+        return MappingProxyType(nodes)
+
+    @cached_property
+    def actuators(self) -> tuple[Actuator, ...]:
+        """All actuators."""
+        return tuple(chain.from_iterable(f.actuators for f in self.floors.values()))
+
+    @cached_property
+    def logic_controllers(self) -> tuple[LogicController, ...]:
+        """All logic controllers."""
+        return tuple(
+            chain.from_iterable(f.logic_controllers for f in self.floors.values())
+        )
+
+    @cached_property
+    def gui_topics(self) -> tuple[str, ...]:
+        """GUI topics of all entities."""
+        return tuple(self.gui_sync_data)
+
+
+class NodeIndex:
+    """Entities one node owns on one floor, changed one at a time.
+
+    Only used while holding the lock of the system.
+    """
+
+    def __init__(self) -> None:
+        """Initialize an empty NodeIndex."""
+        self.entities: dict[str, LogicController | Actuator] = {}
+        self.topics: dict[str, LogicController | Actuator] = {}
+        self.actuators: dict[str, Actuator] = {}
+        self.logic_controllers: dict[str, LogicController] = {}
+        self.state: dict[str, float | int | None] = {}
+        self.gui_sync_data: dict[str, float | int | None] = {}
+
+        # values of the published topology, updated in place
+        self.published_state: dict[str, float | int | None] = {}
+        self.published_gui_sync_data: dict[str, float | int | None] = {}
+
+    def add(self, entity: Entity) -> None:
+        """Add an entity.
+
+        Args:
+            entity: The entity to add.
+        """
+        self.entities[entity.unique_id] = entity
+        self.topics[entity.gui_topic] = entity
+        self.topics[entity.command] = entity
+        self.topics[entity.receipt] = entity
+
+        if isinstance(entity, Actuator):
+            self.actuators[entity.unique_id] = entity
+            self.state[entity.unique_id] = entity.get_value()
+        else:
+            self.logic_controllers[entity.unique_id] = entity
+
+        self.gui_sync_data[entity.gui_topic] = entity.get_value()
+
+    def remove(self, entity: Entity) -> None:
+        """Remove an entity.
+
+        Args:
+            entity: The entity to remove.
+        """
+        del self.entities[entity.unique_id]
+        del self.topics[entity.gui_topic]
+        del self.topics[entity.command]
+        del self.topics[entity.receipt]
+
+        self.actuators.pop(entity.unique_id, None)
+        self.logic_controllers.pop(entity.unique_id, None)
+        self.state.pop(entity.unique_id, None)
+        del self.gui_sync_data[entity.gui_topic]
+
+    def set_value(self, entity: Entity) -> None:
+        """Update the value of an entity.
+
+        Args:
+            entity: The entity which changed.
+        """
+        value = entity.get_value()
+
+        if entity.unique_id in self.state:
+            self.state[entity.unique_id] = value
+
+        self.gui_sync_data[entity.gui_topic] = value
+
+        # readers iterate the published values, so only existing keys
+        # change, an entity added in a running batch is not there yet
+        if entity.unique_id in self.published_state:
+            self.published_state[entity.unique_id] = value
+
+        if entity.gui_topic in self.published_gui_sync_data:
+            self.published_gui_sync_data[entity.gui_topic] = value
+
+    def publish(self) -> NodeTopology:
+        """Build a snapshot of the node.
+
+        Returns:
+            A new NodeTopology.
+        """
+        self.published_state = self.state.copy()
+        self.published_gui_sync_data = self.gui_sync_data.copy()
+
+        return NodeTopology(
+            entities=MappingProxyType(self.entities.copy()),
+            topics=MappingProxyType(self.topics.copy()),
+            actuators=tuple(self.actuators.values()),
+            logic_controllers=tuple(self.logic_controllers.values()),
+            state=MappingProxyType(self.published_state),
+            gui_sync_data=MappingProxyType(self.published_gui_sync_data),
+        )
+
+
+class FloorIndex:
+    """Entities of one floor, kept per node.
+
+    Only used while holding the lock of the system.
+    """
+
+    def __init__(self) -> None:
+        """Initialize an empty FloorIndex."""
+        self.nodes: dict[str, NodeIndex] = {}
+        # ids of nodes changed since the last snapshot
+        self.changed: set[str] = set()
+        self.published = NodeMap((MappingProxyType({}),) * NODE_BUCKETS, 0)
+
+    def get_entity(self, entity: Entity) -> LogicController | Actuator | None:
+        """Get the entity in the index with the unique ID of an entity.
+
+        Args:
+            entity: The entity.
+
+        Returns:
+            The entity in the index, which might be another instance,
+            or None if there is none.
+        """
+        node = self.nodes.get(entity.node_id)
+        return node.entities.get(entity.unique_id) if node is not None else None
+
+    def add(self, entity: Entity) -> None:
+        """Add an entity.
+
+        Args:
+            entity: The entity to add.
+        """
+        node = self.nodes.get(entity.node_id)
+
+        if node is None:
+            node = self.nodes[entity.node_id] = NodeIndex()
+
+        node.add(entity)
+        self.changed.add(entity.node_id)
+
+    def remove(self, entity: Entity) -> None:
+        """Remove an entity.
+
+        Args:
+            entity: The entity to remove.
+        """
+        node = self.nodes[entity.node_id]
+        node.remove(entity)
+        self.changed.add(entity.node_id)
+
+        if not node.entities:
+            del self.nodes[entity.node_id]
+
+    def set_value(self, entity: Entity) -> None:
+        """Update the value of an entity.
+
+        Args:
+            entity: The entity which changed.
+        """
+        self.nodes[entity.node_id].set_value(entity)
+
+    def publish(self) -> FloorTopology:
+        """Build a snapshot of the floor with new snapshots of changed nodes.
+
+        Only the buckets of changed nodes are copied.
+
+        Returns:
+            A new FloorTopology.
+        """
+        buckets = list(self.published.buckets)
+        copied = {}
+
+        for node_id in self.changed:
+            index = get_bucket(node_id)
+
+            if index not in copied:
+                copied[index] = dict(buckets[index])
+
+            node = self.nodes.get(node_id)
+
+            if node is None:
+                copied[index].pop(node_id, None)
+            else:
+                copied[index][node_id] = node.publish()
+
+        for index, bucket in copied.items():
+            buckets[index] = MappingProxyType(bucket)
+
+        self.changed.clear()
+        self.published = NodeMap(tuple(buckets), len(self.nodes))
+
+        return FloorTopology(self.published)
 
 
 class HydroplantSystem:
-    """Class representing the entire Hydroplant system."""
+    """Class representing the entire Hydroplant system.
+
+    Writers hold a lock and publish a new :class:`Topology` when they are
+    done, readers use the current one. Use :meth:`batch` to publish
+    several changes as one.
+
+    For lookups by unique ID or topic the system also keeps one flat
+    mapping each. When a topology is published only the keys which
+    changed are set or deleted, so a lookup is a single dict lookup and
+    never sees an entity which is being replaced go missing.
+    """
 
     def __init__(self, *floors) -> None:
         """Initialize a HydroplantSystem instance.
@@ -372,9 +872,219 @@ class HydroplantSystem:
         Args:
             *floors: Variable number of Floor instances.
         """
-        self.floors: list[Floor] = [floor for floor in floors]
+        # floor name -> floor
+        self.floors: dict[str, Floor] = {}
+
+        for floor in floors:
+            self.__add_floor(floor)
         # self.gui: GUI = None
 
+        # values of every entity as columns, for rules over the whole farm
+        self.__table = StateTable()
+
+        # only changed while holding the lock
+        self.__lock = RLock()
+        self.__batch_depth = 0
+        self.__indexes: dict[str, FloorIndex] = {}
+        # names of floors changed since the last topology
+        self.__changed: set[str] = set()
+
+        # read without the lock, so only changed in __publish
+        self.__entities: dict[str, LogicController | Actuator] = {}
+        self.__topics: dict[str, LogicController | Actuator] = {}
+        # keys changed since the last topology, None if removed
+        self.__changed_entities: dict[str, LogicController | Actuator | None] = {}
+        self.__changed_topics: dict[str, LogicController | Actuator | None] = {}
+        self.__topology = Topology(MappingProxyType({}))
+
+    @contextmanager
+    def batch(self) -> Iterator["HydroplantSystem"]:
+        """Publish all changes made inside the block as one new topology.
+
+        Yields:
+            The system itself.
+        """
+        with self.__lock:
+            self.__batch_depth += 1
+
+            try:
+                yield self
+            finally:
+                self.__batch_depth -= 1
+
+                if self.__batch_depth == 0 and self.__changed:
+                    self.__publish()
+
+    def get_table(self) -> StateTable:
+        """Get the table with the values of every entity.
+
+        Returns:
+            The StateTable of the system.
+        """
+        return self.__table
+
+    def get_topology(self) -> Topology:
+        """Get the current topology.
+
+        Returns:
+            The current immutable snapshot of all entities.
+        """
+        return self.__topology
+
+    def __publish(self) -> None:
+        """Replace the topology, with new snapshots of changed floors.
+
+        Must be called while holding the lock.
+        """
+        floors = dict(self.__topology.floors)
+
+        for name in self.__changed:
+            index = self.__indexes[name]
+
+            if index.nodes:
+                floors[name] = index.publish()
+                continue
+
+            del self.__indexes[name]
+            floors.pop(name, None)
+
+        self.__changed.clear()
+        self.__topology = Topology(MappingProxyType(floors))
+
+        self.__apply(self.__entities, self.__changed_entities)
+        self.__apply(self.__topics, self.__changed_topics)
+
+    def __apply(
+        self,
+        lookup: dict[str, LogicController | Actuator],
+        changes: dict[str, LogicController | Actuator | None],
+    ) -> None:
+        """Set or delete the changed keys of a flat lookup mapping.
+
+        Must be called while holding the lock.
+
+        Args:
+            lookup: Mapping readers look entities up in.
+            changes: Changed keys mapped to their entity, or None if removed.
+        """
+        for key, entity in changes.items():
+            if entity is None:
+                lookup.pop(key, None)
+            else:
+                lookup[key] = entity
+
+        changes.clear()
+
+    def __add_to_index(self, entity: Entity) -> None:
+        """Make an entity findable by its unique ID and topics.
+
+        Must be called inside a batch.
+
+        Args:
+            entity: The entity to add.
+        """
+        index = self.__indexes.get(entity.floor)
+
+        if index is None:
+            index = self.__indexes[entity.floor] = FloorIndex()
+
+        old = index.get_entity(entity)
+
+        if old is not None:
+            self.__remove_from_index(old)
+
+        index.add(entity)
+        self.__table.add(entity)
+        self.__changed.add(entity.floor)
+        self.__set_lookup(entity, entity)
+        entity.listener = self.__on_entity_changed
+
+    def __remove_from_index(self, entity: Entity) -> None:
+        """Remove an entity from the index.
+
+        Must be called inside a batch.
+
+        Args:
+            entity: The entity to remove.
+        """
+        index = self.__indexes.get(entity.floor)
+
+        # a newer entity with the same id might have replaced it
+        if index is None or index.get_entity(entity) is not entity:
+            return
+
+        index.remove(entity)
+        self.__table.remove(entity)
+        self.__changed.add(entity.floor)
+        self.__set_lookup(entity, None)
+        entity.listener = None
+
+    def __set_lookup(
+        self, entity: Entity, value: LogicController | Actuator | None
+    ) -> None:
+        """Remember a change to the flat lookups until the next topology.
+
+        Must be called inside a batch.
+
+        Args:
+            entity: The entity whose unique ID and topics changed.
+            value: The entity, or None if it was removed.
+        """
+        self.__changed_entities[entity.unique_id] = value
+
+        for topic in (entity.gui_topic, entity.command, entity.receipt):
+            self.__changed_topics[topic] = value
+
+    def __on_entity_changed(self, entity: Entity) -> None:
+        """Update the state views after an entity got new data.
+
+        Args:
+            entity: The entity which changed.
+        """
+        with self.__lock:
+            index = self.__indexes.get(entity.floor)
+
+            # an entity which was deleted meanwhile is not in the topology
+            if index is None or index.get_entity(entity) is not entity:
+                return
+
+            index.set_value(entity)
+            self.__table.update(entity)
+
+    def add_actuator(self, unique_id: str) -> Actuator:
+        """Add an actuator to the stage given by its unique ID.
+
+        Args:
+            unique_id: Unique identifier for the actuator,
+                e.g. floor_1/stage_1/climate_node/LED.
+
+        Returns:
+            The added actuator.
+        """
+        with self.batch():
+            stage = self.get_floor(unique_id).get_stage(unique_id)
+            actuator = stage.add_actuator(unique_id)
+            self.__add_to_index(actuator)
+
+        return actuator
+
+    def add_logic_controller(self, unique_id: str) -> LogicController:
+        """Add a logic controller to the floor given by its unique ID.
+
+        Args:
+            unique_id: Unique identifier for the logic controller,
+                e.g. floor_1/plant_mover_node/plant_mover.
+
+        Returns:
+            The added logic controller.
+        """
+        with self.batch():
+            floor = self.get_floor(unique_id)
+            logic_controller = floor.add_logic_controller(unique_id)
+            self.__add_to_index(logic_controller)
+
+        return logic_controller
+
     def get_plant_holders(self) -> list[PlantHolder]:
         """Get all plant holders in the system.
 
@@ -389,31 +1099,49 @@ class HydroplantSystem:
 
         return plant_holders
 
-    def get_actuators(self) -> list[Actuator]:
+    def get_actuators(self) -> tuple[Actuator, ...]:
         """Get all actuators in the system.
 
         Returns:
-            A list of actuators in the system.
+            A read-only tuple of actuators in the system.
         """
-        actuators = []
+        return self.__topology.actuators
 
-        for floor in self.get_floors():
-            for stage in floor.get_stages():
-                actuators += stage.get_actuators()
-
-        return actuators
-
-    def add_floor(self, name: str) -> None:
+    def add_floor(self, name: str) -> Floor:
         """Add a floor to the system.
 
         Args:
             name: The name of the floor to add.
+
+        Returns:
+            The added floor.
+
+        Raises:
+            ValueError: If the system already has a floor with this name.
+        """
+        floor = Floor(name)
+        self.__add_floor(floor)
+        return floor
+
+    def __add_floor(self, floor: Floor) -> None:
+        """Add a floor instance to the system.
+
+        Args:
+            floor: The floor to add.
+
+        Raises:
+            ValueError: If the system already has a floor with this name.
         """
-        self.floors.append(Floor(name))
+        if floor.name in self.floors:
+            raise ValueError(f"There is already a floor named {floor.name}")
+
+        self.floors[floor.name] = floor
 
     def delete_objects(self, node_id: str, floor_name: str) -> list[str]:
         """Delete actuators or logic controllers which has this node_id.
 
+        Only the entities owned by the node are visited.
+
         Args:
             node_id: The node ID to search for.
             floor_name: The floor name to filter objects, or None to search all floors.
@@ -423,98 +1151,83 @@ class HydroplantSystem:
         """
         topics = []
 
-        for floor in self.get_floors():
-            if floor_name and floor_name != floor.name:
-                continue
-
-            # must copy or else we wont delete all objects
-            for logic_controller in floor.get_logic_controllers().copy():
-                if node_id != logic_controller.node_id:
-                    continue
+        with self.batch():
+            for entity in self.__get_node_entities(node_id, floor_name):
+                floor = self.get_floor_by_name(entity.floor)
 
-                topics += logic_controller.get_subscribe_topics()
-                floor.logic_controllers.remove(logic_controller)
-                # logging.debug(
-                #     f"deleted {logic_controller=} with {node_id=} {floor_name=}"
-                # )
+                if entity.stage:
+                    stage = floor.get_stage_by_name(entity.stage)
+                    stage.remove_actuator(entity.unique_id)
+                else:
+                    floor.remove_logic_controller(entity.unique_id)
 
-            for stage in floor.get_stages():
-                # must copy or else we wont delete all objects
-                for actuator in stage.get_actuators().copy():
-                    logging.debug(f"{actuator.unique_id=}")
+                self.__remove_from_index(entity)
+                topics += entity.get_subscribe_topics()
 
-                    if node_id != actuator.node_id:
-                        continue
+        return topics
 
-                    topics += actuator.get_subscribe_topics()
-                    stage.actuators.remove(actuator)
-                    # logging.debug(
-                    #     f"deleted {actuator.unique_id=} with {node_id=} {floor_name=}"
-                    # )
+    def __get_node_entities(self, node_id: str, floor_name: str) -> list[Entity]:
+        """Get the entities a node owns.
 
-        return topics
+        Must be called while holding the lock.
 
-    def get_gui_topics(self) -> list[str]:
-        """Get all GUI topics in the system.
+        Args:
+            node_id: The node ID to search for.
+            floor_name: The floor to search, or None to search all floors.
 
         Returns:
-            A list of GUI topics in the system.
+            A new list of the entities.
         """
-        topics = []
+        if floor_name:
+            index = self.__indexes.get(floor_name)
+            indexes = [index] if index is not None else []
+        else:
+            indexes = list(self.__indexes.values())
 
-        for floor in self.get_floors():
-            for logic_controller in floor.get_logic_controllers():
-                topics.append(logic_controller.gui_topic)
+        entities = []
 
-            for stage in floor.get_stages():
-                for actuator in stage.get_actuators():
-                    topics.append(actuator.gui_topic)
+        for index in indexes:
+            node = index.nodes.get(node_id)
 
-        return topics
+            if node is not None:
+                entities += node.entities.values()
 
-    def get_logic_controllers(self) -> list[LogicController]:
-        """Get all logic controllers for all floors.
+        return entities
+
+    def get_gui_topics(self) -> tuple[str, ...]:
+        """Get all GUI topics in the system.
 
         Returns:
-            A list of logic controllers for all floors.
+            A read-only tuple of GUI topics in the system.
         """
-        logic_controllers = []
+        return self.__topology.gui_topics
 
-        for floor in self.get_floors():
-            for logic_controller in floor.get_logic_controllers():
-                logic_controllers.append(logic_controller)
+    def get_logic_controllers(self) -> tuple[LogicController, ...]:
+        """Get all logic controllers for all floors.
 
-        return logic_controllers
+        Returns:
+            A read-only tuple of logic controllers for all floors.
+        """
+        return self.__topology.logic_controllers
 
-    def get_state(self) -> dict:
+    def get_state(self) -> Mapping[str, float | int | None]:
         """Get the state of the system.
 
         Returns:
-            A dictionary representing the state of the system.
+            A read-only :class:`FloorView` of actuator unique IDs mapped to
+            their value. It is not a dict, use `dict()` for a copy.
         """
-        data = {}
-
-        for actuator in self.get_actuators():
-            data[actuator.unique_id] = actuator.get_value()
+        return self.__topology.state
 
-        return data
-
-    def get_gui_sync_data(self) -> dict:
+    def get_gui_sync_data(self) -> Mapping[str, float | int | None]:
         """Get GUI synchronization data for the system.
 
         Returns:
-            A dictionary containing GUI synchronization data for the system.
+            A read-only :class:`FloorView` of GUI topics mapped to their
+            value. It is not a dict, use `dict()` for a copy.
         """
-        data = {}
-
-        for actuator in self.get_actuators():
-            data[actuator.gui_topic] = actuator.get_value()
-
         # TODO: are there states for logic controllers?
-        for logic_controller in self.get_logic_controllers():
-            data[logic_controller.gui_topic] = logic_controller.get_value()
-
-        return data
+        return self.__topology.gui_sync_data
 
     def get_floor_by_name(self, name: str) -> Floor | None:
         """Get a floor by its name.
@@ -525,12 +1238,7 @@ class HydroplantSystem:
         Returns:
             The floor with the specified name, or None if not found.
         """
-        for f in self.get_floors():
-            if name != f.name:
-                continue
-
-            return f
-        return None
+        return self.floors.get(name)
 
     def get_floor(self, unique_id: str) -> Floor | None:
         """Get a floor by its unique ID.
@@ -546,12 +1254,7 @@ class HydroplantSystem:
         if not floor:
             return None
 
-        for f in self.get_floors():
-            if floor != f.name:
-                continue
-
-            return f
-        return None
+        return self.floors.get(floor)
 
     def get_floors(self) -> list[Floor]:
         """Get all floors in the system.
@@ -559,7 +1262,7 @@ class HydroplantSystem:
         Returns:
             A list of floors in the system.
         """
-        return self.floors
+        return list(self.floors.values())
 
     def get_object_from_unique_id(
         self, unique_id: str
@@ -572,30 +1275,31 @@ class HydroplantSystem:
         Returns:
             The object with the specified unique ID, or None if not found.
         """
-        floor = self.get_floor(unique_id)
-        stage = floor.get_stage(unique_id)
-
-        # most likely a logic controller
-        # which only exists in floor, no stage
-        if not stage:
-            return floor.get_logic_controller(unique_id)
-
-        return stage.get_actuator(unique_id)
+        return self.__entities.get(unique_id)
 
     def get_object(self, topic: str) -> LogicController | Actuator | None:
         """Get an object (LogicController or Actuator) by its MQTT topic.
 
         Args:
-            topic: The MQTT topic for the object.
+            topic: The MQTT topic for the object, its receipt topic
+                or its unique ID.
 
         Returns:
             The object with the specified topic, or None if not found.
         """
-        if is_receipt(topic):
-            topic.replace("/receipt", "")
+        obj = self.__topics.get(topic)
+
+        if obj is not None:
+            return obj
+
+        obj = self.__entities.get(topic)
+
+        if obj is not None:
+            return obj
 
-        unique_id = get_unique_id(topic)
-        return self.get_object_from_unique_id(unique_id)
+        # other topics of an entity, only parsed when they are not known
+        unique_id = parse_topic(topic).unique_id
+        return self.__entities.get(unique_id) if unique_id else None
 
 
 # system = HydroplantSystem(
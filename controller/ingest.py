@@ -0,0 +1,175 @@
+from .topics import DEVICE_TOPIC, DEVICES_DISCONNECT_TOPIC
+from .utils import parse_topic
+
+from threading import Thread
+from typing import Callable
+import logging
+import queue
+import json
+
+
+def get_ingest_key(topic: str, payload: bytes) -> str:
+    """Get the key which decides the ingest worker for a message.
+
+    Receipts, presentations and disconnects of a node get the same key,
+    so a node never disconnects before an earlier presentation is handled.
+
+    Args:
+        topic: MQTT topic of the message.
+        payload: Raw MQTT payload.
+
+    Returns:
+        The node id for messages of a node. Other topics share one key.
+    """
+    parsed = parse_topic(topic)
+
+    if parsed.floor:
+        return parsed.node or topic
+
+    if topic != DEVICE_TOPIC and topic != DEVICES_DISCONNECT_TOPIC:
+        return ""
+
+    # the node is only in the payload, these messages are rare
+    try:
+        data = json.loads(payload)
+    except ValueError:
+        return ""
+
+    if not isinstance(data, dict):
+        return ""
+
+    return str(data.get("device_id", ""))
+
+
+class IngestPool:
+    """Bounded queues and worker threads between the MQTT network thread
+    and message handling.
+
+    Every worker owns one queue. Messages with the same key always go to
+    the same worker, so they are handled in the order they arrived.
+    """
+
+    def __init__(
+        self,
+        handler: Callable[[str, bytes], None],
+        workers: int = 4,
+        queue_size: int = 1000,
+    ) -> None:
+        """Initialize an IngestPool.
+
+        Args:
+            handler: Called with topic and raw payload for every message.
+            workers: Number of worker threads.
+            queue_size: Maximum number of waiting messages per worker.
+        """
+        self.handler = handler
+        self.queues: list[queue.Queue] = [
+            queue.Queue(maxsize=queue_size) for _ in range(workers)
+        ]
+        self.threads: list[Thread] = []
+
+        self.dropped = 0
+        # one counter per worker, so workers never write the same value
+        self.processed = [0] * workers
+        self.max_depth = [0] * workers
+
+    def start(self) -> None:
+        """Start the worker threads."""
+        for index, q in enumerate(self.queues):
+            thread = Thread(
+                target=self.__work,
+                args=(index, q),
+                name=f"ingest-{index}",
+                daemon=True,
+            )
+            thread.start()
+            self.threads.append(thread)
+
+    def submit(self, key: str, topic: str, payload: bytes) -> bool:
+        """Queue a message without blocking.
+
+        Args:
+            key: Messages with equal keys are handled in order, e.g. unique_id.
+            topic: MQTT topic of the message.
+            payload: Raw MQTT payload.
+
+        Returns:
+            True if the message was queued, False if it was dropped.
+        """
+        index = hash(key) % len(self.queues)
+        q = self.queues[index]
+
+        try:
+            q.put_nowait((topic, payload))
+        except queue.Full:
+            self.dropped += 1
+
+            # do not flood the log while we are overloaded
+            if self.dropped % 100 == 1:
+                logging.warning(f"Ingest queue full, dropped {self.dropped} messages")
+
+            return False
+
+        depth = q.qsize()
+
+        if depth > self.max_depth[index]:
+            self.max_depth[index] = depth
+
+        return True
+
+    def __work(self, index: int, q: queue.Queue) -> None:
+        """Handle messages from one queue until stopped.
+
+        Args:
+            index: Index of the worker.
+            q: The queue this worker drains.
+        """
+        while True:
+            item = q.get()
+
+            if item is None:
+                return
+
+            try:
+                self.handler(*item)
+            except Exception:
+                logging.exception(f"Could not handle message on {item[0]}")
+
+            self.processed[index] += 1
+
+    def stop(self, timeout: float | None = None) -> None:
+        """Handle the queued messages and stop the workers.
+
+        Args:
+            timeout: How long to wait for each worker.
+        """
+        for q in self.queues:
+            q.put(None)
+
+        for thread in self.threads:
+            thread.join(timeout)
+
+        self.threads = []
+
+    def get_depth(self) -> int:
+        """Get the number of messages waiting in all queues.
+
+        Returns:
+            Current total queue depth.
+        """
+        return sum(q.qsize() for q in self.queues)
+
+    def get_stats(self) -> dict:
+        """Get queue depth and counters.
+
+        Returns:
+            A dictionary with current depth, maximum depth per worker,
+            and the number of processed and dropped messages.
+        """
+        return {
+            "depth": self.get_depth(),
+            "depths": [q.qsize() for q in self.queues],
+            "max_depths": list(self.max_depth),
+            "processed": sum(self.processed),
+            "dropped": self.dropped,
+        }
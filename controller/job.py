@@ -1,6 +1,7 @@
 from dataclasses import dataclass, asdict
 from enum import IntEnum
 import time
+import json
 import logging
 
 
@@ -22,6 +23,19 @@ class EJobPriority(IntEnum):
 #     return time.time()
 
 
+def get_step_key(topic: str, data: dict) -> tuple[str, str]:
+    """Get a key which is equal for steps doing the same thing.
+
+    Args:
+        topic: The MQTT topic of the step.
+        data: Data of the step.
+
+    Returns:
+        The topic and the data as JSON with sorted keys.
+    """
+    return topic, json.dumps(data, sort_keys=True, default=str)
+
+
 class Step:
     def __init__(
         self, topic: str, data: dict, wait: float = 0.0, deadline: float = 60.0
@@ -39,45 +53,98 @@ class Step:
         self.wait = wait
         self.deadline = deadline  # will delete if stop passes deadline
 
+        # data is not changed after this
+        self.key = get_step_key(topic, data)
+
         self.timestamp = time.time()
         self.time_sent = 0.0
 
         self.has_sent = False
+        # correlation id sent with the step, echoed back in its receipt
+        self.cid: str | None = None
         # self.has_finished = False
 
-    def sent(self) -> None:
-        """Mark the step as sent."""
+    def sent(self, now: float | None = None) -> None:
+        """Mark the step as sent.
+
+        Args:
+            now: Current time, defaults to the system clock.
+        """
         self.has_sent = True
-        self.time_sent = time.time()
+        self.time_sent = time.time() if now is None else now
 
     # def finish(self) -> None:
     #     self.finished = True
 
-    def has_passed_deadline(self) -> bool:
+    def has_passed_deadline(self, now: float | None = None) -> bool:
         """Check if the step has passed its deadline.
 
+        Args:
+            now: Current time, defaults to the system clock.
+
         Returns:
             True if the step has passed its deadline, False otherwise.
         """
-        return time.time() >= self.timestamp + self.deadline
+        if now is None:
+            now = time.time()
+
+        return now >= self.timestamp + self.deadline
 
     def __str__(self) -> str:
         """Return a string representation of the step."""
         return f"{self.topic} {self.data}"
 
+    def to_dict(self) -> dict:
+        """Get the step as plain data, e.g. for snapshots.
+
+        Returns:
+            A dictionary which :meth:`from_dict` turns back into a step.
+        """
+        return {
+            "topic": self.topic,
+            "data": self.data,
+            "wait": self.wait,
+            "deadline": self.deadline,
+            "timestamp": self.timestamp,
+            "time_sent": self.time_sent,
+            "has_sent": self.has_sent,
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "Step":
+        """Create a step from the result of :meth:`to_dict`.
+
+        Args:
+            data: Plain step data.
+
+        Returns:
+            The step.
+        """
+        step = cls(data["topic"], data["data"], data["wait"], data["deadline"])
+        step.timestamp = data["timestamp"]
+        step.time_sent = data["time_sent"]
+        step.has_sent = data["has_sent"]
+        return step
+
 
 class Job:
-    def __init__(self, steps: list[Step]) -> None:
+    def __init__(
+        self, steps: list[Step], priority: EJobPriority = EJobPriority.DEFAULT
+    ) -> None:
         """Initialize a Job instance.
 
         Args:
             steps: List of steps in the job.
+            priority: Higher priority jobs overtake jobs queued before them.
         """
         self.steps: list[Step] = steps
+        self.priority = priority
         self.timestamp = time.time()
         self.state = EJobState.UNCHECKED
         self.is_done = False
         self.at_step = 0
+        # the wait of the last finished step is over at this time
+        self.resume_at = 0.0
 
     def done_with_steps(self) -> bool:
         """Check if all steps in the job are done.
@@ -87,6 +154,25 @@ class Job:
         """
         return self.at_step == len(self.steps)
 
+    def is_waiting(self, now: float) -> bool:
+        """Check if the job is waiting after a finished step.
+
+        Args:
+            now: Current time.
+
+        Returns:
+            True if the next step can not start yet, False otherwise.
+        """
+        return now < self.resume_at
+
+    def is_in_step(self) -> bool:
+        """Check if the current step has been sent and is not done yet.
+
+        Returns:
+            True if the job is waiting for a receipt, False otherwise.
+        """
+        return not self.done_with_steps() and self.steps[self.at_step].has_sent
+
     def has_state(self, state: EJobState) -> bool:
         """Check if the job has a specific state.
 
@@ -107,6 +193,43 @@ class Job:
         logging.debug(f"State changed to {state=}")
         self.state = state
 
+    def to_dict(self) -> dict:
+        """Get the job as plain data, e.g. for snapshots.
+
+        Returns:
+            A dictionary which :meth:`from_dict` turns back into a job.
+        """
+        return {
+            "steps": [step.to_dict() for step in self.steps],
+            "priority": int(self.priority),
+            "timestamp": self.timestamp,
+            "state": int(self.state),
+            "is_done": self.is_done,
+            "at_step": self.at_step,
+            "resume_at": self.resume_at,
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "Job":
+        """Create a job from the result of :meth:`to_dict`.
+
+        Args:
+            data: Plain job data.
+
+        Returns:
+            The job.
+        """
+        job = cls(
+            [Step.from_dict(step) for step in data["steps"]],
+            EJobPriority(data.get("priority", EJobPriority.DEFAULT)),
+        )
+        job.timestamp = data["timestamp"]
+        job.state = EJobState(data["state"])
+        job.is_done = data["is_done"]
+        job.at_step = data["at_step"]
+        job.resume_at = data.get("resume_at", 0.0)
+        return job
+
 
 # job = Job([Step("topic", {"value": 1})])
 
@@ -0,0 +1,198 @@
+from .config import JOB_AGING_SECONDS
+from .job import Job
+from .utils import parse_topic
+
+from itertools import count
+from threading import Lock
+from typing import Callable
+import heapq
+import time
+
+
+def get_lane_keys(job: Job) -> tuple[str, ...]:
+    """Get the lanes a job needs, one per node its steps command.
+
+    Args:
+        job: The job.
+
+    Returns:
+        Lane keys like `floor_1/climate_node`, in the order of the steps.
+    """
+    keys = {}
+
+    for step in job.steps:
+        parsed = parse_topic(step.topic)
+        keys[f"{parsed.floor}/{parsed.node}"] = None
+
+    return tuple(keys)
+
+
+class Lanes:
+    """Queues jobs in one lane per node their steps command.
+
+    A job can run once it is first in every lane it is in. Jobs for
+    different nodes run side by side, while jobs sharing a node run one
+    after the other.
+
+    Each lane is a heap ordered by when a job was added, minus
+    `aging` seconds per priority level. A higher priority job overtakes
+    the jobs added shortly before it, but a job which has waited long
+    enough is never overtaken, so no job starves. Jobs are overtaken
+    between steps only, a job waiting for a receipt stays first.
+
+    Every job has the same place in all its lanes, so the first job
+    overall is always first in its lanes and jobs never wait on each
+    other in a circle. Removed jobs stay in the heaps until they come up.
+    """
+
+    def __init__(
+        self,
+        clock: Callable[[], float] = time.time,
+        aging: float = JOB_AGING_SECONDS,
+    ) -> None:
+        """Initialize empty Lanes.
+
+        Args:
+            clock: Returns the current time in seconds.
+            aging: Head start in seconds a job gets per priority level.
+        """
+        self.clock = clock
+        self.aging = aging
+        self.lock = Lock()
+
+        # lane key -> heap of (place, seq, job)
+        self.lanes: dict[str, list[tuple[float, int, Job]]] = {}
+        # lane key -> first job when runnable jobs were last looked up
+        self.heads: dict[str, Job] = {}
+        # every job mapped to its lanes and place in them
+        self.jobs: dict[Job, tuple[tuple[str, ...], tuple[float, int]]] = {}
+        self.seq = count()
+
+        self.depths: dict[str, int] = {}
+        self.completed: dict[str, int] = {}
+        self.created_at: dict[str, float] = {}
+
+    def __len__(self) -> int:
+        return len(self.jobs)
+
+    def __contains__(self, job: Job) -> bool:
+        return job in self.jobs
+
+    def add(self, job: Job) -> None:
+        """Add a job to its lanes, behind jobs with an earlier place.
+
+        Args:
+            job: The job to add.
+        """
+        keys = get_lane_keys(job)
+        place = (self.clock() - job.priority * self.aging, next(self.seq))
+
+        with self.lock:
+            self.jobs[job] = (keys, place)
+
+            for key in keys:
+                if key not in self.lanes:
+                    self.lanes[key] = []
+                    self.created_at.setdefault(key, self.clock())
+
+                heapq.heappush(self.lanes[key], (*place, job))
+                self.depths[key] = self.depths.get(key, 0) + 1
+
+    def remove(self, job: Job) -> None:
+        """Remove a job from its lanes.
+
+        Args:
+            job: The job to remove.
+        """
+        with self.lock:
+            keys, _ = self.jobs.pop(job, ((), None))
+
+            for key in keys:
+                self.depths[key] -= 1
+                self.completed[key] = self.completed.get(key, 0) + 1
+
+    def get_runnable(self) -> list[Job]:
+        """Get the jobs which are first in every lane they are in.
+
+        Returns:
+            The runnable jobs, in the order of their place.
+        """
+        with self.lock:
+            for key in list(self.lanes):
+                self.heads[key] = self.__get_head(key)
+
+                if self.heads[key] is None:
+                    del self.lanes[key], self.heads[key]
+
+            runnable = {}
+
+            for job in self.heads.values():
+                if job in runnable:
+                    continue
+
+                keys, place = self.jobs[job]
+
+                if all(self.heads[key] is job for key in keys):
+                    runnable[job] = place
+
+            return sorted(runnable, key=runnable.__getitem__)
+
+    def get_jobs(self) -> list[Job]:
+        """Get every job, in the order they were added.
+
+        Returns:
+            A new list of the jobs.
+        """
+        with self.lock:
+            return list(self.jobs)
+
+    def get_stats(self) -> dict[str, dict]:
+        """Get queue depth and throughput per lane.
+
+        Returns:
+            Lane keys mapped to the number of waiting jobs, the number of
+            jobs which left the lane, done or killed, and those per minute.
+        """
+        now = self.clock()
+
+        with self.lock:
+            return {
+                key: {
+                    "depth": self.depths.get(key, 0),
+                    "completed": self.completed.get(key, 0),
+                    "per_minute": self.completed.get(key, 0)
+                    / max(now - created_at, 1.0)
+                    * 60,
+                }
+                for key, created_at in self.created_at.items()
+            }
+
+    def __get_head(self, key: str) -> Job | None:
+        """Get the first job in a lane, dropping removed jobs on top.
+
+        Must be called while holding the lock.
+
+        Args:
+            key: The lane key.
+
+        Returns:
+            The job, or None if the lane is empty.
+        """
+        # the last first job keeps its place until its step is done
+        head = self.heads.get(key)
+
+        if head in self.jobs and head.is_in_step():
+            return head
+
+        lane = self.lanes[key]
+
+        while lane:
+            place, seq, job = lane[0]
+
+            # the same job might have been removed and added again
+            if self.jobs.get(job, (None, None))[1] == (place, seq):
+                return job
+
+            heapq.heappop(lane)
+
+        return None
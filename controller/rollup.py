@@ -0,0 +1,147 @@
+from threading import Lock
+
+# seconds per bucket mapped to the collection holding them, coarsest first
+RESOLUTIONS = {
+    3600: "measurements_1h",
+    60: "measurements_1m",
+}
+
+
+def get_bucket(timestamp: float, resolution: int) -> float:
+    """Gets the start of the bucket a timestamp belongs to.
+
+    Args:
+        timestamp: Unix time of a measurement.
+        resolution: Seconds per bucket.
+
+    Returns:
+        Unix time of the start of the bucket.
+    """
+    return float(int(timestamp // resolution) * resolution)
+
+
+def pick_resolution(step: float) -> int:
+    """Picks the coarsest stored resolution which is at least as fine as step.
+
+    Args:
+        step: Wanted seconds between points.
+
+    Returns:
+        Seconds per bucket, or 0 if only raw measurements are fine enough.
+    """
+    for resolution in RESOLUTIONS:
+        if resolution <= step:
+            return resolution
+
+    return 0
+
+
+class Rollup:
+    """Keeps min, max, sum and count per node, sensor and bucket.
+
+    Measurements are added as they arrive. Pending aggregates are taken out
+    periodically and merged into the rollup collections with `$min`, `$max`
+    and `$inc`, so a bucket can be written several times.
+    """
+
+    def __init__(self) -> None:
+        """Initialize an empty Rollup."""
+        # (resolution, node_id, sensor_id, bucket) -> [min, max, sum, count]
+        self.buckets: dict[tuple[int, str, str, float], list] = {}
+        self.lock = Lock()
+
+    def add(self, node_id: str, sensor_id: str, timestamp: float, value) -> None:
+        """Add a measurement to the buckets of every resolution.
+
+        Values which are not numbers are ignored.
+
+        Args:
+            node_id: Name of the node.
+            sensor_id: Name of the sensor.
+            timestamp: Unix time of the measurement.
+            value: The measured value.
+        """
+        if isinstance(value, bool) or not isinstance(value, (int, float)):
+            return
+
+        with self.lock:
+            for resolution in RESOLUTIONS:
+                key = (
+                    resolution,
+                    node_id,
+                    sensor_id,
+                    get_bucket(timestamp, resolution),
+                )
+                bucket = self.buckets.get(key)
+
+                if bucket is None:
+                    self.buckets[key] = [value, value, value, 1]
+                    continue
+
+                if value < bucket[0]:
+                    bucket[0] = value
+
+                if value > bucket[1]:
+                    bucket[1] = value
+
+                bucket[2] += value
+                bucket[3] += 1
+
+    def put_back(self, resolution: int, buckets: list[dict]) -> None:
+        """Merge taken aggregates back in, e.g. after a failed write.
+
+        Args:
+            resolution: Seconds per bucket.
+            buckets: Buckets from :meth:`take` for this resolution.
+        """
+        with self.lock:
+            for taken in buckets:
+                key = (
+                    resolution,
+                    taken["node_id"],
+                    taken["sensor_id"],
+                    taken["timestamp"],
+                )
+                bucket = self.buckets.get(key)
+
+                if bucket is None:
+                    self.buckets[key] = [
+                        taken["min"],
+                        taken["max"],
+                        taken["sum"],
+                        taken["count"],
+                    ]
+                    continue
+
+                bucket[0] = min(bucket[0], taken["min"])
+                bucket[1] = max(bucket[1], taken["max"])
+                bucket[2] += taken["sum"]
+                bucket[3] += taken["count"]
+
+    def take(self) -> dict[int, list[dict]]:
+        """Take all pending aggregates.
+
+        Returns:
+            Resolutions mapped to a list of buckets with node_id, sensor_id,
+            timestamp, min, max, sum and count.
+        """
+        with self.lock:
+            buckets = self.buckets
+            self.buckets = {}
+
+        result = {resolution: [] for resolution in RESOLUTIONS}
+
+        for (resolution, node_id, sensor_id, timestamp), values in buckets.items():
+            result[resolution].append(
+                {
+                    "node_id": node_id,
+                    "sensor_id": sensor_id,
+                    "timestamp": timestamp,
+                    "min": values[0],
+                    "max": values[1],
+                    "sum": values[2],
+                    "count": values[3],
+                }
+            )
+
+        return result
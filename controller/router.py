@@ -0,0 +1,213 @@
+from collections import OrderedDict
+from typing import Callable
+
+Handler = Callable[[str, dict], None]
+
+
+def route(*patterns: str) -> Callable:
+    """Mark a method as the handler for one or more MQTT topic patterns.
+
+    The method is picked up by :meth:`TopicRouter.register`.
+
+    Args:
+        *patterns: Exact topics or topics with `+` and `#` wildcards.
+
+    Returns:
+        Decorator which stores the patterns on the function.
+    """
+
+    def decorator(func: Callable) -> Callable:
+        func.routes = getattr(func, "routes", ()) + patterns
+        return func
+
+    return decorator
+
+
+class _Node:
+    """A level in the wildcard trie."""
+
+    __slots__ = ("children", "handler")
+
+    def __init__(self) -> None:
+        self.children: dict[str, _Node] = {}
+        self.handler: Handler | None = None
+
+
+class TopicRouter:
+    """Maps an MQTT topic to exactly one handler.
+
+    Exact topics are looked up in a dict. Patterns with `+` or `#`
+    wildcards are stored in a trie, so a lookup costs one step per topic
+    level. A literal level wins over `+`, which wins over `#`.
+
+    Topics matched through the trie are remembered in a bounded LRU
+    cache, so the entity topics we are subscribed to only walk the trie
+    once. Topics without a handler are not remembered, so unknown topics
+    can not push the entity topics out.
+    """
+
+    def __init__(self, cache_size: int = 65536) -> None:
+        """Initialize an empty TopicRouter.
+
+        Args:
+            cache_size: How many matched topics to remember.
+        """
+        self.exact: dict[str, Handler] = {}
+        self.root = _Node()
+        self.patterns: list[str] = []
+        self.cache: OrderedDict[str, Handler] = OrderedDict()
+        self.cache_size = cache_size
+
+    def add(self, pattern: str, handler: Handler) -> None:
+        """Add a handler for a topic pattern.
+
+        Args:
+            pattern: Exact topic or topic with `+` and `#` wildcards.
+            handler: Callable taking the topic and the decoded data.
+
+        Raises:
+            ValueError: If the pattern already has a handler or `#` is
+                not the last level.
+        """
+        levels = pattern.split("/")
+
+        if "#" in levels[:-1]:
+            raise ValueError(f"'#' must be the last level in {pattern}")
+
+        if "+" not in levels and "#" not in levels:
+            if pattern in self.exact:
+                raise ValueError(f"{pattern} already has a handler")
+
+            self.exact[pattern] = handler
+            self.patterns.append(pattern)
+            return
+
+        node = self.root
+
+        for level in levels:
+            node = node.children.setdefault(level, _Node())
+
+        if node.handler is not None:
+            raise ValueError(f"{pattern} already has a handler")
+
+        node.handler = handler
+        self.patterns.append(pattern)
+        self.cache.clear()
+
+    def register(self, obj: object) -> None:
+        """Add every method of an object decorated with :func:`route`.
+
+        Args:
+            obj: Instance whose class has methods decorated with `route`.
+        """
+        for cls in reversed(type(obj).__mro__):
+            for func in vars(cls).values():
+                for pattern in getattr(func, "routes", ()):
+                    self.add(pattern, func.__get__(obj))
+
+    def get_patterns(self) -> list[str]:
+        """Get all patterns which have a handler.
+
+        Returns:
+            A list of topic patterns, in the order they were added.
+        """
+        return self.patterns
+
+    def match(self, topic: str) -> Handler | None:
+        """Find the handler for a topic.
+
+        Args:
+            topic: MQTT topic of a received message.
+
+        Returns:
+            The handler for the topic, or None if nothing matches.
+        """
+        handler = self.exact.get(topic)
+
+        if handler is not None:
+            return handler
+
+        cache = self.cache
+
+        try:
+            handler = cache[topic]
+        except KeyError:
+            pass
+        else:
+            try:
+                cache.move_to_end(topic)
+            except KeyError:
+                # evicted by another worker in between, still the handler
+                pass
+
+            return handler
+
+        handler = self.__match(self.root, topic.split("/"), 0)
+
+        if handler is None:
+            return None
+
+        cache[topic] = handler
+
+        if len(cache) > self.cache_size:
+            try:
+                # forget the least recently used topic
+                cache.popitem(last=False)
+            except KeyError:
+                # emptied by another worker in between
+                pass
+
+        return handler
+
+    def __match(self, node: _Node, levels: list[str], index: int) -> Handler | None:
+        """Walk the trie from a node, trying literal, `+` and `#` in order.
+
+        Args:
+            node: Current trie node.
+            levels: Topic split on "/".
+            index: Index of the level to match against the children of node.
+
+        Returns:
+            The handler found below node, or None.
+        """
+        if index == len(levels):
+            if node.handler is not None:
+                return node.handler
+
+            # "a/#" also matches "a"
+            wildcard = node.children.get("#")
+            return wildcard.handler if wildcard else None
+
+        children = node.children
+
+        for key in (levels[index], "+"):
+            child = children.get(key)
+
+            if child is None:
+                continue
+
+            handler = self.__match(child, levels, index + 1)
+
+            if handler is not None:
+                return handler
+
+        wildcard = children.get("#")
+        return wildcard.handler if wildcard else None
+
+    def dispatch(self, topic: str, data: dict) -> bool:
+        """Call the handler for a topic.
+
+        Args:
+            topic: MQTT topic of a received message.
+            data: Decoded message data.
+
+        Returns:
+            True if a handler was called, False otherwise.
+        """
+        handler = self.match(topic)
+
+        if handler is None:
+            return False
+
+        handler(topic, data)
+        return True
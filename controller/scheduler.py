@@ -0,0 +1,201 @@
+from collections import deque
+from itertools import count
+from threading import Condition
+from typing import Callable
+import heapq
+import logging
+import time
+
+
+class Scheduler:
+    """Runs callbacks when they are due or as soon as they are posted.
+
+    Timers are kept in a heap and posted callbacks in a queue, so the
+    thread running the scheduler sleeps until the next timer is due or
+    something is posted, instead of waking up at a fixed rate.
+
+    Callbacks run one at a time on that thread, so they never need locks
+    between each other. Only :meth:`call_soon`, :meth:`call_at`,
+    :meth:`call_later`, :meth:`cancel` and :meth:`stop` may be used from
+    other threads.
+    """
+
+    def __init__(self, clock: Callable[[], float] = time.time) -> None:
+        """Initialize a Scheduler.
+
+        Args:
+            clock: Returns the current time in seconds, replaced in tests.
+        """
+        self.clock = clock
+
+        # [when, seq, callback, is_cancelled], seq keeps equal times in order
+        self.timers: list[list] = []
+        # (posted at, callback)
+        self.events: deque[tuple[float, Callable[[], None]]] = deque()
+        self.seq = count()
+        self.is_stopped = False
+        self.condition = Condition()
+
+        self.wakeups = 0
+        self.idle_wakeups = 0
+        self.actions = 0
+        self.total_latency = 0.0
+        self.max_latency = 0.0
+        self.cpu_time = 0.0
+        self.started_at: float | None = None
+
+    def call_at(self, when: float, callback: Callable[[], None]) -> list:
+        """Run a callback at a given time.
+
+        Args:
+            when: Time from the clock to run the callback at.
+            callback: Called without arguments.
+
+        Returns:
+            A handle which can be passed to :meth:`cancel`.
+        """
+        timer = [when, next(self.seq), callback, False]
+
+        with self.condition:
+            heapq.heappush(self.timers, timer)
+
+            # the thread might be sleeping until a later timer
+            if self.timers[0] is timer:
+                self.condition.notify()
+
+        return timer
+
+    def call_later(self, delay: float, callback: Callable[[], None]) -> list:
+        """Run a callback after a delay.
+
+        Args:
+            delay: Seconds to wait.
+            callback: Called without arguments.
+
+        Returns:
+            A handle which can be passed to :meth:`cancel`.
+        """
+        return self.call_at(self.clock() + delay, callback)
+
+    def call_soon(self, callback: Callable[[], None]) -> None:
+        """Run a callback as soon as possible.
+
+        Args:
+            callback: Called without arguments.
+        """
+        with self.condition:
+            self.events.append((self.clock(), callback))
+            self.condition.notify()
+
+    def cancel(self, timer: list | None) -> None:
+        """Cancel a timer which has not run yet.
+
+        Args:
+            timer: Handle from :meth:`call_at` or :meth:`call_later`, or None.
+        """
+        if timer is not None:
+            # skipped when it comes up, instead of searching the heap
+            timer[3] = True
+
+    def get_timeout(self) -> float | None:
+        """Get how long the thread can sleep.
+
+        Returns:
+            Seconds until the next timer, 0 if something is due, or None
+            if there is nothing to wait for.
+        """
+        with self.condition:
+            if self.events:
+                return 0.0
+
+            while self.timers and self.timers[0][3]:
+                heapq.heappop(self.timers)
+
+            if not self.timers:
+                return None
+
+            return max(0.0, self.timers[0][0] - self.clock())
+
+    def run_pending(self) -> int:
+        """Run every posted callback and every timer which is due.
+
+        Returns:
+            Number of callbacks which ran.
+        """
+        now = self.clock()
+        due = []
+
+        with self.condition:
+            while self.events:
+                due.append(self.events.popleft())
+
+            while self.timers and self.timers[0][0] <= now:
+                when, _, callback, is_cancelled = heapq.heappop(self.timers)
+
+                if not is_cancelled:
+                    due.append((when, callback))
+
+        for since, callback in due:
+            latency = max(0.0, self.clock() - since)
+            self.total_latency += latency
+            self.max_latency = max(self.max_latency, latency)
+            self.actions += 1
+
+            try:
+                callback()
+            except Exception:
+                logging.exception(f"Scheduled callback {callback} failed")
+
+        return len(due)
+
+    def run(self) -> None:
+        """Run callbacks until stopped, sleeping while nothing is due."""
+        self.started_at = self.clock()
+
+        while True:
+            with self.condition:
+                while not self.is_stopped:
+                    timeout = self.get_timeout()
+
+                    if timeout == 0.0:
+                        break
+
+                    self.condition.wait(timeout)
+
+                if self.is_stopped:
+                    return
+
+            cpu = time.thread_time()
+            self.wakeups += 1
+
+            if self.run_pending() == 0:
+                self.idle_wakeups += 1
+
+            self.cpu_time += time.thread_time() - cpu
+
+    def stop(self) -> None:
+        """Stop :meth:`run` after the running callback."""
+        with self.condition:
+            self.is_stopped = True
+            self.condition.notify()
+
+    def get_stats(self) -> dict:
+        """Get how quickly and how often the scheduler woke up.
+
+        Returns:
+            A dictionary with the number of wakeups, wakeups where nothing
+            was due, callbacks run, average and maximum latency in
+            milliseconds from due or posted to running, and the share of
+            one CPU used by callbacks since the scheduler started.
+        """
+        running = self.clock() - self.started_at if self.started_at else 0.0
+
+        return {
+            "wakeups": self.wakeups,
+            "idle_wakeups": self.idle_wakeups,
+            "actions": self.actions,
+            "avg_latency_ms": self.total_latency / max(self.actions, 1) * 1e3,
+            "max_latency_ms": self.max_latency * 1e3,
+            "cpu": self.cpu_time / running if running > 0 else 0.0,
+            "pending": len(self.events) + len(self.timers),
+        }
@@ -0,0 +1,232 @@
+from .config import SNAPSHOT_INTERVAL
+from .hydroplant import Actuator, Entity, HydroplantSystem
+from .job import Job
+
+from threading import Condition, Thread
+from typing import Callable
+import logging
+import mmap
+import os
+import pickle
+import time
+
+# start of every snapshot file, the number is the format version
+MAGIC = b"HPSNAP1\n"
+
+
+class SnapshotUnpickler(pickle.Unpickler):
+    """Unpickler which only creates builtin types.
+
+    Snapshots only contain dicts, lists, tuples, strings and numbers, so
+    a changed file can never run code.
+    """
+
+    def find_class(self, module: str, name: str):
+        raise pickle.UnpicklingError(f"Snapshots can not contain {module}.{name}")
+
+
+def take_snapshot(system: HydroplantSystem, jobs: list[Job]) -> dict:
+    """Get the entities, their last data and pending jobs as plain data.
+
+    Args:
+        system: The HydroplantSystem to take the entities from.
+        jobs: Pending jobs of autonomy.
+
+    Returns:
+        Snapshot data which can be written with :func:`write_snapshot`.
+    """
+    # one topology is consistent, even while nodes present themselves
+    topology = system.get_topology()
+
+    return {
+        "time": time.time(),
+        "entities": [
+            (entity.unique_id, isinstance(entity, Actuator), dict(entity.get_data()))
+            for entity in topology.entities.values()
+        ],
+        "jobs": [job.to_dict() for job in list(jobs)],
+    }
+
+
+def write_snapshot(path: str, snapshot: dict) -> None:
+    """Write a snapshot to a file.
+
+    The snapshot is written to a temporary file which then replaces the
+    old one, so a crash while writing never leaves a broken snapshot.
+
+    Args:
+        path: Path of the snapshot file.
+        snapshot: Result of :func:`take_snapshot`.
+    """
+    temporary = path + ".tmp"
+
+    with open(temporary, "wb") as f:
+        f.write(MAGIC)
+        pickle.dump(snapshot, f, protocol=pickle.HIGHEST_PROTOCOL)
+        f.flush()
+        os.fsync(f.fileno())
+
+    os.replace(temporary, path)
+
+
+def read_snapshot(path: str) -> dict | None:
+    """Read a snapshot written by :func:`write_snapshot`.
+
+    The file is memory-mapped, so it is not copied before it is decoded.
+
+    Args:
+        path: Path of the snapshot file.
+
+    Returns:
+        The snapshot, or None if there is no snapshot file.
+
+    Raises:
+        ValueError: If the file is not a valid snapshot.
+    """
+    try:
+        f = open(path, "rb")
+    except FileNotFoundError:
+        return None
+
+    with f:
+        if os.fstat(f.fileno()).st_size <= len(MAGIC):
+            raise ValueError(f"{path} is not a snapshot")
+
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            if data.read(len(MAGIC)) != MAGIC:
+                raise ValueError(f"{path} is not a snapshot")
+
+            try:
+                return SnapshotUnpickler(data).load()
+            except (pickle.UnpicklingError, EOFError) as e:
+                raise ValueError(f"{path} is not a valid snapshot") from e
+
+
+def restore_entities(system: HydroplantSystem, snapshot: dict) -> list[Entity]:
+    """Add the entities of a snapshot with their last data.
+
+    Entities on floors or stages which are no longer in the topology
+    are skipped.
+
+    Args:
+        system: The HydroplantSystem to add the entities to.
+        snapshot: Result of :func:`read_snapshot`.
+
+    Returns:
+        The restored entities.
+    """
+    entities = []
+
+    with system.batch():
+        for unique_id, is_actuator, data in snapshot["entities"]:
+            floor = system.get_floor(unique_id)
+
+            if floor is None or (is_actuator and floor.get_stage(unique_id) is None):
+                logging.warning(f"Not restoring {unique_id}, it is not in the topology")
+                continue
+
+            if is_actuator:
+                entity = system.add_actuator(unique_id)
+            else:
+                entity = system.add_logic_controller(unique_id)
+
+            if data:
+                entity.set_data(data)
+
+            entities.append(entity)
+
+    return entities
+
+
+def restore_jobs(snapshot: dict, now: float | None = None) -> list[Job]:
+    """Create the pending jobs of a snapshot.
+
+    The step a job was at is sent again, since its receipt might have
+    been lost in the restart, and gets its whole deadline again. Waits
+    and deadlines of later steps are moved by how long the controller
+    was down, so the restart does not count against them.
+
+    Args:
+        snapshot: Result of :func:`read_snapshot`.
+        now: Current time, defaults to the system clock.
+
+    Returns:
+        The pending jobs.
+    """
+    if now is None:
+        now = time.time()
+
+    downtime = max(0.0, now - snapshot["time"])
+    jobs = [Job.from_dict(data) for data in snapshot["jobs"]]
+
+    for job in jobs:
+        if job.resume_at:
+            job.resume_at += downtime
+
+        for step in job.steps[job.at_step :]:
+            step.timestamp += downtime
+
+        if not job.done_with_steps():
+            step = job.steps[job.at_step]
+            step.has_sent = False
+            step.time_sent = 0.0
+            step.timestamp = now
+
+    return jobs
+
+
+class SnapshotWriter:
+    """Writes a snapshot to a file every `interval` seconds."""
+
+    def __init__(
+        self,
+        path: str,
+        snapshot_callback: Callable[[], dict],
+        interval: float = SNAPSHOT_INTERVAL,
+    ) -> None:
+        """Initialize a SnapshotWriter and start its thread.
+
+        Args:
+            path: Path of the snapshot file.
+            snapshot_callback: Returns the snapshot to write.
+            interval: Seconds between snapshots.
+        """
+        self.path = path
+        self.get_snapshot = snapshot_callback
+        self.interval = interval
+        self.writes = 0
+        self.is_closed = False
+
+        self.condition = Condition()
+        self.thread = Thread(target=self.__run, name="snapshot", daemon=True)
+        self.thread.start()
+
+    def save(self) -> None:
+        """Write a snapshot right away."""
+        try:
+            write_snapshot(self.path, self.get_snapshot())
+            self.writes += 1
+        except Exception:
+            logging.exception(f"Could not write snapshot to {self.path}")
+
+    def close(self) -> None:
+        """Write a last snapshot and stop the thread."""
+        with self.condition:
+            self.is_closed = True
+            self.condition.notify_all()
+
+        self.thread.join()
+
+    def __run(self) -> None:
+        """Write a snapshot every interval until closed."""
+        while True:
+            with self.condition:
+                if not self.is_closed:
+                    self.condition.wait(self.interval)
+
+                is_closed = self.is_closed
+
+            self.save()
+
+            if is_closed:
+                return
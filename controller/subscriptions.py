@@ -0,0 +1,74 @@
+from threading import Lock
+
+
+class Subscriptions:
+    """Reference counted MQTT subscriptions.
+
+    Several entities can share a topic, e.g. the wildcard topics of a node.
+    A topic is only subscribed when its first reference is added, and only
+    unsubscribed when its last reference is released.
+    """
+
+    def __init__(self) -> None:
+        """Initialize an empty Subscriptions instance."""
+        self.counts: dict[str, int] = {}
+        # messages can be handled by several threads
+        self.lock = Lock()
+
+    def acquire(self, topics: list[str]) -> list[str]:
+        """Add a reference for each topic.
+
+        Args:
+            topics: Topics to reference, may contain duplicates.
+
+        Returns:
+            Topics which had no references before and must be subscribed to.
+        """
+        new_topics = []
+
+        with self.lock:
+            for topic in topics:
+                count = self.counts.get(topic, 0)
+
+                if count == 0:
+                    new_topics.append(topic)
+
+                self.counts[topic] = count + 1
+
+        return new_topics
+
+    def release(self, topics: list[str]) -> list[str]:
+        """Remove a reference for each topic.
+
+        Args:
+            topics: Topics to release, may contain duplicates.
+
+        Returns:
+            Topics which have no references left and must be unsubscribed from.
+        """
+        old_topics = []
+
+        with self.lock:
+            for topic in topics:
+                count = self.counts.get(topic, 0)
+
+                if count == 0:
+                    continue
+
+                if count == 1:
+                    del self.counts[topic]
+                    old_topics.append(topic)
+                    continue
+
+                self.counts[topic] = count - 1
+
+        return old_topics
+
+    def get_topics(self) -> list[str]:
+        """Get all topics with at least one reference.
+
+        Returns:
+            A list of topics which should be subscribed to.
+        """
+        with self.lock:
+            return list(self.counts)
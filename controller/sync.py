@@ -0,0 +1,217 @@
+from .config import GUI_SYNC_LEGACY, GUI_SYNC_WINDOW, GUI_SYNC_MAX_LATENCY
+from .topics import GUI_TOPICS, SYNC_DELTA_TOPIC, SYNC_SNAPSHOT_TOPIC, SYNC_TOPIC
+
+from threading import Condition, Thread
+from typing import Callable
+import time
+
+
+class GuiSync:
+    """Keeps the GUI in sync by only publishing what changed.
+
+    Every delta has a sequence number one higher than the last. A GUI which
+    sees a gap in the sequence asks for a full snapshot, which carries the
+    sequence number of the last delta it includes.
+
+    Deltas are published on `SYNC_DELTA_TOPIC` as
+    `{"seq": ..., "changed": {...}, "removed": [...]}` and snapshots on
+    `SYNC_SNAPSHOT_TOPIC` as `{"seq": ..., "data": {...}}`. In legacy
+    mode snapshots are also published on `SYNC_TOPIC` with its old
+    payload, every GUI topic mapped to its value, for GUIs which do not
+    know about sequence numbers. Such a GUI only gets the state when it
+    connects or asks for it, never after every delta.
+
+    Changes are coalesced over a short window, so when many nodes present
+    themselves at once the GUI gets one topic list and one delta per
+    window instead of one per node. The window is pushed back by every new
+    change, but never further than `max_latency` after the first one.
+
+    Attributes:
+        state: Last published value for each GUI topic.
+        seq: Sequence number of the last published delta.
+    """
+
+    def __init__(
+        self,
+        publish_callback: Callable[[str, dict], None],
+        topics_callback: Callable[[], list[str]],
+        window: float = GUI_SYNC_WINDOW,
+        max_latency: float = GUI_SYNC_MAX_LATENCY,
+        legacy: bool = GUI_SYNC_LEGACY,
+    ) -> None:
+        """Initialize a GuiSync instance.
+
+        Args:
+            publish_callback: Callback to communicate with MQTT.
+            topics_callback: Returns all GUI topics in the system.
+            window: Seconds without changes before publishing. With 0
+                every change is published right away.
+            max_latency: Maximum seconds a change can wait.
+            legacy: Also publish snapshots on `SYNC_TOPIC` with the old
+                payload. Deltas are never published there.
+        """
+        self.publish = publish_callback
+        self.get_topics = topics_callback
+        self.window = window
+        self.max_latency = max_latency
+        self.legacy = legacy
+
+        self.state: dict[str, float | int | None] = {}
+        self.seq = 0
+
+        # pending changes, dicts to keep the order they came in
+        self.changed: dict[str, float | int | None] = {}
+        self.removed: dict[str, None] = {}
+        self.topology_changed = False
+
+        self.first_change: float | None = None
+        self.flush_at: float | None = None
+
+        # messages can be handled by several threads
+        self.condition = Condition()
+        self.thread: Thread | None = None
+        self.stopped = False
+
+    def update(
+        self,
+        changed: dict[str, float | int | None] | None = None,
+        removed: list[str] | None = None,
+    ) -> None:
+        """Queue a delta for values which changed and topics which are gone.
+
+        Nothing is published if no value actually changed.
+
+        Args:
+            changed: GUI topics mapped to their current value.
+            removed: GUI topics which no longer exist.
+        """
+        with self.condition:
+            for topic in removed or []:
+                self.changed.pop(topic, None)
+                self.removed[topic] = None
+
+            for topic, value in (changed or {}).items():
+                # e.g. a node presenting itself again
+                self.removed.pop(topic, None)
+                self.changed[topic] = value
+
+            self.__schedule()
+
+    def update_topics(self) -> None:
+        """Queue publishing the list of GUI topics."""
+        with self.condition:
+            self.topology_changed = True
+            self.__schedule()
+
+    def flush(self) -> None:
+        """Publish pending changes right away."""
+        with self.condition:
+            self.__flush()
+
+    def stop(self) -> None:
+        """Publish pending changes and stop the thread.
+
+        Changes after stopping are published right away.
+        """
+        with self.condition:
+            self.__flush()
+            self.stopped = True
+            self.window = 0
+            self.condition.notify()
+
+        if self.thread is not None:
+            self.thread.join()
+            self.thread = None
+
+    def publish_snapshot(self) -> None:
+        """Publish every GUI topic with its value.
+
+        The snapshot is published with its sequence number on
+        `SYNC_SNAPSHOT_TOPIC`, and in legacy mode without on `SYNC_TOPIC`.
+        """
+        with self.condition:
+            self.__flush()
+            self.publish(
+                SYNC_SNAPSHOT_TOPIC, {"seq": self.seq, "data": self.state.copy()}
+            )
+
+            if self.legacy:
+                self.publish(SYNC_TOPIC, self.state.copy())
+
+    def __schedule(self) -> None:
+        """Set when pending changes should be published.
+
+        Must be called while holding the condition.
+        """
+        if self.window <= 0:
+            self.__flush()
+            return
+
+        now = time.monotonic()
+
+        if self.first_change is None:
+            self.first_change = now
+
+        self.flush_at = min(now + self.window, self.first_change + self.max_latency)
+
+        if self.thread is None:
+            self.thread = Thread(target=self.__run, name="gui-sync", daemon=True)
+            self.thread.start()
+
+        self.condition.notify()
+
+    def __flush(self) -> None:
+        """Publish the topic list and one delta for pending changes.
+
+        Must be called while holding the condition.
+        """
+        if self.topology_changed:
+            self.publish(GUI_TOPICS, {"topics": self.get_topics()})
+
+        delta = {}
+
+        for topic, value in self.changed.items():
+            if topic in self.state and self.state[topic] == value:
+                continue
+
+            self.state[topic] = value
+            delta[topic] = value
+
+        gone = []
+
+        for topic in self.removed:
+            if topic not in self.state:
+                continue
+
+            del self.state[topic]
+            gone.append(topic)
+
+        self.changed = {}
+        self.removed = {}
+        self.topology_changed = False
+        self.first_change = None
+        self.flush_at = None
+
+        if not delta and not gone:
+            return
+
+        self.seq += 1
+        self.publish(
+            SYNC_DELTA_TOPIC, {"seq": self.seq, "changed": delta, "removed": gone}
+        )
+
+    def __run(self) -> None:
+        """Publish pending changes when their window has passed."""
+        with self.condition:
+            while not self.stopped:
+                if self.flush_at is None:
+                    self.condition.wait()
+                    continue
+
+                timeout = self.flush_at - time.monotonic()
+
+                if timeout > 0:
+                    self.condition.wait(timeout)
+                    continue
+
+                self.__flush()
@@ -0,0 +1,228 @@
+from threading import Lock
+from typing import TYPE_CHECKING
+import time
+
+import numpy as np
+
+# hydroplant keeps a table, so only import it for type hints
+if TYPE_CHECKING:
+    from .hydroplant import Entity, EntityType
+
+
+class StateTable:
+    """Column store with one row per entity, for rules over the whole farm.
+
+    Type, floor, stage, value and last update time are kept in NumPy
+    arrays, so a rule like "every LED which is not on" is a vectorized
+    mask instead of a loop over entities. Values which are not numbers
+    are stored as NaN. Rows of removed entities are reused.
+    """
+
+    def __init__(self, capacity: int = 1024) -> None:
+        """Initialize an empty StateTable.
+
+        Args:
+            capacity: Number of rows to allocate up front.
+        """
+        self.lock = Lock()
+
+        self.types = np.zeros(capacity, dtype=np.int16)
+        self.floors = np.zeros(capacity, dtype=np.int32)
+        self.stages = np.zeros(capacity, dtype=np.int32)
+        self.values = np.full(capacity, np.nan)
+        self.updated = np.zeros(capacity)
+        self.active = np.zeros(capacity, dtype=bool)
+        self.entities = np.empty(capacity, dtype=object)
+
+        # unique_id -> row, and rows free to reuse
+        self.rows: dict[str, int] = {}
+        self.free: list[int] = []
+        self.size = 0
+
+        # floor and stage names -> code, 0 is ""
+        self.codes: dict[str, int] = {"": 0}
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    def add(self, entity: "Entity") -> None:
+        """Add a row for an entity, or replace the entity in its row.
+
+        Args:
+            entity: The entity to add.
+        """
+        with self.lock:
+            row = self.rows.get(entity.unique_id)
+
+            if row is None:
+                row = self.__allocate()
+                self.rows[entity.unique_id] = row
+
+            self.types[row] = entity.type
+            self.floors[row] = self.__get_code(entity.floor)
+            self.stages[row] = self.__get_code(entity.stage)
+            self.values[row] = to_number(entity.get_value())
+            self.updated[row] = 0.0
+            self.active[row] = True
+            self.entities[row] = entity
+
+    def remove(self, entity: "Entity") -> None:
+        """Remove the row of an entity.
+
+        Args:
+            entity: The entity to remove.
+        """
+        with self.lock:
+            row = self.rows.get(entity.unique_id)
+
+            # a newer entity with the same id might have replaced it
+            if row is None or self.entities[row] is not entity:
+                return
+
+            del self.rows[entity.unique_id]
+            self.active[row] = False
+            self.entities[row] = None
+            self.free.append(row)
+
+    def update(self, entity: "Entity") -> None:
+        """Copy the current value of an entity into its row.
+
+        Args:
+            entity: The entity which changed.
+        """
+        with self.lock:
+            row = self.rows.get(entity.unique_id)
+
+            if row is None or self.entities[row] is not entity:
+                return
+
+            self.values[row] = to_number(entity.get_value())
+            self.updated[row] = time.time()
+
+    def select(
+        self,
+        entity_type: "EntityType | None" = None,
+        floor: str | None = None,
+        stage: str | None = None,
+        differs_from: float | None = None,
+    ) -> list["Entity"]:
+        """Get the entities matching every given condition.
+
+        Args:
+            entity_type: Only entities of this type.
+            floor: Only entities on this floor.
+            stage: Only entities in this stage.
+            differs_from: Only entities whose value is not this, including
+                entities without a value.
+
+        Returns:
+            The matching entities.
+        """
+        with self.lock:
+            mask = self.get_mask(entity_type, floor, stage, differs_from)
+            return self.entities[: self.size][mask].tolist()
+
+    def get_mask(
+        self,
+        entity_type: "EntityType | None" = None,
+        floor: str | None = None,
+        stage: str | None = None,
+        differs_from: float | None = None,
+    ) -> np.ndarray:
+        """Get a mask of the rows matching every given condition.
+
+        Must be called while holding the lock. See :meth:`select`.
+
+        Returns:
+            A boolean array with one value per used row.
+        """
+        n = self.size
+        mask = self.active[:n].copy()
+
+        if entity_type is not None:
+            mask &= self.types[:n] == entity_type
+
+        if floor is not None:
+            mask &= self.floors[:n] == self.codes.get(floor, -1)
+
+        if stage is not None:
+            mask &= self.stages[:n] == self.codes.get(stage, -1)
+
+        if differs_from is not None:
+            # NaN never equals anything
+            mask &= self.values[:n] != differs_from
+
+        return mask
+
+    def __get_code(self, name: str) -> int:
+        """Get the code of a floor or stage name.
+
+        Args:
+            name: Name of a floor or stage.
+
+        Returns:
+            The code, a new one for unknown names.
+        """
+        code = self.codes.get(name)
+
+        if code is None:
+            code = self.codes[name] = len(self.codes)
+
+        return code
+
+    def __allocate(self) -> int:
+        """Get a free row, growing the arrays when they are full.
+
+        Must be called while holding the lock.
+
+        Returns:
+            Index of the row.
+        """
+        if self.free:
+            return self.free.pop()
+
+        if self.size == len(self.types):
+            self.__grow(2 * len(self.types))
+
+        row = self.size
+        self.size += 1
+        return row
+
+    def __grow(self, capacity: int) -> None:
+        """Copy every column into larger arrays.
+
+        Args:
+            capacity: New number of rows.
+        """
+        n = len(self.types)
+
+        for name, fill in (
+            ("types", 0),
+            ("floors", 0),
+            ("stages", 0),
+            ("values", np.nan),
+            ("updated", 0.0),
+            ("active", False),
+            ("entities", None),
+        ):
+            old = getattr(self, name)
+            new = np.empty(capacity, dtype=old.dtype)
+            new[:n] = old
+            new[n:] = fill
+            setattr(self, name, new)
+
+
+def to_number(value) -> float:
+    """Convert an entity value to a float for the table.
+
+    Args:
+        value: Value of an entity.
+
+    Returns:
+        The value as a float, or NaN if it is not a number.
+    """
+    # bools too, since True == 1 for the rest of the controller
+    if isinstance(value, (int, float)):
+        return float(value)
+
+    return np.nan
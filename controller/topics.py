@@ -5,13 +5,23 @@ PREFIX = "hydroplant/"
 DEVICE_TOPIC = PREFIX + "device"
 LOG_TOPIC = PREFIX + "log"
 SYNC_TOPIC = PREFIX + "gui/sync"
+SYNC_REQUEST_TOPIC = PREFIX + "gui/sync/request"
 AUTONOMY_TOPIC = PREFIX + "gui_command/autonomy"
 DEVICES_DISCONNECT_TOPIC = PREFIX + "disconnected/devices"
 IS_READY_TOPIC = PREFIX + "is_ready"
+DEMO_MOVE_TOPIC = PREFIX + "demo1"
+DEMO_INSPECT_TOPIC = PREFIX + "demo2"
+# receipts for logic controllers and actuators
+# hydroplant/command/floor_1/plant_mover_node/plant_mover/receipt
+# hydroplant/command/floor_1/stage_1/climate_node/LED/receipt
+LOGIC_CONTROLLER_RECEIPT_TOPIC = PREFIX + "command/+/+/+/receipt"
+ACTUATOR_RECEIPT_TOPIC = PREFIX + "command/+/+/+/+/receipt"
 # TEMP_TEST_TOPIC = PREFIX + "measurement/#"
 
 # pub
 GUI_TOPICS = PREFIX + "gui/topics"
+SYNC_DELTA_TOPIC = PREFIX + "gui/sync/delta"
+SYNC_SNAPSHOT_TOPIC = PREFIX + "gui/sync/snapshot"
 READY_TOPIC = PREFIX + "ready"
 MASTER_DISCONNECT_TOPIC = PREFIX + "disconnected/master_controller"
 # commonly used
@@ -0,0 +1,121 @@
+from .config import TOPOLOGY_FILE
+from .hydroplant import Floor
+
+import json
+import logging
+
+
+def _check_name(name: str, level: str) -> None:
+    """Check that topics with a floor or stage name can be parsed.
+
+    Topics are split on "/", and the floor and stage are found by
+    :func:`controller.utils.parse_topic` as the first levels containing
+    "floor" and "stage".
+
+    Args:
+        name: Name of the floor or stage.
+        level: "floor" or "stage", which the name must contain.
+
+    Raises:
+        ValueError: If the name would not be recognised in a topic.
+    """
+    if level not in name or "/" in name:
+        raise ValueError(f"{level} name {name!r} must contain {level!r} and no '/'")
+
+    # the floor comes first, so it would also be taken as the stage
+    if level == "floor" and "stage" in name:
+        raise ValueError(f"floor name {name!r} must not contain 'stage'")
+
+
+def parse_topology(data: dict) -> list[Floor]:
+    """Build floors and stages from topology data.
+
+    Args:
+        data: Dictionary with a list of floors, each with a name and a
+            list of stages with a name and an optional capacity. E.g.
+            `{"floors": [{"name": "floor_1", "stages": [{"name": "stage_1", "capacity": 4}]}]}`
+
+    Returns:
+        The floors with their stages.
+
+    Raises:
+        ValueError: If the data is missing names, has duplicates or names
+            which topics can not be parsed with, e.g. a stage named
+            `germination` instead of `stage_germination`.
+    """
+    floors = []
+    names = set()
+
+    for floor_data in data.get("floors", []):
+        name = floor_data.get("name")
+
+        if not name:
+            raise ValueError(f"Floor without a name in topology {floor_data=}")
+
+        if name in names:
+            raise ValueError(f"{name} is in the topology more than once")
+
+        _check_name(name, "floor")
+
+        names.add(name)
+        floor = Floor(name)
+
+        for stage_data in floor_data.get("stages", []):
+            if not stage_data.get("name"):
+                raise ValueError(f"Stage without a name on {name} {stage_data=}")
+
+            _check_name(stage_data["name"], "stage")
+            floor.add_stage(stage_data["name"], stage_data.get("capacity", 0))
+
+        floors.append(floor)
+
+    return floors
+
+
+def load_topology(path: str = TOPOLOGY_FILE) -> list[Floor]:
+    """Load floors and stages from a JSON file.
+
+    Args:
+        path: Path to the topology file.
+
+    Returns:
+        The floors with their stages.
+
+    Raises:
+        OSError: If the file can not be read.
+        ValueError: If the file is not a valid topology.
+    """
+    with open(path) as f:
+        floors = parse_topology(json.load(f))
+
+    logging.info(
+        f"Loaded {len(floors)} floors with "
+        f"{sum(len(floor.stages) for floor in floors)} stages from {path}"
+    )
+    return floors
+
+
+def generate_topology(floors: int, stages: int, capacity: int = 4) -> dict:
+    """Generate topology data for a farm of any size, e.g. for benchmarks.
+
+    Args:
+        floors: Number of floors.
+        stages: Number of stages per floor.
+        capacity: Plant holders per stage.
+
+    Returns:
+        Topology data which can be passed to :func:`parse_topology`
+        or saved as a topology file.
+    """
+    return {
+        "floors": [
+            {
+                "name": f"floor_{f}",
+                "stages": [
+                    {"name": f"stage_{s}", "capacity": capacity}
+                    for s in range(1, stages + 1)
+                ],
+            }
+            for f in range(1, floors + 1)
+        ]
+    }
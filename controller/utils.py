@@ -1,6 +1,90 @@
+from .config import TOPIC_CACHE_SIZE
+
+from functools import lru_cache
+from typing import NamedTuple
 import logging
 
 
+class ParsedTopic(NamedTuple):
+    """The parts of an MQTT topic or unique id.
+
+    Attributes:
+        prefix: First level, e.g. `hydroplant`.
+        data_type: Second level, e.g. `command` or `gui_command`.
+        floor: First level containing "floor", or "".
+        stage: First level containing "stage", or "".
+        node: Node after floor and stage, or "" if the topic is too short.
+        part: Part after the node, or "" if the topic is too short.
+        is_receipt: Whether the topic contains "/receipt".
+        unique_id: E.g. `floor_1/stage_1/climate_node/LED`, or "" without
+            floor, node and part.
+        parts: Every level of the topic.
+    """
+
+    prefix: str
+    data_type: str
+    floor: str
+    stage: str
+    node: str
+    part: str
+    is_receipt: bool
+    unique_id: str
+    parts: tuple[str, ...]
+
+
+@lru_cache(maxsize=TOPIC_CACHE_SIZE)
+def parse_topic(topic: str) -> ParsedTopic:
+    """Split a topic once and remember the result.
+
+    The same topics arrive over and over, so the result is cached.
+
+    Args:
+        topic: MQTT topic string or unique id
+
+    Returns:
+        The parsed topic.
+    """
+    parts = tuple(topic.split("/"))
+    floor = ""
+    stage = ""
+
+    for part in parts:
+        if not floor and "floor" in part:
+            floor = part
+
+        if not stage and "stage" in part:
+            stage = part
+
+    node = ""
+    part = ""
+    unique_id = ""
+
+    if floor:
+        # floor/(stage)/node/part
+        index = parts.index(floor) + (2 if stage else 1)
+
+        if index + 1 < len(parts):
+            node = parts[index]
+            part = parts[index + 1]
+
+            if stage:
+                unique_id = "/".join((floor, stage, node, part))
+            else:
+                unique_id = "/".join((floor, node, part))
+
+    return ParsedTopic(
+        prefix=parts[0],
+        data_type=parts[1] if len(parts) > 1 else "",
+        floor=floor,
+        stage=stage,
+        node=node,
+        part=part,
+        is_receipt="/receipt" in topic,
+        unique_id=unique_id,
+        parts=parts,
+    )
+
+
 def get_last_part(topic: str) -> str:
     """Gets the last part of a topic string, usually the `sensor_id`
 
@@ -10,8 +94,7 @@ def get_last_part(topic: str) -> str:
     Returns:
         str: The last part of the input after "/"
     """
-    parts = topic.split("/")
-    return parts[-1:][0]
+    return parse_topic(topic).parts[-1]
 
 
 def get_second_last_part(topic: str) -> str:
@@ -23,8 +106,8 @@ def get_second_last_part(topic: str) -> str:
     Returns:
         The last part of the input after "/"
     """
-    parts = topic.split("/")
-    return parts[-2:][0]
+    # a topic without "/" is its own second last part
+    return parse_topic(topic).parts[-2:][0]
 
 
 def get_topic_ids(topic: str) -> tuple[str, str]:
@@ -123,12 +206,7 @@ def get_stage_from_topic(topic: str) -> str:
     Returns:
         The stage as a string. E.g stage_1
     """
-    topics = topic.split("/")
-
-    for i in topics:
-        if "stage" in i:
-            return i
-    return ""
+    return parse_topic(topic).stage
 
 
 def get_floor_from_topic(topic: str) -> str:
@@ -142,12 +220,7 @@ def get_floor_from_topic(topic: str) -> str:
     Returns:
         The floor as a string. E.g floor_1
     """
-    topics = topic.split("/")
-
-    for i in topics:
-        if "floor" in i:
-            return i
-    return ""
+    return parse_topic(topic).floor
 
 
 def is_type(type_name: str, data: dict) -> bool:
@@ -242,33 +315,42 @@ def get_unique_id(topic: str) -> str:
     """
     # from receipt
     # hydroplant/<something>/floor_1/stage_1/climate_node/LED
-    # unsure which topic
-    parts = topic.split("/")
-    floor = get_floor_from_topic(topic)
+    parsed = parse_topic(topic)
 
-    assert floor != "", "Topic must include floor!"
+    assert parsed.floor != "", "Topic must include floor!"
 
-    stage = get_stage_from_topic(topic)
+    if not parsed.unique_id:
+        raise IndexError(f"{topic} has no node and part after the floor")
 
-    offset = 1
+    return parsed.unique_id
 
-    # we might not have stage
-    if stage:
-        offset = 2
 
-    floor_index = parts.index(floor)
-    node = parts[floor_index + offset]
-    part = parts[floor_index + offset + 1]
+def get_node_wildcard_topic(topic: str) -> str:
+    """Gets a topic covering the same kind of topic for every part of a node.
 
-    # floor_1/stage_1/climate_node/LED
-    if stage:
-        unqiue_id = "/".join([floor, stage, node, part])
-    else:
-        unqiue_id = "/".join([floor, node, part])
+    Args:
+        topic: MQTT topic string of an entity
+
+    Returns:
+        The topic with stage and part replaced by `+`. E.g.
+        `hydroplant/command/floor_1/+/climate_node/+/receipt`
+    """
+    # hydroplant/command/floor_1/stage_1/climate_node/LED/receipt or
+    # hydroplant/gui_command/floor_1/plant_mover_node/plant_mover
+    parsed = parse_topic(topic)
 
-    # logging.debug(f"{unqiue_id=}")
+    assert parsed.floor != "", "Topic must include floor!"
+
+    parts = list(parsed.parts)
+    floor_index = parts.index(parsed.floor)
+
+    if parsed.stage:
+        parts[floor_index + 1] = "+"
+        parts[floor_index + 3] = "+"
+    else:
+        parts[floor_index + 2] = "+"
 
-    return unqiue_id
+    return "/".join(parts)
 
 
 def get_data_type(topic: str) -> str:
@@ -295,4 +377,4 @@ def is_receipt(topic: str) -> bool:
     Returns:
         True if the topic contains "/receipt", False otherwise.
     """
-    return topic.find("/receipt") != -1
+    return parse_topic(topic).is_receipt
@@ -0,0 +1,331 @@
+from .config import (
+    DATABASE_BATCH_SIZE,
+    DATABASE_FLUSH_INTERVAL,
+    DATABASE_MAX_PENDING,
+    DATABASE_STATE_WINDOW,
+    ROLLUP_INTERVAL,
+)
+from .rollup import RESOLUTIONS, Rollup
+
+from threading import Condition, Lock, Thread
+import datetime as dt
+import logging
+import time
+
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError, PyMongoError
+
+
+class BatchWriter:
+    """Write-behind buffer which inserts documents into a collection in batches.
+
+    Documents are inserted with `insert_many(ordered=False)` from a
+    background thread, either when `batch_size` documents are waiting or
+    `flush_interval` seconds have passed. When `max_pending` documents are
+    waiting, `put` blocks until the thread has caught up.
+    """
+
+    def __init__(
+        self,
+        collection,
+        batch_size: int = DATABASE_BATCH_SIZE,
+        flush_interval: float = DATABASE_FLUSH_INTERVAL,
+        max_pending: int = DATABASE_MAX_PENDING,
+    ) -> None:
+        """Initialize a BatchWriter and start its thread.
+
+        Args:
+            collection: The pymongo collection to insert into.
+            batch_size: Number of documents which triggers a write.
+            flush_interval: Longest time in seconds a document waits.
+            max_pending: Number of waiting documents before `put` blocks.
+        """
+        self.collection = collection
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+
+        self.pending: list[dict] = []
+        self.written = 0
+        self.failed = 0
+        self.is_closed = False
+
+        self.condition = Condition()
+        self.thread = Thread(
+            target=self.__run, name=f"writer-{collection.name}", daemon=True
+        )
+        self.thread.start()
+
+    def put(self, document: dict) -> None:
+        """Queue a document for insertion.
+
+        Blocks while the buffer is full.
+
+        Args:
+            document: The document to insert.
+
+        Raises:
+            RuntimeError: If the writer is closed.
+        """
+        with self.condition:
+            while len(self.pending) >= self.max_pending and not self.is_closed:
+                self.condition.wait()
+
+            if self.is_closed:
+                raise RuntimeError(f"Writer for {self.collection.name} is closed")
+
+            self.pending.append(document)
+
+            if len(self.pending) >= self.batch_size:
+                self.condition.notify_all()
+
+    def flush(self) -> None:
+        """Insert all waiting documents right away."""
+        with self.condition:
+            batch = self.__take()
+
+        self.__write(batch)
+
+    def close(self) -> None:
+        """Insert all waiting documents and stop the thread."""
+        with self.condition:
+            self.is_closed = True
+            self.condition.notify_all()
+
+        self.thread.join()
+
+    def __take(self) -> list[dict]:
+        """Take the waiting documents and wake blocked producers.
+
+        Must be called while holding the condition.
+
+        Returns:
+            The documents to write.
+        """
+        batch = self.pending
+        self.pending = []
+        self.condition.notify_all()
+        return batch
+
+    def __write(self, batch: list[dict]) -> None:
+        """Insert a batch of documents.
+
+        Args:
+            batch: Documents to insert.
+        """
+        if not batch:
+            return
+
+        try:
+            self.collection.insert_many(batch, ordered=False)
+            self.written += len(batch)
+        except PyMongoError:
+            self.failed += len(batch)
+            logging.exception(
+                f"Could not write {len(batch)} documents to {self.collection.name}"
+            )
+
+    def __run(self) -> None:
+        """Write batches until closed."""
+        while True:
+            with self.condition:
+                deadline = time.monotonic() + self.flush_interval
+
+                while len(self.pending) < self.batch_size and not self.is_closed:
+                    timeout = deadline - time.monotonic()
+
+                    if timeout <= 0:
+                        break
+
+                    self.condition.wait(timeout)
+
+                batch = self.__take()
+                is_closed = self.is_closed
+
+            self.__write(batch)
+
+            if is_closed:
+                return
+
+
+class StateWriter:
+    """Write-behind buffer which persists changed values of the state document.
+
+    Values set within `window` seconds of each other are coalesced, so only
+    the last value of each key is written, with a single `$set` covering
+    every changed key. One write runs at a time, so writes happen in the
+    order the changes were made, and :meth:`flush` returns only after
+    every change made before it is written.
+    """
+
+    def __init__(self, collection, window: float = DATABASE_STATE_WINDOW) -> None:
+        """Initialize a StateWriter and start its thread.
+
+        Args:
+            collection: The pymongo collection holding the state document.
+            window: Seconds to collect changes before writing them.
+        """
+        self.collection = collection
+        self.window = window
+
+        self.pending: dict = {}
+        self.writes = 0
+        self.is_closed = False
+
+        self.condition = Condition()
+        # held from taking changes until they are written
+        self.write_lock = Lock()
+        self.thread = Thread(
+            target=self.__run, name=f"writer-{collection.name}", daemon=True
+        )
+        self.thread.start()
+
+    def update(self, changes: dict) -> None:
+        """Queue changed values.
+
+        Args:
+            changes: Keys of the state document mapped to their new value.
+        """
+        with self.condition:
+            if not self.pending:
+                self.condition.notify_all()
+
+            self.pending.update(changes)
+
+    def flush(self) -> None:
+        """Write all waiting changes right away.
+
+        Waits for a write which is already running.
+        """
+        with self.write_lock:
+            with self.condition:
+                changes = self.pending
+                self.pending = {}
+
+            self.__write(changes)
+
+    def close(self) -> None:
+        """Write all waiting changes and stop the thread."""
+        with self.condition:
+            self.is_closed = True
+            self.condition.notify_all()
+
+        self.thread.join()
+
+    def __write(self, changes: dict) -> None:
+        """Set changed keys in the state document.
+
+        Args:
+            changes: Keys mapped to their new value.
+        """
+        if not changes:
+            return
+
+        try:
+            self.collection.update_one({}, {"$set": changes}, upsert=True)
+            self.writes += 1
+            logging.debug(f"Updated state {changes=}")
+        except PyMongoError:
+            logging.exception(f"Could not write state {changes=}")
+
+    def __run(self) -> None:
+        """Write changes one window after the first of them until closed."""
+        while True:
+            with self.condition:
+                while not self.pending and not self.is_closed:
+                    self.condition.wait()
+
+                # let more changes to the same keys arrive
+                if not self.is_closed:
+                    self.condition.wait(self.window)
+
+                is_closed = self.is_closed
+
+            self.flush()
+
+            if is_closed:
+                return
+
+
+class RollupWriter:
+    """Merges pending rollup aggregates into the rollup collections.
+
+    Runs a background pass every `interval` seconds, writing every pending
+    bucket as an upsert with `$min`, `$max` and `$inc`. Buckets which could
+    not be written are merged back and written with the next pass.
+    """
+
+    def __init__(self, db, rollup: Rollup, interval: float = ROLLUP_INTERVAL) -> None:
+        """Initialize a RollupWriter and start its thread.
+
+        Args:
+            db: The pymongo database holding the rollup collections.
+            rollup: The Rollup measurements are added to.
+            interval: Seconds between passes.
+        """
+        self.db = db
+        self.rollup = rollup
+        self.interval = interval
+        self.is_closed = False
+
+        self.condition = Condition()
+        self.thread = Thread(target=self.__run, name="writer-rollup", daemon=True)
+        self.thread.start()
+
+    def flush(self) -> None:
+        """Write all pending aggregates right away."""
+        for resolution, buckets in self.rollup.take().items():
+            if not buckets:
+                continue
+
+            requests = [
+                UpdateOne(
+                    {
+                        "meta.node_id": bucket["node_id"],
+                        "meta.sensor_id": bucket["sensor_id"],
+                        "timestamp": dt.datetime.fromtimestamp(
+                            bucket["timestamp"], dt.timezone.utc
+                        ),
+                    },
+                    {
+                        "$min": {"min": bucket["min"]},
+                        "$max": {"max": bucket["max"]},
+                        "$inc": {"sum": bucket["sum"], "count": bucket["count"]},
+                    },
+                    upsert=True,
+                )
+                for bucket in buckets
+            ]
+
+            try:
+                self.db[RESOLUTIONS[resolution]].bulk_write(requests, ordered=False)
+            except BulkWriteError as e:
+                # the other upserts were applied, $inc them again would count twice
+                failed = [buckets[error["index"]] for error in e.details["writeErrors"]]
+                self.rollup.put_back(resolution, failed)
+                logging.exception(f"Could not write {len(failed)} rollups, retrying")
+            except PyMongoError:
+                self.rollup.put_back(resolution, buckets)
+                logging.exception(f"Could not write {len(requests)} rollups, retrying")
+
+    def close(self) -> None:
+        """Write all pending aggregates and stop the thread."""
+        with self.condition:
+            self.is_closed = True
+            self.condition.notify_all()
+
+        self.thread.join()
+
+    def __run(self) -> None:
+        """Write pending aggregates every interval until closed."""
+        while True:
+            with self.condition:
+                if not self.is_closed:
+                    self.condition.wait(self.interval)
+
+                is_closed = self.is_closed
+
+            self.flush()
+
+            if is_closed:
+                return
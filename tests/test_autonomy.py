@@ -0,0 +1,172 @@
+from unittest import TestCase
+
+from controller.autonomy import Autonomy
+from controller.hydroplant import Floor, HydroplantSystem
+from controller.job import EJobPriority, EJobState, Job, Step
+from controller.scheduler import Scheduler
+
+INFORMATION = "floor_1/plant_information_node/plant_information"
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestAutonomy(TestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+        self.system = HydroplantSystem(Floor("floor_1", "stage_1"))
+        self.information = self.system.add_logic_controller(INFORMATION)
+        self.published = []
+        self.autonomy = Autonomy(
+            self.system,
+            lambda topic, data: self.published.append(data),
+            lambda *args: None,
+            Scheduler(self.clock),
+        )
+
+        # queues 4 inspections which wait 10 seconds each
+        self.autonomy.inspected_demo_plants = False
+        self.autonomy.request_check()
+        self.run_pending()
+
+    def run_pending(self):
+        while self.autonomy.scheduler.get_timeout() == 0.0:
+            self.autonomy.scheduler.run_pending()
+
+    def receipt(self, to: int):
+        cid = [data["cid"] for data in self.published if data["to"] == to][-1]
+        self.information.set_data({"to": to})
+        self.autonomy.complete_step(cid)
+        self.run_pending()
+
+    def test_wait_does_not_block(self):
+        self.assertEqual([5], [data["to"] for data in self.published])
+
+        self.receipt(5)
+        job = self.autonomy.jobs[0]
+
+        # waiting, but the scheduler is free and wakes up when it is over
+        self.assertTrue(job.is_waiting(self.clock.now))
+        self.assertEqual(10.0, self.autonomy.scheduler.get_timeout())
+        self.assertEqual(1, len(self.published))
+
+        self.clock.now += 5
+        self.autonomy.request_check()
+        self.run_pending()
+        self.assertEqual(1, len(self.published))
+
+        self.clock.now += 5
+        self.run_pending()
+        self.assertEqual([5, 6], [data["to"] for data in self.published])
+
+    def test_all_steps(self):
+        for to in range(5, 9):
+            self.receipt(to)
+            self.clock.now += 10
+            self.run_pending()
+
+        self.assertEqual([5, 6, 7, 8], [data["to"] for data in self.published])
+        self.assertEqual([], self.autonomy.jobs)
+
+    def test_deadline(self):
+        job = self.autonomy.jobs[0]
+
+        self.clock.now += 240
+        self.run_pending()
+
+        self.assertEqual(EJobState.KILLED, job.state)
+        self.assertEqual([], self.autonomy.jobs)
+
+    def test_nodes_run_side_by_side(self):
+        led = self.system.add_actuator("floor_1/stage_1/climate_node/LED")
+
+        # the inspection waits for a receipt, which does not hold up the LED
+        self.autonomy.request_check()
+        self.run_pending()
+
+        self.assertEqual(2, len(self.autonomy.jobs))
+        self.assertEqual(2, len(self.published))
+        value = self.published[1]["value"]
+
+        led.set_data({"value": value})
+        self.autonomy.complete_step(self.published[1]["cid"])
+        self.run_pending()
+
+        self.assertEqual(1, len(self.autonomy.jobs))
+        self.assertEqual(EJobState.PENDING, self.autonomy.jobs[0].state)
+
+    def test_high_priority(self):
+        self.receipt(5)
+
+        # overtakes the inspection while it waits after its first step
+        step = Step(*self.information.get_command(to=1))
+        job = Job([step], EJobPriority.HIGH)
+        job.set_state(EJobState.QUEUED)
+        self.autonomy.add_jobs([job])
+        self.run_pending()
+
+        self.assertEqual([5, 1], [data["to"] for data in self.published])
+
+        self.receipt(1)
+        self.clock.now += 10
+        self.run_pending()
+
+        self.assertEqual([5, 1, 6], [data["to"] for data in self.published])
+
+    def test_skip_queued_steps(self):
+        # the inspection is no longer queued, so it can be queued again
+        for _ in range(2):
+            self.autonomy.inspected_demo_plants = False
+            self.autonomy.request_check()
+            self.run_pending()
+
+        # but not while the second one is still queued
+        self.assertEqual(2, len(self.autonomy.jobs))
+        self.assertEqual(EJobState.QUEUED, self.autonomy.jobs[1].state)
+        self.assertEqual(4, len(self.autonomy.queued_steps))
+
+        self.receipt(5)
+        self.autonomy.jobs[0].set_state(EJobState.KILLED)
+        self.autonomy.notify()
+        self.run_pending()
+
+        self.assertEqual(EJobState.PENDING, self.autonomy.jobs[0].state)
+        self.assertEqual({}, self.autonomy.queued_steps)
+
+    def test_receipt_needs_cid(self):
+        cid = self.published[0]["cid"]
+
+        # a receipt with the same value does not complete the step
+        self.information.set_data({"to": 5})
+        self.autonomy.notify()
+        self.autonomy.complete_step("unknown")
+        self.run_pending()
+        self.assertEqual(0, self.autonomy.jobs[0].at_step)
+
+        self.clock.now += 0.25
+        self.autonomy.complete_step(cid)
+        self.run_pending()
+        self.assertEqual(1, self.autonomy.jobs[0].at_step)
+        self.assertEqual({}, self.autonomy.pending)
+        self.assertEqual(250.0, self.autonomy.get_round_trip_stats()["max_ms"])
+
+        # the same receipt again
+        self.autonomy.complete_step(cid)
+        self.run_pending()
+        self.assertEqual(1, self.autonomy.jobs[0].at_step)
+
+    def test_killed_step(self):
+        cid = self.published[0]["cid"]
+        self.clock.now += 240
+        self.run_pending()
+
+        self.assertEqual({}, self.autonomy.pending)
+
+        self.autonomy.complete_step(cid)
+        self.run_pending()
+        self.assertEqual([], self.autonomy.jobs)
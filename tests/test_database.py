@@ -0,0 +1,389 @@
+from unittest import TestCase
+from threading import Event, Thread
+from unittest.mock import patch
+import datetime as dt
+
+from pymongo.errors import OperationFailure
+
+from controller.config import MEASUREMENT_RETENTION
+from controller.database import Database
+
+
+def get_value(document: dict, key: str):
+    for part in key.split("."):
+        document = document.get(part, {}) if isinstance(document, dict) else {}
+
+    return document
+
+
+def matches(document: dict, query: dict) -> bool:
+    for key, condition in query.items():
+        value = get_value(document, key)
+
+        if not isinstance(condition, dict):
+            if value != condition:
+                return False
+            continue
+
+        if "$gte" in condition and not value >= condition["$gte"]:
+            return False
+
+        if "$lt" in condition and not value < condition["$lt"]:
+            return False
+
+    return True
+
+
+class FakeCursor(list):
+    def sort(self, key, direction):
+        return FakeCursor(sorted(self, key=lambda d: get_value(d, key)))
+
+
+class FakeCollection:
+    def __init__(self, name):
+        self.name = name
+        self.documents = []
+        self.indexes = []
+        self.collection_options = {}
+        self.queries = []
+        self.reads = 0
+        self.exists = False
+
+        # set to hold writes until released
+        self.block: Event | None = None
+        self.is_writing = Event()
+
+    def insert_many(self, documents, ordered=True):
+        self.exists = True
+        self.documents += [dict(d) for d in documents]
+
+    def update_one(self, query, update, upsert=False):
+        self.is_writing.set()
+
+        if self.block is not None:
+            self.block.wait()
+
+        if not self.documents:
+            self.documents.append({"_id": 1})
+
+        self.documents[0].update(update["$set"])
+
+    def find_one(self, query):
+        self.reads += 1
+        return dict(self.documents[0]) if self.documents else None
+
+    def find(self, query, projection=None):
+        self.queries.append(query)
+        return FakeCursor(
+            {k: v for k, v in d.items() if k != "_id" or projection is None}
+            for d in self.documents
+            if matches(d, query)
+        )
+
+    def bulk_write(self, requests, ordered=True):
+        for request in requests:
+            query, update = request._filter, request._doc
+            found = [d for d in self.documents if matches(d, query)]
+
+            if found:
+                document = found[0]
+            else:
+                document = {"timestamp": query["timestamp"], "meta": {}}
+                document["meta"]["node_id"] = query["meta.node_id"]
+                document["meta"]["sensor_id"] = query["meta.sensor_id"]
+                self.documents.append(document)
+
+            for key, value in update["$min"].items():
+                document[key] = min(document.get(key, value), value)
+
+            for key, value in update["$max"].items():
+                document[key] = max(document.get(key, value), value)
+
+            for key, value in update["$inc"].items():
+                document[key] = document.get(key, 0) + value
+
+    def create_index(self, keys, **kwargs):
+        self.indexes.append((keys, kwargs))
+
+    def options(self):
+        return self.collection_options
+
+
+class FakeDatabase(dict):
+    def __missing__(self, name):
+        collection = self[name] = FakeCollection(name)
+        return collection
+
+    def list_collection_names(self):
+        # collections exist once created or written to
+        return [name for name, collection in self.items() if collection.exists]
+
+    def create_collection(self, name, **options):
+        self[name].collection_options = options
+        self[name].exists = True
+        return self[name]
+
+
+class FakeClient:
+    def __init__(self, host=None, port=None):
+        self.databases = FakeDatabase()
+        self.databases["hydroplant"] = FakeDatabase()
+
+    def __getitem__(self, name):
+        return self.databases[name]
+
+    def close(self):
+        pass
+
+
+def get_time(minutes: float) -> dt.datetime:
+    return dt.datetime(2024, 1, 1, tzinfo=dt.timezone.utc) + dt.timedelta(
+        minutes=minutes
+    )
+
+
+class DatabaseTestCase(TestCase):
+    def setUp(self):
+        with patch("controller.database.MongoClient", FakeClient):
+            self.database = Database()
+
+        self.db = self.database.db
+        self.addCleanup(self.database.close)
+
+
+class TestHistory(DatabaseTestCase):
+    def setUp(self):
+        super().setUp()
+
+        # ph every 30 seconds for 3 hours
+        for i in range(360):
+            self.database.add_measurement(
+                "water_node",
+                "ph",
+                {"value": float(i % 4), "time": get_time(i / 2).timestamp()},
+            )
+
+        self.database.flush()
+
+    def test_raw(self):
+        history = self.database.get_history("ph", get_time(0), get_time(5), step=10)
+
+        self.assertEqual(10, len(history))
+        self.assertEqual(
+            {
+                "node_id": "water_node",
+                "timestamp": get_time(0.5),
+                "min": 1.0,
+                "max": 1.0,
+                "mean": 1.0,
+                "count": 1,
+            },
+            history[1],
+        )
+
+    def test_minutes(self):
+        history = self.database.get_history("ph", get_time(0), get_time(120))
+
+        # 7200 / 500 points is 14.4 seconds per point, finer than a minute
+        self.assertEqual(240, len(history))
+
+        history = self.database.get_history("ph", get_time(0), get_time(60), step=60)
+
+        self.assertEqual(60, len(history))
+        self.assertEqual(
+            {
+                "node_id": "water_node",
+                "timestamp": get_time(1),
+                "min": 2.0,
+                "max": 3.0,
+                "mean": 2.5,
+                "count": 2,
+            },
+            history[1],
+        )
+
+    def test_hours(self):
+        # 30 days / 500 points is more than an hour per point
+        history = self.database.get_history(
+            "ph", get_time(0), get_time(30 * 24 * 60), node_id="water_node"
+        )
+
+        self.assertEqual(
+            [get_time(0), get_time(60), get_time(120)],
+            [p["timestamp"] for p in history],
+        )
+        self.assertEqual(
+            (0.0, 3.0, 1.5, 120),
+            tuple(history[0][k] for k in ("min", "max", "mean", "count")),
+        )
+        self.assertEqual(
+            {
+                "meta.sensor_id": "ph",
+                "meta.node_id": "water_node",
+                "timestamp": {"$gte": get_time(0), "$lt": get_time(30 * 24 * 60)},
+            },
+            self.db["measurements_1h"].queries[-1],
+        )
+
+
+class TestState(DatabaseTestCase):
+    def setUp(self):
+        super().setUp()
+        self.state = self.db["state"]
+        self.state.documents.append({"_id": 1, "a": 1})
+
+    def test_update_and_get(self):
+        self.assertEqual({"a": 1}, self.database.get_state())
+
+        self.database.update_state({"b": 2})
+
+        # from memory, written in the background
+        self.assertEqual({"a": 1, "b": 2}, self.database.get_state())
+        self.assertEqual(1, self.state.reads)
+
+        self.database.flush()
+        self.assertEqual({"_id": 1, "a": 1, "b": 2}, self.state.documents[0])
+
+    def test_invalidate(self):
+        self.database.get_state()
+        self.state.documents[0]["a"] = 2
+
+        self.assertEqual({"a": 1}, self.database.get_state())
+
+        self.database.invalidate_state()
+
+        self.assertEqual({"a": 2}, self.database.get_state())
+        self.assertEqual(2, self.state.reads)
+
+    def test_reload(self):
+        self.database.get_state()
+        self.database.update_state({"b": 2})
+        # written by something else
+        self.state.documents[0]["c"] = 3
+
+        self.database.reload_state()
+
+        self.assertEqual({"a": 1, "b": 2, "c": 3}, self.database.get_state())
+
+    def test_reload_during_write(self):
+        self.database.get_state()
+        self.state.block = Event()
+        self.addCleanup(self.state.block.set)
+        self.database.update_state({"b": 2})
+
+        # the writer thread took the change and is writing it
+        self.assertTrue(self.state.is_writing.wait(5))
+
+        reload = Thread(target=self.database.reload_state)
+        reload.start()
+        reload.join(0.1)
+        self.assertTrue(reload.is_alive())
+
+        self.state.block.set()
+        reload.join()
+
+        self.assertEqual({"a": 1, "b": 2}, self.database.get_state())
+
+
+class TestMeasurements(DatabaseTestCase):
+    def test_time_series(self):
+        self.database.setup_collections()
+        measurements = self.db["measurements"]
+
+        self.assertEqual(
+            {
+                "timeseries": {
+                    "timeField": "timestamp",
+                    "metaField": "meta",
+                    "granularity": "seconds",
+                },
+                "expireAfterSeconds": MEASUREMENT_RETENTION,
+            },
+            measurements.options(),
+        )
+        # expiry is an option of the collection, not an index
+        self.assertEqual(
+            [
+                ([("meta.sensor_id", 1), ("meta.floor", 1), ("timestamp", 1)], {}),
+                ([("meta.node_id", 1), ("meta.sensor_id", 1), ("timestamp", 1)], {}),
+            ],
+            measurements.indexes,
+        )
+
+        for name in ("measurements_1m", "measurements_1h"):
+            self.assertEqual(
+                [
+                    (
+                        [("meta.sensor_id", 1), ("meta.node_id", 1), ("timestamp", 1)],
+                        {"unique": True},
+                    )
+                ],
+                self.db[name].indexes,
+            )
+
+    def test_without_time_series(self):
+        def create_collection(name, **options):
+            raise OperationFailure("unknown option timeseries")
+
+        self.db.create_collection = create_collection
+        self.database.setup_collections()
+
+        self.assertIn(
+            ([("timestamp", 1)], {"expireAfterSeconds": MEASUREMENT_RETENTION}),
+            self.db["measurements"].indexes,
+        )
+        self.assertEqual(3, len(self.db["measurements"].indexes))
+
+    def test_document(self):
+        self.database.add_measurement(
+            "water_node",
+            "ph",
+            {"value": 6.5, "floor": "floor_2", "time": get_time(1).timestamp()},
+        )
+        self.database.flush()
+
+        self.assertEqual(
+            [
+                {
+                    "timestamp": get_time(1),
+                    "meta": {
+                        "node_id": "water_node",
+                        "sensor_id": "ph",
+                        "floor": "floor_2",
+                    },
+                    "value": 6.5,
+                }
+            ],
+            self.db["measurements"].documents,
+        )
+
+    def test_query(self):
+        for floor in ("floor_1", "floor_2"):
+            self.database.add_measurement(
+                "water_node",
+                "ph",
+                {"value": 6.5, "floor": floor, "time": get_time(1).timestamp()},
+            )
+
+        self.database.flush()
+        measurements = self.database.get_measurements(
+            "ph", get_time(0), get_time(2), node_id="water_node", floor="floor_2"
+        )
+
+        self.assertEqual(["floor_2"], [m["meta"]["floor"] for m in measurements])
+        self.assertEqual(
+            {
+                "meta.sensor_id": "ph",
+                "timestamp": {"$gte": get_time(0), "$lt": get_time(2)},
+                "meta.node_id": "water_node",
+                "meta.floor": "floor_2",
+            },
+            self.db["measurements"].queries[-1],
+        )
+
+        # without an end, up to now
+        self.database.get_measurements("ph", get_time(0))
+        query = self.db["measurements"].queries[-1]
+
+        self.assertEqual({"meta.sensor_id", "timestamp"}, set(query))
+        self.assertGreater(query["timestamp"]["$lt"], get_time(2))
@@ -0,0 +1,231 @@
+from threading import Barrier, Thread
+from unittest import TestCase
+
+from controller.hydroplant import (
+    Actuator,
+    EntityType,
+    Floor,
+    HydroplantSystem,
+    LogicController,
+)
+from controller.utils import parse_topic
+
+LED = "floor_1/stage_1/climate_node/LED"
+MOVER = "floor_1/plant_mover_node/plant_mover"
+
+
+def get_system() -> HydroplantSystem:
+    return HydroplantSystem(
+        Floor("floor_1", "stage_1", "stage_2", "stage_3"),
+        Floor("floor_2", "stage_1", "stage_2", "stage_3"),
+    )
+
+
+class TestEntity(TestCase):
+    def test_compact(self):
+        led = Actuator(LED)
+        other = Actuator("floor_1/stage_2/climate_node/LED")
+
+        self.assertFalse(hasattr(led, "__dict__"))
+        self.assertIs(led.node_id, other.node_id)
+        self.assertIs(EntityType.LED, led.type)
+        self.assertEqual("hydroplant/command/" + LED, led.command)
+        self.assertEqual(led.command, led.get_topic().format("command"))
+        self.assertEqual({}, led.get_data())
+
+    def test_parts(self):
+        led = Actuator(LED)
+        mover = LogicController(MOVER)
+
+        self.assertEqual(
+            ("LED", "floor_1", "stage_1", "climate_node"),
+            (led.id, led.floor, led.stage, led.node_id),
+        )
+        self.assertEqual(
+            ("plant_mover", "floor_1", "", "plant_mover_node"),
+            (mover.id, mover.floor, mover.stage, mover.node_id),
+        )
+
+    def test_no_topic_cache(self):
+        # unique ids are parsed once, they would push out hot topics
+        misses = parse_topic.cache_info().misses
+        Actuator("floor_9/stage_9/cache_node/LED")
+
+        self.assertEqual(misses, parse_topic.cache_info().misses)
+
+
+class TestHydroplantSystem(TestCase):
+    def setUp(self):
+        self.system = get_system()
+        self.led = self.system.add_actuator(LED)
+        self.mover = self.system.add_logic_controller(MOVER)
+
+    def test_lookup(self):
+        self.assertIs(self.led, self.system.get_object_from_unique_id(LED))
+        self.assertIs(self.mover, self.system.get_object_from_unique_id(MOVER))
+        self.assertIs(self.led, self.system.get_object(self.led.receipt))
+        self.assertIs(self.led, self.system.get_object(self.led.gui_topic))
+        self.assertIs(self.mover, self.system.get_object(self.mover.command))
+        self.assertIs(self.led, self.system.get_object(LED))
+        self.assertIsNone(self.system.get_object_from_unique_id("floor_2/x/y"))
+
+    def test_lookup_without_parsing(self):
+        info = parse_topic.cache_info()
+
+        self.system.get_object_from_unique_id(LED)
+        self.system.get_object(self.led.receipt)
+        self.system.get_object(self.mover.gui_topic)
+
+        self.assertEqual(info, parse_topic.cache_info())
+
+    def test_delete(self):
+        topics = self.system.delete_objects("climate_node", "floor_1")
+
+        self.assertEqual([self.led.gui_topic, self.led.receipt], topics)
+        self.assertIsNone(self.system.get_object_from_unique_id(LED))
+        self.assertIsNone(self.system.get_object(self.led.receipt))
+        self.assertEqual((), self.system.get_actuators())
+        self.assertIs(self.mover, self.system.get_object_from_unique_id(MOVER))
+
+    def test_delete_only_on_floor(self):
+        other = self.system.add_actuator("floor_2/stage_1/climate_node/LED")
+
+        self.system.delete_objects("climate_node", "floor_1")
+        self.assertIs(other, self.system.get_object_from_unique_id(other.unique_id))
+
+        self.system.delete_objects("climate_node", None)
+        self.assertEqual({MOVER: self.mover}, self.system.get_topology().entities)
+
+    def test_views(self):
+        actuators = self.system.get_actuators()
+
+        # same object until something changes
+        self.assertIs(actuators, self.system.get_actuators())
+        self.assertEqual((self.led,), actuators)
+        self.assertEqual((self.mover,), self.system.get_logic_controllers())
+        # nodes are not kept in the order they presented themselves
+        self.assertEqual(
+            {self.led.gui_topic, self.mover.gui_topic},
+            set(self.system.get_gui_topics()),
+        )
+
+        self.led.set_data({"value": 1})
+
+        self.assertEqual({LED: 1}, self.system.get_state())
+        self.assertEqual(
+            {self.led.gui_topic: 1, self.mover.gui_topic: None},
+            self.system.get_gui_sync_data(),
+        )
+
+        with self.assertRaises(TypeError):
+            self.system.get_state()[LED] = 0
+
+        pump = self.system.add_actuator("floor_1/stage_2/climate_node/water_pump")
+
+        self.assertEqual((self.led, pump), self.system.get_actuators())
+        self.assertIn(pump.unique_id, self.system.get_state())
+
+    def test_snapshot(self):
+        topology = self.system.get_topology()
+
+        with self.system.batch():
+            pump = self.system.add_actuator("floor_1/stage_2/climate_node/water_pump")
+            self.system.delete_objects("plant_mover_node", None)
+
+            # nothing is published until the batch is done
+            self.assertIs(topology, self.system.get_topology())
+
+        # an old snapshot never changes
+        self.assertEqual((self.led,), topology.actuators)
+        self.assertIn(MOVER, topology.entities)
+
+        topology = self.system.get_topology()
+        self.assertEqual((self.led, pump), topology.actuators)
+        self.assertEqual((), topology.logic_controllers)
+        self.assertEqual((self.led, pump), topology.nodes["climate_node"])
+
+    def test_shared_nodes(self):
+        old = self.system.get_topology().floors["floor_1"]
+        pump = self.system.add_actuator("floor_1/stage_2/climate_node/water_pump")
+        new = self.system.get_topology().floors["floor_1"]
+
+        # only the changed node gets a new snapshot
+        self.assertIs(old.nodes["plant_mover_node"], new.nodes["plant_mover_node"])
+        self.assertEqual((self.led,), old.nodes["climate_node"].actuators)
+        self.assertEqual((self.led, pump), new.nodes["climate_node"].actuators)
+        self.assertEqual(2, len(new.nodes))
+
+        self.system.delete_objects("climate_node", "floor_1")
+
+        self.assertEqual(
+            ["plant_mover_node"],
+            list(self.system.get_topology().floors["floor_1"].nodes),
+        )
+        self.assertIsNone(self.system.get_object(pump.receipt))
+
+    def test_concurrent_readers(self):
+        errors = []
+        done = []
+        iterations = [0] * 4
+        # readers and writers start together
+        start = Barrier(len(iterations) + 2)
+
+        def present(floor: str) -> None:
+            start.wait()
+
+            for i in range(500):
+                with self.system.batch():
+                    self.system.delete_objects(f"node_{i % 10}", floor)
+                    self.system.add_actuator(f"{floor}/stage_1/node_{i % 10}/LED")
+                    self.system.add_actuator(
+                        f"{floor}/stage_2/node_{i % 10}/water_pump"
+                    )
+
+        def read(index: int) -> None:
+            start.wait()
+
+            while True:
+                topology = self.system.get_topology()
+
+                try:
+                    # every snapshot is consistent with itself
+                    for actuator in topology.actuators:
+                        assert topology.entities[actuator.unique_id] is actuator
+                        assert topology.topics[actuator.receipt] is actuator
+                        assert actuator.unique_id in topology.state
+                        # re-presented nodes are never missing
+                        assert self.system.get_object(actuator.receipt) is not None
+
+                    assert len(topology.gui_topics) == len(topology.entities)
+                    assert len(dict(topology.state)) == len(topology.actuators)
+                except Exception as e:
+                    # e.g. a dict changed size while iterating
+                    errors.append(e)
+                    return
+
+                iterations[index] += 1
+
+                if done:
+                    return
+
+        writers = [Thread(target=present, args=(f"floor_{i}",)) for i in (1, 2)]
+        readers = [Thread(target=read, args=(i,)) for i in range(len(iterations))]
+
+        for thread in readers + writers:
+            thread.start()
+
+        for thread in writers:
+            thread.join()
+
+        done.append(True)
+
+        for thread in readers:
+            thread.join()
+
+        self.assertEqual([], errors)
+
+        for count in iterations:
+            self.assertGreater(count, 0)
+
+        # 10 nodes with 2 actuators on 2 floors, plus the original LED
+        self.assertEqual(41, len(self.system.get_actuators()))
@@ -0,0 +1,64 @@
+from threading import Event
+from unittest import TestCase
+
+from controller.ingest import IngestPool, get_ingest_key
+from controller.topics import DEVICE_TOPIC, DEVICES_DISCONNECT_TOPIC, IS_READY_TOPIC
+
+
+class TestIngestPool(TestCase):
+    def test_order_per_key(self):
+        handled = {}
+
+        def handler(topic, payload):
+            handled.setdefault(topic, []).append(payload)
+
+        pool = IngestPool(handler, workers=4, queue_size=10000)
+        pool.start()
+
+        for i in range(1000):
+            for key in ("floor_1/stage_1/node/LED", "floor_2/node/plant_mover"):
+                pool.submit(key, key, i)
+
+        pool.stop()
+
+        for payloads in handled.values():
+            self.assertEqual(list(range(1000)), payloads)
+
+        self.assertEqual(2000, pool.get_stats()["processed"])
+
+    def test_drops_when_full(self):
+        release = Event()
+
+        pool = IngestPool(lambda topic, payload: release.wait(), 1, queue_size=2)
+        pool.start()
+
+        results = [pool.submit("key", "topic", i) for i in range(10)]
+        release.set()
+        pool.stop()
+
+        stats = pool.get_stats()
+
+        # one is being handled, two are waiting in the queue
+        self.assertGreater(stats["dropped"], 0)
+        self.assertEqual(results.count(False), stats["dropped"])
+        self.assertEqual(0, stats["depth"])
+        self.assertEqual(10 - stats["dropped"], stats["processed"])
+
+
+class TestIngestKey(TestCase):
+    def test_node(self):
+        node = "floor_1/stage_1/climate_node"
+        receipt = get_ingest_key(f"hydroplant/command/{node}/LED/receipt", b"{}")
+        present = get_ingest_key(DEVICE_TOPIC, b'{"device_id": "climate_node"}')
+        disconnect = get_ingest_key(
+            DEVICES_DISCONNECT_TOPIC, b'{"device_id": "climate_node"}'
+        )
+
+        self.assertEqual("climate_node", receipt)
+        self.assertEqual(receipt, present)
+        self.assertEqual(receipt, disconnect)
+
+    def test_other(self):
+        self.assertEqual("", get_ingest_key(IS_READY_TOPIC, b""))
+        self.assertEqual("", get_ingest_key(DEVICE_TOPIC, b"not json"))
+        self.assertEqual("", get_ingest_key(DEVICE_TOPIC, b"[]"))
@@ -0,0 +1,132 @@
+from unittest import TestCase
+
+from controller.job import EJobPriority, Job, Step
+from controller.lanes import Lanes, get_lane_keys
+
+LED = "hydroplant/command/floor_1/stage_1/climate_node/LED"
+PUMP = "hydroplant/command/floor_1/stage_1/climate_node/water_pump"
+MOVER = "hydroplant/command/floor_1/plant_mover_node/plant_mover"
+OTHER_LED = "hydroplant/command/floor_2/stage_1/climate_node/LED"
+
+
+def create_job(*topics: str, priority=EJobPriority.DEFAULT) -> Job:
+    return Job([Step(topic, {"value": 1}) for topic in topics], priority)
+
+
+class TestLanes(TestCase):
+    def setUp(self):
+        self.now = 0.0
+        self.lanes = Lanes(lambda: self.now, aging=60.0)
+
+    def test_get_lane_keys(self):
+        self.assertEqual(
+            ("floor_1/climate_node",), get_lane_keys(create_job(LED, PUMP))
+        )
+        self.assertEqual(
+            ("floor_1/plant_mover_node", "floor_1/climate_node"),
+            get_lane_keys(create_job(MOVER, LED, MOVER)),
+        )
+
+    def test_different_nodes(self):
+        jobs = [create_job(LED), create_job(MOVER), create_job(OTHER_LED)]
+
+        for job in jobs:
+            self.lanes.add(job)
+
+        self.assertEqual(jobs, self.lanes.get_runnable())
+
+    def test_same_node(self):
+        led, pump = create_job(LED), create_job(PUMP)
+        self.lanes.add(led)
+        self.lanes.add(pump)
+
+        self.assertEqual([led], self.lanes.get_runnable())
+
+        self.lanes.remove(led)
+
+        self.assertEqual([pump], self.lanes.get_runnable())
+        self.assertNotIn(led, self.lanes)
+
+    def test_several_nodes(self):
+        led, both, mover = create_job(LED), create_job(MOVER, LED), create_job(MOVER)
+
+        for job in (led, both, mover):
+            self.lanes.add(job)
+
+        # both waits for the LED, and the mover waits for both
+        self.assertEqual([led], self.lanes.get_runnable())
+
+        self.lanes.remove(led)
+        self.assertEqual([both], self.lanes.get_runnable())
+
+        self.lanes.remove(both)
+        self.assertEqual([mover], self.lanes.get_runnable())
+        self.assertEqual([mover], self.lanes.get_jobs())
+
+    def test_priority(self):
+        lights = [create_job(LED) for _ in range(3)]
+
+        for job in lights:
+            self.lanes.add(job)
+
+        self.now = 100.0
+        valve = create_job(PUMP, priority=EJobPriority.HIGH)
+        self.lanes.add(valve)
+
+        # two levels above, so it overtakes jobs added up to 120 seconds before
+        self.assertEqual([valve], self.lanes.get_runnable())
+
+        self.lanes.remove(valve)
+        self.assertEqual([lights[0]], self.lanes.get_runnable())
+
+    def test_aging(self):
+        light = create_job(LED)
+        self.lanes.add(light)
+
+        self.now = 121.0
+        self.lanes.add(create_job(PUMP, priority=EJobPriority.HIGH))
+
+        self.assertEqual([light], self.lanes.get_runnable())
+
+    def test_overtake_between_steps(self):
+        light = create_job(LED, LED)
+        self.lanes.add(light)
+        self.assertEqual([light], self.lanes.get_runnable())
+
+        # waiting for a receipt, so it keeps its place
+        light.steps[0].sent()
+        valve = create_job(PUMP, priority=EJobPriority.HIGH)
+        self.lanes.add(valve)
+        self.assertEqual([light], self.lanes.get_runnable())
+
+        # first step is done
+        light.at_step += 1
+        self.assertEqual([valve], self.lanes.get_runnable())
+
+    def test_add_again(self):
+        led, pump = create_job(LED), create_job(PUMP)
+        self.lanes.add(led)
+        self.lanes.add(pump)
+        self.lanes.remove(led)
+        self.lanes.add(led)
+
+        self.assertEqual([pump], self.lanes.get_runnable())
+        self.assertEqual(2, self.lanes.get_stats()["floor_1/climate_node"]["depth"])
+
+    def test_stats(self):
+        for _ in range(3):
+            self.lanes.add(create_job(LED))
+
+        self.lanes.add(create_job(MOVER))
+        self.now = 120.0
+
+        for job in self.lanes.get_runnable():
+            self.lanes.remove(job)
+
+        stats = self.lanes.get_stats()
+
+        self.assertEqual(
+            {"depth": 2, "completed": 1, "per_minute": 0.5},
+            stats["floor_1/climate_node"],
+        )
+        self.assertEqual(0, stats["floor_1/plant_mover_node"]["depth"])
@@ -0,0 +1,40 @@
+from unittest import TestCase
+
+from controller.rollup import Rollup, get_bucket, pick_resolution
+
+
+class TestRollup(TestCase):
+    def test_aggregates(self):
+        rollup = Rollup()
+
+        for i, value in enumerate([6.0, 7.0, 5.0]):
+            rollup.add("water_node", "ph", 3600 + i * 30, value)
+
+        rollup.add("water_node", "ph", 3600, "not a number")
+        buckets = rollup.take()
+
+        self.assertEqual(
+            [
+                {
+                    "node_id": "water_node",
+                    "sensor_id": "ph",
+                    "timestamp": 3600.0,
+                    "min": 5.0,
+                    "max": 7.0,
+                    "sum": 18.0,
+                    "count": 3,
+                }
+            ],
+            buckets[3600],
+        )
+        # 3600, 3630 in one minute and 3660 in the next
+        self.assertEqual([2, 1], [b["count"] for b in buckets[60]])
+        self.assertEqual({3600: [], 60: []}, rollup.take())
+
+    def test_bucket(self):
+        self.assertEqual(120.0, get_bucket(179.9, 60))
+
+    def test_pick_resolution(self):
+        self.assertEqual(3600, pick_resolution(7 * 24 * 3600 / 100))
+        self.assertEqual(60, pick_resolution(600))
+        self.assertEqual(0, pick_resolution(10))
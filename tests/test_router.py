@@ -0,0 +1,115 @@
+from unittest import TestCase
+
+from controller.router import TopicRouter, route
+from controller.topics import (
+    ACTUATOR_RECEIPT_TOPIC,
+    AUTONOMY_TOPIC,
+    DEVICE_TOPIC,
+    DEVICES_DISCONNECT_TOPIC,
+    GUI_COMMAND,
+    LOGIC_CONTROLLER_RECEIPT_TOPIC,
+)
+
+
+class Handlers:
+    def __init__(self):
+        self.calls = []
+
+    @route(DEVICE_TOPIC)
+    def device(self, topic, data):
+        self.calls.append("device")
+
+    @route(DEVICES_DISCONNECT_TOPIC)
+    def disconnect(self, topic, data):
+        self.calls.append("disconnect")
+
+    @route(AUTONOMY_TOPIC)
+    def autonomy(self, topic, data):
+        self.calls.append("autonomy")
+
+    @route(GUI_COMMAND + "#")
+    def gui_command(self, topic, data):
+        self.calls.append("gui_command")
+
+    @route(LOGIC_CONTROLLER_RECEIPT_TOPIC, ACTUATOR_RECEIPT_TOPIC)
+    def receipt(self, topic, data):
+        self.calls.append("receipt")
+
+
+class TestTopicRouter(TestCase):
+    def setUp(self):
+        self.handlers = Handlers()
+        self.router = TopicRouter()
+        self.router.register(self.handlers)
+
+    def dispatch(self, topic):
+        self.handlers.calls.clear()
+        self.router.dispatch(topic, {})
+        return self.handlers.calls
+
+    def test_one_handler_per_topic(self):
+        # "disconnected/devices" contains "device", but must not hit both
+        self.assertEqual(
+            ["disconnect"], self.dispatch("hydroplant/disconnected/devices")
+        )
+        self.assertEqual(["device"], self.dispatch("hydroplant/device"))
+
+    def test_exact_beats_wildcard(self):
+        self.assertEqual(["autonomy"], self.dispatch("hydroplant/gui_command/autonomy"))
+        self.assertEqual(
+            ["gui_command"],
+            self.dispatch("hydroplant/gui_command/floor_1/stage_1/climate_node/LED"),
+        )
+
+    def test_receipts(self):
+        self.assertEqual(
+            ["receipt"],
+            self.dispatch(
+                "hydroplant/command/floor_1/stage_1/climate_node/LED/receipt"
+            ),
+        )
+        self.assertEqual(
+            ["receipt"],
+            self.dispatch("hydroplant/command/floor_1/mover_node/plant_mover/receipt"),
+        )
+        # commands we publish ourselves are not receipts
+        self.assertEqual(
+            [], self.dispatch("hydroplant/command/floor_1/mover_node/plant_mover")
+        )
+
+    def test_multi_level_wildcard_matches_parent(self):
+        router = TopicRouter()
+        router.add("a/#", lambda topic, data: None)
+
+        self.assertIsNotNone(router.match("a"))
+        self.assertIsNotNone(router.match("a/b/c"))
+        self.assertIsNone(router.match("b"))
+
+    def test_invalid_patterns(self):
+        with self.assertRaises(ValueError):
+            self.router.add(DEVICE_TOPIC, lambda topic, data: None)
+
+        with self.assertRaises(ValueError):
+            self.router.add("a/#/b", lambda topic, data: None)
+
+    def test_cache_keeps_recent_topics(self):
+        router = TopicRouter(cache_size=2)
+        router.add("a/+", lambda topic, data: None)
+
+        router.match("a/1")
+        router.match("a/2")
+        router.match("a/1")
+        router.match("a/3")
+
+        # a/2 was used least recently
+        self.assertEqual(["a/1", "a/3"], list(router.cache))
+
+    def test_cache_skips_unmatched_topics(self):
+        router = TopicRouter(cache_size=2)
+        router.add("a/+", lambda topic, data: None)
+        router.match("a/1")
+
+        for i in range(10):
+            self.assertIsNone(router.match(f"b/{i}"))
+
+        self.assertEqual(["a/1"], list(router.cache))
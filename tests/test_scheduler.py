@@ -0,0 +1,68 @@
+from threading import Event, Thread
+from unittest import TestCase
+import time
+
+from controller.scheduler import Scheduler
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestScheduler(TestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+        self.scheduler = Scheduler(self.clock)
+        self.calls = []
+
+    def test_timers_in_order(self):
+        self.scheduler.call_later(2, lambda: self.calls.append("b"))
+        self.scheduler.call_later(1, lambda: self.calls.append("a"))
+        self.scheduler.call_later(1, lambda: self.calls.append("a2"))
+
+        self.assertEqual(0, self.scheduler.run_pending())
+        self.assertEqual(1.0, self.scheduler.get_timeout())
+
+        self.clock.now += 1
+        self.scheduler.run_pending()
+        self.assertEqual(["a", "a2"], self.calls)
+
+        self.clock.now += 5
+        self.scheduler.run_pending()
+        self.assertEqual(["a", "a2", "b"], self.calls)
+        self.assertIsNone(self.scheduler.get_timeout())
+
+    def test_cancel_and_post(self):
+        timer = self.scheduler.call_later(1, lambda: self.calls.append("timer"))
+        self.scheduler.cancel(timer)
+        self.scheduler.call_soon(lambda: self.calls.append("event"))
+
+        self.assertEqual(0.0, self.scheduler.get_timeout())
+
+        self.clock.now += 1
+        self.scheduler.run_pending()
+
+        self.assertEqual(["event"], self.calls)
+        self.assertEqual(1, self.scheduler.get_stats()["actions"])
+
+    def test_wakes_on_post(self):
+        scheduler = Scheduler()
+        done = Event()
+        thread = Thread(target=scheduler.run)
+        thread.start()
+
+        # nothing is due, the thread sleeps until something is posted
+        time.sleep(0.05)
+        scheduler.call_soon(done.set)
+
+        self.assertTrue(done.wait(1))
+        scheduler.stop()
+        thread.join()
+
+        stats = scheduler.get_stats()
+        self.assertEqual(1, stats["wakeups"])
+        self.assertLess(stats["max_latency_ms"], 100)
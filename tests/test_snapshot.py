@@ -0,0 +1,124 @@
+from unittest import TestCase
+import os
+import pickle
+import tempfile
+
+from controller.autonomy import Autonomy
+from controller.hydroplant import Floor, HydroplantSystem
+from controller.job import EJobState, Job, Step
+from controller.scheduler import Scheduler
+from controller.snapshot import (
+    MAGIC,
+    read_snapshot,
+    restore_entities,
+    restore_jobs,
+    take_snapshot,
+    write_snapshot,
+)
+
+LED = "floor_1/stage_1/climate_node/LED"
+MOVER = "floor_1/plant_mover_node/plant_mover"
+
+
+def get_system() -> HydroplantSystem:
+    return HydroplantSystem(Floor("floor_1", "stage_1", "stage_2"))
+
+
+class TestSnapshot(TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, "snapshot.bin")
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_round_trip(self):
+        system = get_system()
+        led = system.add_actuator(LED)
+        system.add_logic_controller(MOVER)
+        led.set_data({"value": 1})
+
+        job = Job([Step(*led.get_command(value=0)), Step(*led.get_command(value=1))])
+        job.set_state(EJobState.PENDING)
+        job.steps[0].sent()
+
+        write_snapshot(self.path, take_snapshot(system, [job]))
+        snapshot = read_snapshot(self.path)
+
+        restored = get_system()
+        entities = restore_entities(restored, snapshot)
+
+        self.assertEqual({LED, MOVER}, {entity.unique_id for entity in entities})
+        self.assertEqual(1, restored.get_object_from_unique_id(LED).get_value())
+        self.assertEqual({LED: 1}, restored.get_state())
+
+        (restored_job,) = restore_jobs(snapshot)
+
+        self.assertEqual(EJobState.PENDING, restored_job.state)
+        self.assertEqual(str(job.steps[1]), str(restored_job.steps[1]))
+        # sent again, the receipt might have been lost
+        self.assertFalse(restored_job.steps[0].has_sent)
+
+    def test_restart_longer_than_deadline(self):
+        system = get_system()
+        led = system.add_actuator(LED)
+
+        job = Job(
+            [
+                Step(*led.get_command(value=1), deadline=60.0),
+                Step(*led.get_command(value=0)),
+            ]
+        )
+        job.set_state(EJobState.PENDING)
+        job.steps[0].sent()
+
+        snapshot = take_snapshot(system, [job])
+        now = snapshot["time"] + 70.0
+
+        (restored_job,) = restore_jobs(snapshot, now)
+
+        self.assertFalse(restored_job.steps[0].has_passed_deadline(now))
+        self.assertFalse(restored_job.steps[1].has_passed_deadline(now))
+
+        # autonomy sends the step again instead of killing the job
+        published = []
+        autonomy = Autonomy(
+            system,
+            lambda topic, data: published.append(data),
+            lambda *args: None,
+            Scheduler(lambda: now),
+        )
+        autonomy.add_jobs([restored_job])
+
+        while autonomy.scheduler.get_timeout() == 0.0:
+            autonomy.scheduler.run_pending()
+
+        self.assertEqual([restored_job], autonomy.jobs)
+        self.assertEqual(EJobState.PENDING, restored_job.state)
+        self.assertEqual([1], [data["value"] for data in published])
+
+    def test_missing_and_invalid(self):
+        self.assertIsNone(read_snapshot(self.path))
+
+        with open(self.path, "wb") as f:
+            f.write(b"not a snapshot")
+
+        with self.assertRaises(ValueError):
+            read_snapshot(self.path)
+
+        # snapshots can only contain plain data
+        with open(self.path, "wb") as f:
+            f.write(MAGIC + pickle.dumps(Step("topic", {})))
+
+        with self.assertRaises(ValueError):
+            read_snapshot(self.path)
+
+    def test_skip_removed_floors(self):
+        system = get_system()
+        system.add_actuator(LED)
+        write_snapshot(self.path, take_snapshot(system, []))
+
+        restored = HydroplantSystem(Floor("floor_2", "stage_1"))
+
+        self.assertEqual([], restore_entities(restored, read_snapshot(self.path)))
+        self.assertEqual((), restored.get_actuators())
@@ -0,0 +1,29 @@
+from unittest import TestCase
+
+from controller.subscriptions import Subscriptions
+from controller.utils import get_node_wildcard_topic
+
+
+class TestSubscriptions(TestCase):
+    def test_shared_topic_is_kept(self):
+        subscriptions = Subscriptions()
+
+        self.assertEqual(["a", "b"], subscriptions.acquire(["a", "b", "a"]))
+        self.assertEqual(["b"], subscriptions.release(["a", "b"]))
+        self.assertEqual(["a"], subscriptions.get_topics())
+        self.assertEqual(["a"], subscriptions.release(["a", "a"]))
+        self.assertEqual([], subscriptions.get_topics())
+
+    def test_node_wildcard_topic(self):
+        self.assertEqual(
+            "hydroplant/command/floor_1/+/climate_node/+/receipt",
+            get_node_wildcard_topic(
+                "hydroplant/command/floor_1/stage_2/climate_node/LED/receipt"
+            ),
+        )
+        self.assertEqual(
+            "hydroplant/gui_command/floor_1/plant_mover_node/+",
+            get_node_wildcard_topic(
+                "hydroplant/gui_command/floor_1/plant_mover_node/plant_mover"
+            ),
+        )
@@ -0,0 +1,115 @@
+from unittest import TestCase
+
+from controller.sync import GuiSync
+from controller.topics import (
+    GUI_TOPICS,
+    SYNC_DELTA_TOPIC,
+    SYNC_SNAPSHOT_TOPIC,
+    SYNC_TOPIC,
+)
+
+LED = "hydroplant/gui_command/floor_1/stage_1/climate_node/LED"
+PUMP = "hydroplant/gui_command/floor_1/stage_1/climate_node/water_pump"
+
+
+class TestGuiSync(TestCase):
+    def setUp(self):
+        self.published = []
+        self.topics = [LED, PUMP]
+        self.sync = GuiSync(self.publish, lambda: self.topics, window=0, legacy=False)
+
+    def publish(self, topic, data):
+        self.published.append((topic, data))
+
+    def test_only_changes_are_published(self):
+        self.sync.update({LED: None, PUMP: None})
+        self.sync.update({LED: 1})
+        self.sync.update({LED: 1})
+
+        self.assertEqual(2, len(self.published))
+        self.assertEqual(
+            (SYNC_DELTA_TOPIC, {"seq": 2, "changed": {LED: 1}, "removed": []}),
+            self.published[-1],
+        )
+
+    def test_removed_and_snapshot(self):
+        self.sync.update({LED: 1, PUMP: 0})
+        self.sync.update(removed=[PUMP, "unknown"])
+        self.sync.publish_snapshot()
+
+        self.assertEqual(
+            {"seq": 2, "changed": {}, "removed": [PUMP]}, self.published[1][1]
+        )
+        self.assertEqual(
+            (SYNC_SNAPSHOT_TOPIC, {"seq": 2, "data": {LED: 1}}), self.published[2]
+        )
+
+    def test_present_again(self):
+        self.sync.update({LED: 1})
+        # node presents itself again, value is unknown until the next receipt
+        self.sync.update({LED: None}, [LED])
+
+        self.assertEqual(
+            {"seq": 2, "changed": {LED: None}, "removed": []}, self.published[1][1]
+        )
+
+    def test_coalesce_within_window(self):
+        sync = GuiSync(
+            self.publish, lambda: self.topics, window=60, max_latency=60, legacy=False
+        )
+
+        for value in range(10):
+            sync.update_topics()
+            sync.update({LED: value, PUMP: 0})
+
+        sync.update(removed=[PUMP])
+        self.assertEqual([], self.published)
+
+        sync.flush()
+
+        self.assertEqual(
+            [
+                (GUI_TOPICS, {"topics": self.topics}),
+                (SYNC_DELTA_TOPIC, {"seq": 1, "changed": {LED: 9}, "removed": []}),
+            ],
+            self.published,
+        )
+
+    def test_legacy(self):
+        sync = GuiSync(self.publish, lambda: self.topics, window=0, legacy=True)
+        sync.update({LED: 1, PUMP: 0})
+        sync.update(removed=[PUMP])
+        sync.publish_snapshot()
+
+        # the old topic only gets the whole state with snapshots
+        self.assertEqual(
+            [
+                (
+                    SYNC_DELTA_TOPIC,
+                    {"seq": 1, "changed": {LED: 1, PUMP: 0}, "removed": []},
+                ),
+                (SYNC_DELTA_TOPIC, {"seq": 2, "changed": {}, "removed": [PUMP]}),
+                (SYNC_SNAPSHOT_TOPIC, {"seq": 2, "data": {LED: 1}}),
+                (SYNC_TOPIC, {LED: 1}),
+            ],
+            self.published,
+        )
+
+    def test_stop(self):
+        sync = GuiSync(
+            self.publish, lambda: self.topics, window=60, max_latency=60, legacy=False
+        )
+        sync.update({LED: 1})
+        thread = sync.thread
+
+        sync.stop()
+
+        self.assertFalse(thread.is_alive())
+        self.assertEqual(
+            [(SYNC_DELTA_TOPIC, {"seq": 1, "changed": {LED: 1}, "removed": []})],
+            self.published,
+        )
+
+        # published right away once stopped
+        sync.update({LED: 2})
+        self.assertEqual(2, len(self.published))
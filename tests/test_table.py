@@ -0,0 +1,69 @@
+from unittest import TestCase
+
+from controller.hydroplant import EntityType, Floor, HydroplantSystem
+from controller.table import StateTable
+
+
+def get_system() -> HydroplantSystem:
+    return HydroplantSystem(
+        Floor("floor_1", "stage_1", "stage_2"), Floor("floor_2", "stage_1")
+    )
+
+
+class TestStateTable(TestCase):
+    def setUp(self):
+        self.system = get_system()
+        self.table = self.system.get_table()
+
+        self.leds = [
+            self.system.add_actuator(f"{floor}/{stage}/climate_node/LED")
+            for floor, stage in (
+                ("floor_1", "stage_1"),
+                ("floor_1", "stage_2"),
+                ("floor_2", "stage_1"),
+            )
+        ]
+        self.pump = self.system.add_actuator("floor_1/stage_1/climate_node/water_pump")
+
+    def test_select(self):
+        self.assertEqual(self.leds, self.table.select(EntityType.LED))
+        self.assertEqual(
+            [self.leds[0], self.pump],
+            self.table.select(stage="stage_1", floor="floor_1"),
+        )
+        self.assertEqual([], self.table.select(floor="floor_3"))
+
+    def test_follows_set_data(self):
+        self.leds[0].set_data({"value": 1})
+        self.leds[1].set_data({"value": 0})
+
+        # entities without a value differ from everything
+        self.assertEqual(
+            [self.leds[1], self.leds[2]],
+            self.table.select(EntityType.LED, differs_from=1),
+        )
+        self.assertGreater(
+            self.table.updated[self.table.rows[self.leds[0].unique_id]], 0
+        )
+
+    def test_remove_and_reuse(self):
+        self.system.delete_objects("climate_node", "floor_2")
+
+        self.assertEqual(3, len(self.table))
+        self.assertEqual(self.leds[:2], self.table.select(EntityType.LED))
+
+        led = self.system.add_actuator("floor_2/stage_1/other_node/LED")
+
+        # the free row is used again
+        self.assertEqual(4, self.table.size)
+        self.assertIn(led, self.table.select(EntityType.LED, floor="floor_2"))
+
+    def test_grow(self):
+        table = StateTable(capacity=2)
+        system = get_system()
+
+        for i in range(10):
+            table.add(system.add_actuator(f"floor_1/stage_1/node_{i}/LED"))
+
+        self.assertEqual(10, len(table.select(EntityType.LED)))
+        self.assertGreaterEqual(len(table.types), 10)
@@ -0,0 +1,58 @@
+from unittest import TestCase
+import json
+import os
+import tempfile
+
+from controller.hydroplant import HydroplantSystem
+from controller.topology import generate_topology, load_topology, parse_topology
+
+
+class TestTopology(TestCase):
+    def test_generate(self):
+        floors = parse_topology(generate_topology(2, 3, capacity=5))
+
+        self.assertEqual(["floor_1", "floor_2"], [floor.name for floor in floors])
+        self.assertEqual(3, len(floors[1].get_stages()))
+        self.assertEqual(5, floors[1].get_stage_by_name("stage_3").capacity)
+
+    def test_load(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "topology.json")
+
+            with open(path, "w") as f:
+                json.dump(generate_topology(3, 3), f)
+
+            system = HydroplantSystem(*load_topology(path))
+
+        stage = system.get_floor("floor_3/stage_2/climate_node/LED").get_stage(
+            "floor_3/stage_2/climate_node/LED"
+        )
+        self.assertEqual("stage_2", stage.name)
+        self.assertIsNone(system.get_floor_by_name("floor_4"))
+
+    def test_invalid(self):
+        with self.assertRaises(ValueError):
+            parse_topology({"floors": [{"name": "floor_1"}, {"name": "floor_1"}]})
+
+        with self.assertRaises(ValueError):
+            parse_topology(
+                {"floors": [{"name": "floor_1", "stages": [{"name": "stage_1"}] * 2}]}
+            )
+
+        with self.assertRaises(ValueError):
+            parse_topology({"floors": [{"stages": []}]})
+
+    def test_names_must_parse(self):
+        def get_topology(floor, stage):
+            return {"floors": [{"name": floor, "stages": [{"name": stage}]}]}
+
+        parse_topology(get_topology("floor_top", "stage_germination"))
+
+        for floor, stage in (
+            ("floor_1", "germination"),
+            ("top", "stage_1"),
+            ("floor_stage", "stage_1"),
+            ("floor_1", "stage/1"),
+        ):
+            with self.assertRaises(ValueError, msg=(floor, stage)):
+                parse_topology(get_topology(floor, stage))
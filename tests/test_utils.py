@@ -0,0 +1,57 @@
+from unittest import TestCase
+
+from controller.utils import (
+    get_floor_from_topic,
+    get_last_part,
+    get_node_wildcard_topic,
+    get_second_last_part,
+    get_stage_from_topic,
+    get_unique_id,
+    is_receipt,
+    parse_topic,
+)
+
+RECEIPT = "hydroplant/command/floor_1/stage_1/climate_node/LED/receipt"
+MOVER = "hydroplant/gui_command/floor_2/plant_mover_node/plant_mover"
+
+
+class TestParseTopic(TestCase):
+    def test_parse(self):
+        parsed = parse_topic(RECEIPT)
+
+        self.assertEqual("hydroplant", parsed.prefix)
+        self.assertEqual("command", parsed.data_type)
+        self.assertEqual("floor_1", parsed.floor)
+        self.assertEqual("stage_1", parsed.stage)
+        self.assertEqual("climate_node", parsed.node)
+        self.assertEqual("LED", parsed.part)
+        self.assertTrue(parsed.is_receipt)
+        self.assertEqual("floor_1/stage_1/climate_node/LED", parsed.unique_id)
+
+        # cached and immutable
+        self.assertIs(parsed, parse_topic(RECEIPT))
+
+        with self.assertRaises(AttributeError):
+            parsed.floor = "floor_2"
+
+    def test_helpers(self):
+        self.assertEqual("receipt", get_last_part(RECEIPT))
+        self.assertEqual("LED", get_second_last_part(RECEIPT))
+        self.assertEqual("node", get_second_last_part("node"))
+        self.assertEqual("floor_2", get_floor_from_topic(MOVER))
+        self.assertEqual("", get_stage_from_topic(MOVER))
+        self.assertEqual("floor_2/plant_mover_node/plant_mover", get_unique_id(MOVER))
+        self.assertFalse(is_receipt(MOVER))
+        self.assertEqual(
+            "hydroplant/command/floor_1/+/climate_node/+/receipt",
+            get_node_wildcard_topic(RECEIPT),
+        )
+
+    def test_invalid(self):
+        self.assertEqual("", parse_topic("hydroplant/is_ready").floor)
+
+        with self.assertRaises(AssertionError):
+            get_unique_id("hydroplant/is_ready")
+
+        with self.assertRaises(IndexError):
+            get_unique_id("hydroplant/command/floor_1/stage_1/climate_node")
@@ -0,0 +1,209 @@
+from threading import Event, Thread
+from unittest import TestCase
+
+from pymongo.errors import AutoReconnect, BulkWriteError
+
+from controller.rollup import Rollup
+from controller.writer import BatchWriter, RollupWriter, StateWriter
+
+
+class FakeCollection:
+    name = "fake"
+
+    def __init__(self, block=None):
+        self.batches = []
+        self.block = block
+
+    def insert_many(self, documents, ordered=True):
+        if self.block is not None:
+            self.block.wait()
+
+        self.batches.append(list(documents))
+
+
+class TestBatchWriter(TestCase):
+    def test_batches_on_size(self):
+        collection = FakeCollection()
+        writer = BatchWriter(collection, batch_size=10, flush_interval=60)
+
+        for i in range(25):
+            writer.put({"value": i})
+
+        writer.close()
+
+        documents = [d["value"] for batch in collection.batches for d in batch]
+        self.assertEqual(list(range(25)), sorted(documents))
+        self.assertEqual(25, writer.written)
+        self.assertLessEqual(len(collection.batches), 3)
+
+    def test_flush_on_interval(self):
+        collection = FakeCollection()
+        writer = BatchWriter(collection, batch_size=100, flush_interval=0.01)
+
+        writer.put({"value": 1})
+
+        for _ in range(100):
+            if collection.batches:
+                break
+            Event().wait(0.01)
+
+        self.assertEqual([[{"value": 1}]], collection.batches)
+        writer.close()
+
+    def test_backpressure(self):
+        block = Event()
+        collection = FakeCollection(block)
+        writer = BatchWriter(collection, batch_size=1, flush_interval=60, max_pending=2)
+
+        # first document is taken by the thread which blocks on insert
+        producer = Thread(target=lambda: [writer.put({"value": i}) for i in range(5)])
+        producer.start()
+        producer.join(0.2)
+
+        self.assertTrue(producer.is_alive())
+
+        block.set()
+        producer.join()
+        writer.close()
+
+        self.assertEqual(5, writer.written)
+
+    def test_put_after_close(self):
+        writer = BatchWriter(FakeCollection())
+        writer.close()
+
+        with self.assertRaises(RuntimeError):
+            writer.put({})
+
+
+class FakeStateCollection:
+    name = "state"
+
+    def __init__(self, block=None):
+        self.updates = []
+        self.block = block
+        self.is_writing = Event()
+
+    def update_one(self, query, update, upsert=False):
+        self.is_writing.set()
+
+        if self.block is not None:
+            self.block.wait()
+
+        self.updates.append(update)
+
+
+class TestStateWriter(TestCase):
+    def test_coalesce_changes(self):
+        collection = FakeStateCollection()
+        writer = StateWriter(collection, window=60)
+
+        for value in range(10):
+            writer.update({"floor_1/stage_1/climate_node/LED": value})
+
+        writer.update({"floor_1/stage_2/climate_node/LED": 1})
+        writer.close()
+
+        self.assertEqual(
+            [
+                {
+                    "$set": {
+                        "floor_1/stage_1/climate_node/LED": 9,
+                        "floor_1/stage_2/climate_node/LED": 1,
+                    }
+                }
+            ],
+            collection.updates,
+        )
+
+    def test_flush_waits_for_write(self):
+        block = Event()
+        collection = FakeStateCollection(block)
+        writer = StateWriter(collection, window=0)
+
+        writer.update({"LED": 1})
+        self.assertTrue(collection.is_writing.wait(5))
+
+        writer.update({"LED": 0})
+        flush = Thread(target=writer.flush)
+        flush.start()
+        flush.join(0.1)
+        self.assertTrue(flush.is_alive())
+
+        block.set()
+        flush.join()
+        writer.close()
+
+        # the newer value is written last
+        self.assertEqual(
+            [{"$set": {"LED": 1}}, {"$set": {"LED": 0}}], collection.updates
+        )
+
+
+class FakeRollupDatabase:
+    def __init__(self, errors):
+        # raised by the next writes, None writes
+        self.errors = errors
+        self.written = {}
+
+    def __getitem__(self, name):
+        return FakeRollupCollection(self, name)
+
+
+class FakeRollupCollection:
+    def __init__(self, db, name):
+        self.db = db
+        self.name = name
+
+    def bulk_write(self, requests, ordered=True):
+        error = self.db.errors.pop(0) if self.db.errors else None
+
+        # nothing was written
+        if error is not None and not isinstance(error, BulkWriteError):
+            raise error
+
+        if isinstance(error, BulkWriteError):
+            failed = {e["index"] for e in error.details["writeErrors"]}
+            requests = [r for i, r in enumerate(requests) if i not in failed]
+
+        self.db.written.setdefault(self.name, []).extend(
+            request._doc["$inc"]["count"] for request in requests
+        )
+
+        if error is not None:
+            raise error
+
+
+class TestRollupWriter(TestCase):
+    def setUp(self):
+        self.rollup = Rollup()
+
+        for sensor_id in ("ph", "ec"):
+            self.rollup.add("water_node", sensor_id, 3600, 6.0)
+            self.rollup.add("water_node", sensor_id, 3610, 7.0)
+
+    def test_retry_failed(self):
+        db = FakeRollupDatabase([AutoReconnect(), None])
+        writer = RollupWriter(db, self.rollup, interval=60)
+
+        writer.flush()
+        self.assertEqual({"measurements_1m": [2, 2]}, db.written)
+
+        # the hour buckets were put back, with what arrived meanwhile
+        self.rollup.add("water_node", "ph", 3620, 8.0)
+        writer.close()
+
+        self.assertEqual([2, 2, 1], db.written["measurements_1m"])
+        self.assertEqual([3, 2], sorted(db.written["measurements_1h"], reverse=True))
+
+    def test_retry_only_failed_upserts(self):
+        error = BulkWriteError({"writeErrors": [{"index": 1}]})
+        db = FakeRollupDatabase([error])
+        writer = RollupWriter(db, self.rollup, interval=60)
+
+        writer.flush()
+        writer.close()
+
+        # every bucket is counted once
+        self.assertEqual([2, 2], db.written["measurements_1h"])
+        self.assertEqual([2, 2], db.written["measurements_1m"])